@@ -1,9 +1,12 @@
 from legent.server.server import serve, launch, set_scenes_dir
 from legent.utils.io import load_json, store_json, save_image, scene_string, time_string, get_latest_folder, get_latest_folder_with_suffix
 from legent.environment.env import Environment
+from legent.environment.batched_env import BatchedEnvironment
+from legent.environment.async_env import AsyncEnvironment
 from legent.action.action import Action, ResetInfo, ActionFinish
 from legent.action.observation import Observation
 from legent.server.scene_generator import generate_scene
+from legent.server.scene_pool import ScenePool, set_default_scene_pool
 import argparse
 import os
 from legent.environment.env_utils import download_env
@@ -21,7 +24,7 @@ def main():
     parser = argparse.ArgumentParser(
         formatter_class=argparse.ArgumentDefaultsHelpFormatter
     )
-    parser.add_argument("function", help="serve or play")
+    parser.add_argument("function", help="serve, launch, download, generate-scenes, build-odb or build-layouts")
 
     parser.add_argument(
         "--time_scale",
@@ -54,13 +57,46 @@ def main():
         help="username@host:port",
     )
     
+    parser.add_argument(
+        "--scene_pool_size",
+        default=0,
+        type=int,
+        help="number of scenes the scene server generates ahead in background processes",
+    )
+
     parser.add_argument('--thu', action='store_true', help='download from tsinghua cloud rather than huggingface hub')
+
+    # generate-scenes
+    parser.add_argument("--num", default=1000, type=int, help="number of scenes to generate")
+    parser.add_argument("--workers", default=None, type=int, help="number of generating processes, defaults to the number of CPUs")
+    parser.add_argument("--seed", default=None, type=int, help="seed of the generated scenes")
+    parser.add_argument("--room_num", "--room-num", default=None, type=int, help="number of rooms of the generated scenes")
+    parser.add_argument("--output", default="generated_scenes", help="directory of the generated scene shards, rerun with the same arguments to resume")
+    parser.add_argument("--shard_size", "--shard-size", default=1000, type=int, help="number of scenes per shard")
+    parser.add_argument("--layout_bank", "--layout-bank", default=None, help="directory of the layout bank to build, or to take the house layouts of the generated scenes from")
+    parser.add_argument("--layouts_per_spec", "--layouts-per-spec", default=100, type=int, help="number of layouts of each room spec in the layout bank")
+    parser.add_argument("--layout_reuse_probability", "--layout-reuse-probability", default=1.0, type=float, help="probability to take the layout of a generated scene from the layout bank")
     
     args = parser.parse_args()
     if args.function == "serve":
-        serve(args.use_default_scene)
+        serve(args.use_default_scene, args.scene_pool_size)
     elif args.function == "launch":
-        launch(args.env_path, args.ssh, args.use_default_scene)
+        launch(args.env_path, args.ssh, args.use_default_scene, scene_pool_size=args.scene_pool_size)
+    elif args.function == "generate-scenes":
+        from legent.server.scene_corpus import generate_scenes
+        generate_scenes(
+            args.output, args.num, args.workers, args.seed, args.shard_size, room_num=args.room_num,
+            layout_bank=args.layout_bank, layout_reuse_probability=args.layout_reuse_probability
+        )
+    elif args.function == "build-odb":
+        from legent.scene_generation.odb_snapshot import build_object_db_snapshot
+        print(f"Object database snapshot written to {build_object_db_snapshot()}")
+    elif args.function == "build-layouts":
+        from legent.scene_generation.layout_bank import build_layout_bank
+        from legent.server.scene_generator import get_room_spec_sampler
+        output = args.layout_bank or "layout_bank"
+        build_layout_bank(output, get_room_spec_sampler(args.room_num).room_specs, args.layouts_per_spec, args.workers, args.seed)
+        print(f"Layout bank written to {output}")
     elif args.function == "download":
         download_env(args.thu)
         download_env(args.thu, download_env_data=True)
\ No newline at end of file
@@ -1,6 +1,7 @@
 from typing import Dict, List
 from legent.protobuf.communicator_pb2 import ActionProto
-from legent.server.scene_generator import generate_scene
+from legent.server.scene_pool import next_scene
+from legent.utils.scene_format import Buffer, decode_scene, encode_scene
 import json
 import re
 
@@ -19,7 +20,8 @@ class Action:
                  grab: bool = False,
                  teleport_forward: float = 0,
                  use_teleport: bool = False,  # whether to use teleport mode
-                 api_calls: List[str] = []
+                 api_calls: List[str] = [],
+                 skip_image: bool = False  # whether to skip rendering and sending the image of this step
                  ) -> None:
         self.type = type
         self.text = text
@@ -36,6 +38,7 @@ class Action:
 
         self.use_teleport: bool = use_teleport
         self.api_calls: List[str] = api_calls
+        self.skip_image: bool = skip_image
 
     def build(self) -> ActionProto:
         return ActionProto(
@@ -45,7 +48,8 @@ class Action:
             float_actions=[self.move_right, self.move_forward, self.rotate_right, self.rotate_down] +
             [self.jump, self.grab, self.teleport_forward],
             int_actions=[self.use_teleport],
-            api_calls=json.dumps({"calls": self.api_calls})
+            api_calls=json.dumps({"calls": self.api_calls}),
+            skip_image=self.skip_image
         )
 
     def to_string(self):
@@ -73,14 +77,42 @@ class ResetInfo:
     
     def __init__(self,
         scene: Dict=None,
-        api_calls: List[str] = []
+        api_calls: List[str] = [],
+        binary_scene: bool = False,  # send the scene in the compact binary format (ActionProto.binary_scene) instead of JSON
+        encoded_scene: Buffer = None  # a scene already in the binary format, e.g. SceneFile.encoded(), sent instead of scene
     ) -> None:
-        if not scene:
-            scene = generate_scene()
-        self.json_actions = json.dumps(scene)
+        if encoded_scene is not None:
+            binary_scene = True
+        elif not scene:
+            scene = next_scene()
+        self.scene = scene
+        self._json_actions = None
+        self._binary_scene = encoded_scene
         self.api_calls = api_calls
-    
+        self.binary_scene = binary_scene
+
+    @property
+    def json_actions(self) -> str:
+        # The scene is serialized on first use (usually in build()), so that the cost shows up in the step that sends it.
+        if self._json_actions is None:
+            self._json_actions = json.dumps(self.scene if self.scene is not None else decode_scene(self._binary_scene))
+        return self._json_actions
+
+    @property
+    def encoded_scene(self) -> Buffer:
+        # See legent.utils.scene_format. Encoded on first use, like json_actions.
+        if self._binary_scene is None:
+            self._binary_scene = encode_scene(self.scene)
+        return self._binary_scene
+
     def build(self) -> ActionProto:
+        if self.binary_scene:
+            return ActionProto(
+                type="RESET",
+                # NOTE: protobuf only takes bytes, so a view (e.g. of a SceneFile) is copied here, while bytes are not
+                binary_scene=bytes(self.encoded_scene),
+                api_calls=json.dumps({"calls": self.api_calls})
+            )
         return ActionProto(
             type="RESET",
             json_actions=self.json_actions,
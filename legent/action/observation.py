@@ -1,17 +1,78 @@
 from legent.protobuf.communicator_pb2 import ObservationProto
+from legent.utils.profiler import Profiler, phase
+from typing import Optional
+import numpy as np
 import json
 import io
 import skimage
 
 
+def decode_image(obs: ObservationProto) -> np.ndarray:
+    if obs.image_format == "raw":
+        # Raw RGB24 pixels are exposed as a read-only view of the message bytes, no decoding or copying.
+        height, width, channels = obs.image_shape
+        return np.frombuffer(obs.image, dtype=np.uint8).reshape(height, width, channels)
+    image_stream = io.BytesIO(obs.image)
+    return skimage.io.imread(image_stream, plugin="imageio")
+
+
+_NOT_DECODED = object()
+
+
 class Observation:
-    def __init__(self, obs: ObservationProto):
+    # The image and the json fields are decoded on first access, so callers that only read
+    # a few game states (e.g. the scripted controllers) do not pay for decoding the rest.
+    __slots__ = ("_obs", "type", "text", "_image", "_game_states", "_api_returns", "_profiler")
+
+    def __init__(self, obs: ObservationProto, profiler: Optional[Profiler] = None):
+        self._obs = obs
+        self._profiler = profiler  # records the decoding time of each field if given
         self.type = obs.type
-        image_stream = io.BytesIO(obs.image)
-        self.image = skimage.io.imread(image_stream, plugin="imageio")
         self.text = obs.text
-        self.game_states = json.loads(obs.game_states)
-        if obs.api_returns:
-            self.api_returns = json.loads(obs.api_returns)
-        else:
-            self.api_returns = None
+        self._image = _NOT_DECODED
+        self._game_states = _NOT_DECODED
+        self._api_returns = _NOT_DECODED
+
+    def __reduce__(self):
+        # Pickled as the undecoded message (e.g. when sent between processes), so it is decoded lazily on the other side.
+        return (Observation, (self._obs,))
+
+    @property
+    def image(self) -> np.ndarray:
+        """The egocentric image. None if the step was taken with skip_image=True."""
+        if self._image is _NOT_DECODED:
+            with phase(self._profiler, "image_decode"):
+                self._image = decode_image(self._obs) if self._obs.image else None
+        return self._image
+
+    @image.setter
+    def image(self, image: np.ndarray) -> None:
+        self._image = image
+
+    def detach_image(self) -> None:
+        """Decode the image and drop the encoded bytes from the message, so that pickling it does not carry the image."""
+        image = self.image
+        self._obs.ClearField("image")
+        self._image = image
+
+    @property
+    def game_states(self):
+        if self._game_states is _NOT_DECODED:
+            with phase(self._profiler, "game_states_parse"):
+                self._game_states = json.loads(self._obs.game_states)
+        return self._game_states
+
+    @game_states.setter
+    def game_states(self, game_states) -> None:
+        self._game_states = game_states
+
+    @property
+    def api_returns(self):
+        if self._api_returns is _NOT_DECODED:
+            with phase(self._profiler, "api_returns_parse"):
+                self._api_returns = json.loads(self._obs.api_returns) if self._obs.api_returns else None
+        return self._api_returns
+
+    @api_returns.setter
+    def api_returns(self, api_returns) -> None:
+        self._api_returns = api_returns
@@ -46,7 +46,7 @@ class PathFollower(Actions):
 
     def init_actions(self, env: Environment) -> None:
         api_call = PathToObject(self.object_id) if self.object_id else PathToUser()
-        obs = env.step(Action(api_calls=[api_call]))
+        obs = env.step(Action(api_calls=[api_call], skip_image=True))
         self.corners = obs.api_returns['corners']
 
     def get_next_action(self, obs: Observation) -> Optional[Action]:
@@ -127,7 +127,7 @@ class PathFollowerWithVisibilityCheck(PathFollower):
     
     def init_actions(self, env: Environment) -> None:
         super().init_actions(env)
-        obs = env.step(Action(api_calls=[ObjectInView(self.object_id)]))
+        obs = env.step(Action(api_calls=[ObjectInView(self.object_id)], skip_image=True))
         self.alreay_in_view = obs.api_returns['in_view']
     
     def get_next_action(self, obs: Observation) -> Optional[Action]:
@@ -189,7 +189,7 @@ class LookAtWithVisibilityCheck(LookAt):
         self.alreay_in_view = False
     
     def init_actions(self, env: Environment) -> None:
-        obs = env.step(Action(api_calls=[ObjectInView(self.object_id)]))
+        obs = env.step(Action(api_calls=[ObjectInView(self.object_id)], skip_image=True))
         self.alreay_in_view = obs.api_returns['in_view']
     
     def get_next_action(self, obs: Observation) -> Optional[Action]:
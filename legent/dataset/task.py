@@ -1,5 +1,6 @@
 import openai
-from legent.server.scene_generator import generate_scene, generate_scene_messy, prefabs
+from legent.server.scene_generator import generate_scene_messy, prefabs
+from legent.server.scene_pool import next_scene
 from legent.utils.config import TASKS_FOLDER
 from legent.utils.io import store_json, load_json_from_toolkit, time_string, scene_string, log_green, log
 from legent.utils.math import is_point_on_box
@@ -77,7 +78,7 @@ class TaskCreator(ChatBase):
 
         # generate a scene
         if not scene:
-            scene = generate_scene(room_num=room_num)
+            scene = next_scene(room_num=room_num)
 
         # generate (task, plan, solution) triplets
         if task_type == "come":
@@ -140,7 +141,7 @@ class TaskCreator(ChatBase):
 
     def create_task_for_scene_by_prompting(self, task_type=Literal["come", "goto", "take", "bring", "put", "where", "exist"], scene=None, sample_num=1):
         if not scene:
-            scene = generate_scene()
+            scene = next_scene()
 
         task_prompt = {p['type']: p for p in load_json_from_toolkit('dataset/task-prompts.json')}[task_type]
         if task_prompt['TYPE'] == 'instrution following':
@@ -252,7 +253,7 @@ For example (The examples are from other scenes. The number means object_id):
             while object_id == -1:  # Failed to put the object
                 # print(".", end="", flush=True)
                 # print(receptacle_object_counts)
-                scene = generate_scene(receptacle_object_counts=receptacle_object_counts, room_num=room_num)
+                scene = next_scene(receptacle_object_counts=receptacle_object_counts, room_num=room_num)
                 loop_count += 1
                 if loop_count > 4:
                     log(f"failed to put {object_name} on {receptacle_name} after many attempts")
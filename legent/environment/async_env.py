@@ -0,0 +1,106 @@
+from typing import Optional, Dict
+import asyncio
+import subprocess
+from legent.environment.communicator import AsyncRpcCommunicator
+from legent.environment.env import launch_client, env_config, get_timeouts, build_inputs, welcome
+from legent.utils.profiler import Profiler, phase
+from legent.server.scene_pool import ScenePool, next_scene
+from legent.action.action import Action, ResetInfo
+from legent.action.observation import Observation
+
+
+class AsyncEnvironment:
+    """The asyncio version of Environment.
+
+    step() and reset() are coroutines that wait for the game client without blocking the event loop, so one event loop can
+    drive many environments and overlap them with other awaited work, such as model requests.
+
+    Use AsyncEnvironment.create() instead of the constructor:
+
+        env = await AsyncEnvironment.create(env_path="auto")
+        obs = await env.reset()
+        obs = await env.step(Action(move_forward=1))
+        await env.close()
+    """
+
+    def __init__(self, port: int, num_envs: Optional[int] = None, timeouts: Dict[str, Optional[float]] = {}, profile=False, scene_pool: Optional[ScenePool] = None):
+        self._process: Optional[subprocess.Popen] = None
+        self._scene_pool = scene_pool
+        self._profiler = Profiler.from_env() or (Profiler() if profile else None)
+        self._timeouts = get_timeouts(timeouts)
+        self._communicator = AsyncRpcCommunicator(port, num_envs)
+
+    @classmethod
+    async def create(cls, env_path: Optional[str] = None, run_options: Dict = {}, use_animation=True, camera_resolution=448, camera_field_of_view=120, use_raw_image=False, profile=False, scene_pool: Optional[ScenePool] = None) -> "AsyncEnvironment":
+        """Start the server, launch the game client and wait for it to connect. The arguments are the same as Environment."""
+        port = run_options.get("port", 50051)
+        env = cls(port, timeouts=run_options, profile=profile, scene_pool=scene_pool)
+        welcome()
+        try:
+            await env._communicator.create_server()
+            env._process = launch_client(env_path, run_options, port)
+            if env._process is not None:
+                env._communicator.watch_process(env._process)
+            await env._communicator.initialize(env._poll_process, env_config(use_animation, camera_resolution, camera_field_of_view, use_raw_image), env._timeouts["init"])
+        except BaseException:
+            await env.close()
+            raise
+        return env
+
+    def _poll_process(self) -> None:
+        """
+        Check the status of the subprocess. If it has exited, raise a Exception
+        """
+        if not self._process:
+            return
+        poll_res = self._process.poll()
+        if poll_res is not None:
+            raise Exception("Game client exited")
+
+    @property
+    def metrics(self) -> Dict[str, float]:
+        """Timings of the communication with the game client. See communicator.new_metrics()."""
+        return self._communicator.metrics
+
+    def stats(self) -> Dict[str, Dict]:
+        """See Environment.stats()."""
+        return self._profiler.stats() if self._profiler is not None else {}
+
+    async def step(self, inputs: Optional[Action] = None, timeout: Optional[float] = None) -> Observation:
+        if inputs is None:
+            inputs = Action()
+        inputs = build_inputs(inputs, self._profiler)
+        if timeout is None:
+            timeout = self._timeouts["reset" if inputs.type == "RESET" else "step"]
+        with phase(self._profiler, "exchange"):
+            outputs = await self._communicator.exchange(inputs, self._poll_process, timeout)
+        return Observation(outputs, self._profiler)
+
+    async def reset(self, inputs: Optional[ResetInfo] = None, timeout: Optional[float] = None) -> Observation:
+        if inputs is None:
+            # Scene generation is CPU heavy (or waits for the scene pool), so run it in a thread to keep the other environments going
+            scene = await asyncio.to_thread(next_scene, self._scene_pool)
+            inputs = ResetInfo(scene=scene)
+        return await self.step(inputs, timeout)
+
+    async def close(self) -> None:
+        """
+        Close the communicator and environment subprocess (if necessary).
+        """
+        await self._communicator.close()
+        if self._profiler is not None:
+            self._profiler.dump()
+        if self._process is not None:
+            # Wait a bit for the process to shutdown, but kill it if it takes too long
+            timeout = 60
+            try:
+                await asyncio.to_thread(self._process.wait, timeout)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            self._process = None
+
+    async def __aenter__(self) -> "AsyncEnvironment":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
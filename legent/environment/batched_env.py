@@ -0,0 +1,69 @@
+from typing import Optional, Dict, List, Sequence, Union
+from legent.protobuf.communicator_pb2 import ActionProto, BatchActionProto
+from legent.environment.env import Environment, build_inputs
+from legent.utils.profiler import phase
+from legent.server.scene_pool import ScenePool, next_scene
+from legent.action.action import Action, ResetInfo
+from legent.action.observation import Observation
+
+BatchInput = Union[Action, ResetInfo, ActionProto, None]
+
+
+class BatchedEnvironment(Environment):
+    """N scenes hosted by one game client on one port, stepped together with a single RPC per step.
+
+    Compared with N Environments, this needs only one client process (one copy of the assets) and one port.
+    The game client is launched with "--num_envs N" and talks through GetBatchAction.
+    """
+
+    def __init__(self, num_envs: int, env_path: Optional[str] = None, run_options: Dict = {}, use_animation=True, camera_resolution=448, camera_field_of_view=120, use_raw_image=False, profile=False, scene_pool: Optional[ScenePool]=None):
+        self._num_envs = num_envs
+        super().__init__(env_path, run_options, use_animation, camera_resolution, camera_field_of_view, use_raw_image, profile, scene_pool)
+
+    @property
+    def num_envs(self) -> int:
+        return self._num_envs
+
+    def step(self, inputs: Union[Sequence[BatchInput], Dict[int, BatchInput], None] = None, timeout: Optional[float] = None) -> List[Observation]:
+        """Step the scenes in one RPC.
+
+        Args:
+            inputs: Either a list with one input per scene, or a dict that maps env ids to inputs, in which case
+                only those scenes are stepped. An input can be an Action, a ResetInfo or an ActionProto;
+                None means the default Action().
+            timeout: Seconds to wait for the observations. By default the reset timeout of run_options if any scene is reset,
+                otherwise the step timeout.
+
+        Returns:
+            List[Observation]: The observations of the stepped scenes, in the order of their env ids.
+        """
+        if inputs is None:
+            inputs = [None] * self._num_envs
+        if not isinstance(inputs, dict):
+            if len(inputs) != self._num_envs:
+                raise Exception(f"Expected {self._num_envs} inputs, got {len(inputs)}")
+            inputs = dict(enumerate(inputs))
+        batch = BatchActionProto()
+        for env_id in sorted(inputs):
+            if not 0 <= env_id < self._num_envs:
+                raise Exception(f"Invalid env id {env_id} for {self._num_envs} environments")
+            action = inputs[env_id]
+            if action is None:
+                action = Action()
+            action = build_inputs(action, self._profiler)
+            batch.env_ids.append(env_id)
+            batch.actions.append(action)
+        if timeout is None:
+            timeout = self._timeouts["reset" if any(action.type == "RESET" for action in batch.actions) else "step"]
+        with phase(self._profiler, "exchange"):
+            outputs = self._communicator.exchange(batch, self._poll_process, timeout)
+        observations = dict(zip(outputs.env_ids, outputs.observations))
+        return [Observation(observations[env_id], self._profiler) for env_id in batch.env_ids]
+
+    def reset(self, inputs: Union[Sequence[Optional[ResetInfo]], Dict[int, Optional[ResetInfo]], None] = None, timeout: Optional[float] = None) -> List[Observation]:
+        """Reset the scenes. Scenes without a given ResetInfo get a new scene, from the scene pool if there is one."""
+        if inputs is None:
+            inputs = [None] * self._num_envs
+        if not isinstance(inputs, dict):
+            inputs = dict(enumerate(inputs))
+        return self.step({env_id: info if info is not None else ResetInfo(scene=next_scene(self._scene_pool)) for env_id, info in inputs.items()}, timeout)
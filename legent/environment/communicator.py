@@ -1,16 +1,66 @@
 import grpc
-from typing import Callable, Optional
-from multiprocessing import Pipe
+import asyncio
+from typing import Any, Callable, Dict, Optional, Tuple
+from collections import deque
+import threading
+import subprocess
 import time
 from concurrent.futures import ThreadPoolExecutor
 from legent.protobuf.communicator_pb2_grpc import CommunicatorServicer, add_CommunicatorServicer_to_server
-from legent.protobuf.communicator_pb2 import ActionProto, ObservationProto
+from legent.protobuf.communicator_pb2 import ActionProto, ObservationProto, BatchActionProto
 import json
 
 
+class HandoffConnection:
+    """One end of an in-process duplex channel with the same send/recv/poll interface as multiprocessing.Connection.
+
+    The gRPC handler thread and the main thread live in the same process, so messages are handed over
+    by reference instead of being pickled and copied through a pipe.
+    """
+
+    def __init__(self, condition: threading.Condition, inbox: deque, outbox: deque, state: dict):
+        self._condition = condition
+        self._inbox = inbox
+        self._outbox = outbox
+        self._state = state
+
+    def send(self, obj: Any) -> None:
+        with self._condition:
+            if self._state["closed"]:
+                raise OSError("handle is closed")
+            self._outbox.append(obj)
+            self._condition.notify_all()
+
+    def poll(self, timeout: Optional[float] = 0.0) -> bool:
+        # Like Connection.poll(), returns True at end of stream so that the following recv() raises EOFError.
+        with self._condition:
+            return bool(self._condition.wait_for(lambda: self._inbox or self._state["closed"], timeout))
+
+    def recv(self) -> Any:
+        with self._condition:
+            self._condition.wait_for(lambda: self._inbox or self._state["closed"])
+            if not self._inbox:
+                raise EOFError
+            return self._inbox.popleft()
+
+    def close(self) -> None:
+        # Wake up the other end so that it does not block forever on recv().
+        with self._condition:
+            self._state["closed"] = True
+            self._condition.notify_all()
+
+
+def HandoffPipe() -> Tuple[HandoffConnection, HandoffConnection]:
+    """Create a pair of connected in-process connections, like multiprocessing.Pipe()."""
+    condition = threading.Condition()
+    a_to_b, b_to_a = deque(), deque()
+    state = {"closed": False}
+    return HandoffConnection(condition, b_to_a, a_to_b, state), HandoffConnection(condition, a_to_b, b_to_a, state)
+
+
 class CommunicatorServicerImplementation(CommunicatorServicer):
     def __init__(self):
-        self.parent_conn, self.child_conn = Pipe()
+        self.parent_conn, self.child_conn = HandoffPipe()
 
     def Initialize(self, request, context):
         self.child_conn.send(request)
@@ -20,23 +70,70 @@ class CommunicatorServicerImplementation(CommunicatorServicer):
         self.child_conn.send(request)
         return self.child_conn.recv()
 
+    def GetBatchAction(self, request, context):
+        # Same relay as GetAction. The batch is passed through as a whole and split by the caller.
+        self.child_conn.send(request)
+        return self.child_conn.recv()
+
+
+def to_all_envs(action: ActionProto, num_envs: Optional[int]):
+    """Address a control message (INIT, CLOSE) to every scene of a batched client, or return it as is for a single scene."""
+    if num_envs is None:
+        return action
+    return BatchActionProto(env_ids=range(num_envs), actions=[action] * num_envs)
+
 
 # Function to call while waiting for a connection timeout.
 # This should raise an exception if it needs to break from waiting for the timeout.
 PollCallback = Callable[[], None]
 
+# The first wait between two calls of the poll callback. It doubles on every call, up to MAX_POLL_INTERVAL.
+# Messages are received as soon as they arrive regardless of it, it only matters to how fast the callback notices a problem.
+MIN_POLL_INTERVAL = 0.01
+MAX_POLL_INTERVAL = 1.0
+
+
+def new_metrics() -> Dict[str, float]:
+    """Timings of a communicator, all in seconds."""
+    return {
+        "initialize_seconds": 0.0,  # from the start of initialize() to the first observation after INIT
+        "exchanges": 0,
+        "exchange_seconds_total": 0.0,
+        "exchange_seconds_max": 0.0,
+        "exchange_seconds_last": 0.0,
+        "timeouts": 0,
+        "client_exits": 0,
+        "client_exit_detection_seconds": 0.0,  # from the exit of the client process to the exception
+    }
+
+
+def record_exchange(metrics: Dict[str, float], seconds: float) -> None:
+    metrics["exchanges"] += 1
+    metrics["exchange_seconds_total"] += seconds
+    metrics["exchange_seconds_max"] = max(metrics["exchange_seconds_max"], seconds)
+    metrics["exchange_seconds_last"] = seconds
+
+
+class ClientExitedException(Exception):
+    pass
+
 
 class RpcCommunicator:
-    def __init__(self, port: int):
+    def __init__(self, port: int, num_envs: Optional[int] = None):
         """
         Python side of the grpc communication. Python is the server and game is the client
 
         :int port: Port number to communicate with game environment.
+        :int num_envs: If given, the game client hosts this many scenes and talks through GetBatchAction,
+            so INIT and CLOSE are sent as a BatchActionProto addressed to every scene.
         """
         self.port = port
+        self.num_envs = num_envs
         self.server = None
         self.unity_to_external = None
         self.is_open = False
+        self.metrics = new_metrics()
+        self._client_exit_time: Optional[float] = None
         self.create_server()
 
     def create_server(self):
@@ -66,7 +163,19 @@ class RpcCommunicator:
                 "or use a different port."
             )
 
-    def poll_for_timeout(self, poll_callback: Optional[PollCallback] = None) -> None:
+    def watch_process(self, process: subprocess.Popen) -> None:
+        """
+        Close the connection as soon as the game client process exits, so that a pending or later exchange
+        fails immediately instead of waiting for its deadline.
+        """
+        def watch():
+            process.wait()
+            self._client_exit_time = time.monotonic()
+            self.unity_to_external.parent_conn.close()
+
+        threading.Thread(target=watch, daemon=True).start()
+
+    def poll_for_timeout(self, poll_callback: Optional[PollCallback] = None, timeout: Optional[float] = 30) -> None:
         """
         Polls the GRPC parent connection for data, to be used before calling recv.  This prevents
         us from hanging indefinitely in the case where the environment process has died or was not
@@ -75,38 +184,59 @@ class RpcCommunicator:
         Additionally, a callback can be passed to periodically check the state of the environment.
         This is used to detect the case when the environment dies without cleaning up the connection,
         so that we can stop sooner and raise a more appropriate error.
+
+        :float timeout: Seconds to wait for a response before raising an exception. None waits forever.
         """
-        # TODO: remove timeout 
-        timeout_wait = 30  # Timeout (in seconds) to wait for a response before exiting.
-        deadline = time.monotonic() + timeout_wait
-        callback_timeout_wait = timeout_wait // 10
-        while time.monotonic() < deadline:
-            if self.unity_to_external.parent_conn.poll(callback_timeout_wait):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        interval = MIN_POLL_INTERVAL
+        while True:
+            wait = interval if deadline is None else min(interval, deadline - time.monotonic())
+            if wait <= 0:
+                break
+            if self.unity_to_external.parent_conn.poll(wait):
                 # Got an acknowledgment from the connection
                 return
             if poll_callback:
                 # Fire the callback - if it detects something wrong, it should raise an exception.
                 poll_callback()
+            interval = min(interval * 2, MAX_POLL_INTERVAL)
 
         # Got this far without reading any data from the connection, so it must be dead.
-        raise Exception("Time out. The game environment took too long to respond.\n")
+        self.metrics["timeouts"] += 1
+        raise Exception(f"Time out. The game environment did not respond in {timeout} seconds.\n")
+
+    def _recv(self, poll_callback: Optional[PollCallback], timeout: Optional[float]):
+        self.poll_for_timeout(poll_callback, timeout)
+        try:
+            return self.unity_to_external.parent_conn.recv()
+        except EOFError:
+            self.metrics["client_exits"] += 1
+            if self._client_exit_time is not None:
+                self.metrics["client_exit_detection_seconds"] = time.monotonic() - self._client_exit_time
+            raise ClientExitedException("Game client exited")
 
     def initialize(
-        self, poll_callback: Optional[PollCallback] = None, env_config={}
+        self, poll_callback: Optional[PollCallback] = None, env_config={}, timeout: Optional[float] = 30
     ) -> ObservationProto:
-        self.poll_for_timeout(poll_callback)
-        init_obs = self.unity_to_external.parent_conn.recv()
-        inputs = ActionProto(type="INIT", json_actions=json.dumps(env_config))
+        start = time.perf_counter()
+        init_obs = self._recv(poll_callback, timeout)
+        inputs = to_all_envs(ActionProto(type="INIT", json_actions=json.dumps(env_config)), self.num_envs)
         self.unity_to_external.parent_conn.send(inputs)
-        self.unity_to_external.parent_conn.recv()
+        self._recv(poll_callback, timeout)
+        self.metrics["initialize_seconds"] = time.perf_counter() - start
         return init_obs
 
     def exchange(
-        self, inputs: ActionProto, poll_callback: Optional[PollCallback] = None
+        self, inputs: ActionProto, poll_callback: Optional[PollCallback] = None, timeout: Optional[float] = 30
     ) -> Optional[ObservationProto]:
-        self.unity_to_external.parent_conn.send(inputs)
-        self.poll_for_timeout(poll_callback)
-        output = self.unity_to_external.parent_conn.recv()
+        start = time.perf_counter()
+        try:
+            self.unity_to_external.parent_conn.send(inputs)
+        except OSError:
+            # Closed by watch_process()
+            raise ClientExitedException("Game client exited")
+        output = self._recv(poll_callback, timeout)
+        record_exchange(self.metrics, time.perf_counter() - start)
         return output
 
     def close(self):
@@ -114,8 +244,142 @@ class RpcCommunicator:
         Sends a shutdown signal to the unity environment, and closes the grpc connection.
         """
         if self.is_open:
-            message_input = ActionProto(type="CLOSE")
-            self.unity_to_external.parent_conn.send(message_input)
+            message_input = to_all_envs(ActionProto(type="CLOSE"), self.num_envs)
+            try:
+                self.unity_to_external.parent_conn.send(message_input)
+            except OSError:
+                # The client has already exited
+                pass
             self.unity_to_external.parent_conn.close()
             self.server.stop(False)
             self.is_open = False
+
+
+# Put into the observation queue of AsyncCommunicatorServicerImplementation when the client process exits
+_CLIENT_EXITED = object()
+
+
+class AsyncCommunicatorServicerImplementation(CommunicatorServicer):
+    """The handlers run on the event loop and hand the messages over through asyncio queues."""
+
+    def __init__(self):
+        self.observations: asyncio.Queue = asyncio.Queue()
+        self.actions: asyncio.Queue = asyncio.Queue()
+
+    async def GetAction(self, request, context):
+        await self.observations.put(request)
+        return await self.actions.get()
+
+    async def GetBatchAction(self, request, context):
+        await self.observations.put(request)
+        return await self.actions.get()
+
+
+class AsyncRpcCommunicator:
+    def __init__(self, port: int, num_envs: Optional[int] = None):
+        """
+        The asyncio version of RpcCommunicator, based on grpc.aio. Waiting for the game client does not block the event loop,
+        so one event loop can drive many environments. create_server() must be awaited before use.
+
+        :int port: Port number to communicate with game environment.
+        :int num_envs: See RpcCommunicator.
+        """
+        self.port = port
+        self.num_envs = num_envs
+        self.server = None
+        self.unity_to_external = None
+        self.is_open = False
+        self.metrics = new_metrics()
+        self._client_exit_time: Optional[float] = None
+
+    async def create_server(self):
+        """
+        Creates the GRPC server.
+        """
+        try:
+            self.server = grpc.aio.server(options=(("grpc.so_reuseport", 1),))
+            self.unity_to_external = AsyncCommunicatorServicerImplementation()
+            add_CommunicatorServicer_to_server(self.unity_to_external, self.server)
+            self.server.add_insecure_port("[::]:" + str(self.port))
+            await self.server.start()
+            self.is_open = True
+        except Exception:
+            raise Exception(
+                "Worker In Use:\n"
+                f"Couldn't start communication because port {self.port} is still in use. "
+                "You may need to manually close a previously opened environment "
+                "or use a different port."
+            )
+
+    def watch_process(self, process: subprocess.Popen) -> None:
+        """
+        Wake up the pending receive() as soon as the game client process exits. Must be called from the event loop.
+        """
+        loop = asyncio.get_running_loop()
+
+        def watch():
+            process.wait()
+            self._client_exit_time = time.monotonic()
+            try:
+                loop.call_soon_threadsafe(self.unity_to_external.observations.put_nowait, _CLIENT_EXITED)
+            except RuntimeError:
+                # The event loop has already been closed after a normal shutdown
+                pass
+
+        threading.Thread(target=watch, daemon=True).start()
+
+    async def receive(self, poll_callback: Optional[PollCallback] = None, timeout: Optional[float] = 30):
+        """
+        Wait for the next message from the game client. It returns as soon as the message arrives,
+        and fires poll_callback with the same backoff as RpcCommunicator.poll_for_timeout() while waiting.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        interval = MIN_POLL_INTERVAL
+        while True:
+            wait = interval if deadline is None else min(interval, deadline - time.monotonic())
+            if wait <= 0:
+                break
+            try:
+                output = await asyncio.wait_for(self.unity_to_external.observations.get(), wait)
+            except asyncio.TimeoutError:
+                if poll_callback:
+                    poll_callback()
+                interval = min(interval * 2, MAX_POLL_INTERVAL)
+                continue
+            if output is _CLIENT_EXITED:
+                self.metrics["client_exits"] += 1
+                self.metrics["client_exit_detection_seconds"] = time.monotonic() - self._client_exit_time
+                raise ClientExitedException("Game client exited")
+            return output
+        self.metrics["timeouts"] += 1
+        raise Exception(f"Time out. The game environment did not respond in {timeout} seconds.\n")
+
+    async def initialize(
+        self, poll_callback: Optional[PollCallback] = None, env_config={}, timeout: Optional[float] = 30
+    ) -> ObservationProto:
+        start = time.perf_counter()
+        init_obs = await self.receive(poll_callback, timeout)
+        inputs = to_all_envs(ActionProto(type="INIT", json_actions=json.dumps(env_config)), self.num_envs)
+        await self.unity_to_external.actions.put(inputs)
+        await self.receive(poll_callback, timeout)
+        self.metrics["initialize_seconds"] = time.perf_counter() - start
+        return init_obs
+
+    async def exchange(
+        self, inputs: ActionProto, poll_callback: Optional[PollCallback] = None, timeout: Optional[float] = 30
+    ) -> Optional[ObservationProto]:
+        start = time.perf_counter()
+        await self.unity_to_external.actions.put(inputs)
+        output = await self.receive(poll_callback, timeout)
+        record_exchange(self.metrics, time.perf_counter() - start)
+        return output
+
+    async def close(self):
+        """
+        Sends a shutdown signal to the unity environment, and closes the grpc connection.
+        """
+        if self.is_open:
+            await self.unity_to_external.actions.put(to_all_envs(ActionProto(type="CLOSE"), self.num_envs))
+            # The grace period lets the pending GetAction call return CLOSE to the client
+            await self.server.stop(1)
+            self.is_open = False
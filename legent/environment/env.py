@@ -1,43 +1,48 @@
 from typing import Optional, Dict
 import subprocess
-from legent.environment.env_utils import launch_executable, download_env, get_default_env_path
+from legent.environment.env_utils import launch_executable, launch_fake_client, download_env, get_default_env_path
 from legent.protobuf.communicator_pb2 import ActionProto, ObservationProto
 from legent.environment.communicator import RpcCommunicator
 from legent.action.action import Action, ResetInfo
 from legent.action.observation import Observation
-from legent.server.scene_generator import generate_scene
+from legent.server.scene_pool import ScenePool, next_scene
 from legent.utils.io import log
 from legent.utils.config import CLIENT_FOLDER
+from legent.utils.profiler import Profiler, phase
 import os
 
 
+# Default seconds to wait for the game client on initialization, on a reset and on other steps.
+# Override them with run_options["init_timeout"], run_options["reset_timeout"] and run_options["step_timeout"]. None waits forever.
+DEFAULT_TIMEOUTS = {"init": 120, "reset": 120, "step": 30}
+
+
 class Environment:
-    def __init__(self, env_path: Optional[str] = None, run_options: Dict = {}, use_animation=True, camera_resolution=448, camera_field_of_view=120):
+    # Number of scenes hosted by the game client. None means a single scene talking through GetAction.
+    _num_envs: Optional[int] = None
+
+    def __init__(self, env_path: Optional[str] = None, run_options: Dict = {}, use_animation=True, camera_resolution=448, camera_field_of_view=120, use_raw_image=False, profile=False, scene_pool: Optional[ScenePool]=None):
         self._process: Optional[subprocess.Popen] = None
+        # reset() without a scene takes one from scene_pool (or the default pool) instead of generating it in place
+        self._scene_pool = scene_pool
+        # profile=True, or the LEGENT_PROFILE environment variable, records the time of each phase of the steps. See stats().
+        self._profiler = Profiler.from_env() or (Profiler() if profile else None)
         # RPC is a one-to-one communication method, with each pair of python worker and game client using the same port.
-        # If there are multiple environments, multiple different ports are required.
+        # If there are multiple environments, multiple different ports are required, or use BatchedEnvironment to host them in one client.
         port = run_options.get("port", 50051)
-        self._communicator = RpcCommunicator(port)
+        self._timeouts = get_timeouts(run_options)
+        self._communicator = RpcCommunicator(port, self._num_envs)
         welcome()
 
-        # If the environment name is None, a new environment will not be launched
-        # and the communicator will directly try to connect to an existing unity environment (Unity Editor, or an executable file manually open).
-        if env_path == 'auto': # TODO: check if up to date
-            if not os.path.exists(CLIENT_FOLDER):
-                download_env()
-            env_path = get_default_env_path()
-        if env_path is not None:
-            try:
-                self._process = launch_executable(file_name=env_path, args=[
-                    "--width", str(run_options.get("width", 640)), "--height", str(run_options.get("width", 480)),
-                    "--port", str(port)
-                ])
-            except Exception:
-                self.close()
-                raise
-        else:
-            print(f"Listening on port {port}. " f"Start inference or training by launching the LEGENT environment client.")
-        self._communicator.initialize(self._poll_process, {"use_animation": use_animation, "camera_resolution": camera_resolution, "camera_field_of_view": camera_field_of_view})
+        try:
+            self._process = launch_client(env_path, run_options, port, self._num_envs)
+        except Exception:
+            self.close()
+            raise
+        if self._process is not None:
+            # Fail at once if the client crashes, instead of at the deadline
+            self._communicator.watch_process(self._process)
+        self._communicator.initialize(self._poll_process, env_config(use_animation, camera_resolution, camera_field_of_view, use_raw_image), self._timeouts["init"])
 
     def _poll_process(self) -> None:
         """
@@ -49,29 +54,45 @@ class Environment:
         if poll_res is not None:
             raise Exception("Game client exited")
 
-    def step(self, inputs: Optional[Action]=None) -> Observation:
+    @property
+    def metrics(self) -> Dict[str, float]:
+        """Timings of the communication with the game client. See communicator.new_metrics()."""
+        return self._communicator.metrics
+
+    def stats(self) -> Dict[str, Dict]:
+        """
+        Histograms of the time of each phase of the steps, such as action_build, reset_info_serialize, exchange (sending
+        the action and waiting for the client), image_decode and game_states_parse. Empty if profiling is not enabled.
+        """
+        return self._profiler.stats() if self._profiler is not None else {}
+
+    def step(self, inputs: Optional[Action]=None, timeout: Optional[float]=None) -> Observation:
         # TODO: refine code comments
+        # timeout: seconds to wait for the observation. By default the reset or step timeout of run_options.
         if inputs is None:
             inputs = Action()
-        if isinstance(inputs, Action):
-            inputs = inputs.build()
-        outputs = self._communicator.exchange(inputs, self._poll_process)
-        return Observation(outputs)
+        inputs = build_inputs(inputs, self._profiler)
+        if timeout is None:
+            timeout = self._timeouts["reset" if inputs.type == "RESET" else "step"]
+        with phase(self._profiler, "exchange"):
+            outputs = self._communicator.exchange(inputs, self._poll_process, timeout)
+        return Observation(outputs, self._profiler)
 
-    def reset(self, inputs: Optional[ResetInfo]=None) -> Observation:
+    def reset(self, inputs: Optional[ResetInfo]=None, timeout: Optional[float]=None) -> Observation:
         # NOTE: This design is different from most RL environments, as 
         # all terminal decisions are made by the backend, allowing reset() and step() to be called in the same way.
         if inputs is None:
-            inputs = ResetInfo(scene=generate_scene())
-        if isinstance(inputs, Action) or isinstance(inputs, ResetInfo):
-            inputs = inputs.build()
-        return self.step(inputs)
+            with phase(self._profiler, "scene_generation"):
+                inputs = ResetInfo(scene=next_scene(self._scene_pool))
+        return self.step(inputs, timeout)
 
     def close(self) -> None:
         """
         Close the communicator and environment subprocess (if necessary).
         """
         self._communicator.close()
+        if self._profiler is not None:
+            self._profiler.dump()
         if self._process is not None:
             # Wait a bit for the process to shutdown, but kill it if it takes too long
             timeout = 60 # Number of seconds to wait for the environment to shut down beforeforce-killing it.
@@ -90,6 +111,55 @@ class Environment:
             self.close()
             
 
+def launch_client(env_path: Optional[str], run_options: Dict, port: int, num_envs: Optional[int] = None) -> Optional[subprocess.Popen]:
+    """
+    Launch the game client that connects to the given port, and return its process.
+    """
+    # If the environment name is None, a new environment will not be launched
+    # and the communicator will directly try to connect to an existing unity environment (Unity Editor, or an executable file manually open).
+    if env_path is None:
+        print(f"Listening on port {port}. " f"Start inference or training by launching the LEGENT environment client.")
+        return None
+    if env_path == 'auto': # TODO: check if up to date
+        if not os.path.exists(CLIENT_FOLDER):
+            download_env()
+        env_path = get_default_env_path()
+    args = [
+        "--width", str(run_options.get("width", 640)), "--height", str(run_options.get("width", 480)),
+        "--port", str(port)
+    ]
+    if num_envs is not None:
+        args += ["--num_envs", str(num_envs)]
+    # env_path='fake' launches a stand-in client written in Python, for testing without Unity.
+    if env_path == 'fake':
+        return launch_fake_client(args)
+    return launch_executable(file_name=env_path, args=args)
+
+
+def build_inputs(inputs, profiler: Optional[Profiler] = None) -> ActionProto:
+    """Convert an Action or a ResetInfo into the message to send, recording the time as a phase."""
+    if isinstance(inputs, ResetInfo):
+        with phase(profiler, "reset_info_serialize"):
+            return inputs.build()
+    if isinstance(inputs, Action):
+        with phase(profiler, "action_build"):
+            return inputs.build()
+    return inputs
+
+
+def get_timeouts(run_options: Dict) -> Dict[str, Optional[float]]:
+    return {name: run_options.get(f"{name}_timeout", timeout) for name, timeout in DEFAULT_TIMEOUTS.items()}
+
+
+def env_config(use_animation=True, camera_resolution=448, camera_field_of_view=120, use_raw_image=False) -> Dict:
+    """
+    The settings sent to the game client on initialization.
+    """
+    # use_raw_image=True asks the client to send uncompressed RGB pixels instead of PNG, which skips the per-step image decoding.
+    image_format = "raw" if use_raw_image else "png"
+    return {"use_animation": use_animation, "camera_resolution": camera_resolution, "camera_field_of_view": camera_field_of_view, "image_format": image_format}
+
+
 def welcome() -> None:  
     print(r"""
  ___       ________   ________   ________   ________   _________   
@@ -1,6 +1,7 @@
 import glob
 import os
 import subprocess
+import sys
 from sys import platform
 from typing import Optional, List
 import requests
@@ -131,6 +132,19 @@ def launch_executable(file_name: str, args: List[str]) -> subprocess.Popen:
             ) from perm
 
 
+def launch_fake_client(args: List[str]) -> subprocess.Popen:
+    """
+    Launches legent.environment.fake_client, a stand-in for the game client used for testing without Unity.
+    :param args: List of string that will be passed as command line arguments, the same as for the real client.
+    """
+    return subprocess.Popen(
+        [sys.executable, "-m", "legent.environment.fake_client"] + args,
+        start_new_session=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
 def download_file(url, file_path):
     folder_path, _ = os.path.split(file_path)
     if not os.path.exists(folder_path):
@@ -0,0 +1,153 @@
+"""
+A stand-in for the game client, for testing the Python side without launching Unity.
+
+It talks to the Python server with the same protocol as the real client (GetAction, or GetBatchAction when hosting
+several scenes) and keeps a minimal state for each scene: the agent moves with teleport_forward and rotate_right,
+the instances come from the scene of the last RESET, and the image is a flat color that changes every step.
+
+Usage:
+    python -m legent.environment.fake_client --port 50051 [--num_envs 4]
+"""
+from typing import Dict, List
+import argparse
+import io
+import json
+import math
+import grpc
+import numpy as np
+from PIL import Image
+from legent.protobuf.communicator_pb2 import ActionProto, ObservationProto, BatchObservationProto
+from legent.protobuf.communicator_pb2_grpc import CommunicatorStub
+from legent.utils.scene_format import decode_scene
+
+
+def _vec(position: List[float]) -> Dict:
+    return {"x": position[0], "y": position[1], "z": position[2]}
+
+
+class FakeScene:
+    def __init__(self):
+        self.config = {}
+        self.steps = 0
+        self.scene = {"instances": []}
+        self.agent_position = [0.0, 0.05, 0.0]
+        self.agent_yaw = 0.0  # degrees
+        self.player_position = [0.0, 0.05, 0.0]
+
+    def apply(self, action: ActionProto) -> None:
+        if action.type == "INIT":
+            self.config = json.loads(action.json_actions)
+        elif action.type == "RESET":
+            self.scene = decode_scene(action.binary_scene) if action.binary_scene else json.loads(action.json_actions)
+            self.steps = 0
+            if "agent" in self.scene:
+                self.agent_position = list(self.scene["agent"]["position"])
+                self.agent_yaw = self.scene["agent"]["rotation"][1]
+            if "player" in self.scene:
+                self.player_position = list(self.scene["player"]["position"])
+        elif action.type == "STEP" and len(action.float_actions) >= 7:
+            # float_actions: move_right, move_forward, rotate_right, rotate_down, jump, grab, teleport_forward
+            self.agent_yaw = (self.agent_yaw + action.float_actions[2]) % 360
+            forward = self.forward()
+            self.agent_position[0] += forward[0] * action.float_actions[6]
+            self.agent_position[2] += forward[2] * action.float_actions[6]
+        self.steps += 1
+
+    def forward(self) -> List[float]:
+        yaw = math.radians(self.agent_yaw)
+        return [math.sin(yaw), 0.0, math.cos(yaw)]
+
+    def observe(self, action: ActionProto = None) -> ObservationProto:
+        game_states = {
+            "instances": [{"prefab": instance["prefab"], "position": _vec(instance["position"])} for instance in self.scene.get("instances", [])],
+            "agent": {"position": _vec(self.agent_position), "forward": _vec(self.forward())},
+            "agent_camera": {"position": _vec([self.agent_position[0], 1.5, self.agent_position[2]]), "forward": _vec(self.forward())},
+            "player": {"position": _vec(self.player_position)},
+            "agent_grab_instance": -1,
+            "steps": self.steps,
+        }
+        obs = ObservationProto(type=action.type if action is not None else "INIT", game_states=json.dumps(game_states))
+        if action is not None and action.api_calls:
+            calls = json.loads(action.api_calls)["calls"]
+            if calls:
+                obs.api_returns = json.dumps({"corners": [_vec(self.agent_position)]})
+        if action is None or not action.skip_image:
+            self.render(obs)
+        return obs
+
+    def render(self, obs: ObservationProto) -> None:
+        resolution = self.config.get("camera_resolution", 64)
+        image = np.full((resolution, resolution, 3), self.steps % 256, dtype=np.uint8)
+        if self.config.get("image_format") == "raw":
+            obs.image = image.tobytes()
+            obs.image_format = "raw"
+            obs.image_shape.extend(image.shape)
+        else:
+            buffer = io.BytesIO()
+            Image.fromarray(image).save(buffer, format="PNG")
+            obs.image = buffer.getvalue()
+
+
+class FakeClient:
+    def __init__(self, port: int = 50051, num_envs: int = None):
+        """
+        :int port: Port of the Python server.
+        :int num_envs: Number of scenes to host. If None, a single scene is hosted and GetAction is used.
+        """
+        self.port = port
+        self.num_envs = num_envs
+        self.scenes = [FakeScene() for _ in range(num_envs or 1)]
+
+    def run(self) -> None:
+        """Serve the Python side until it sends CLOSE or goes away."""
+        with grpc.insecure_channel(f"localhost:{self.port}") as channel:
+            grpc.channel_ready_future(channel).result(timeout=60)
+            stub = CommunicatorStub(channel)
+            try:
+                if self.num_envs is None:
+                    self._run_single(stub)
+                else:
+                    self._run_batched(stub)
+            except grpc.RpcError:
+                # The server was stopped
+                pass
+
+    def _run_single(self, stub: CommunicatorStub) -> None:
+        scene = self.scenes[0]
+        obs = scene.observe()
+        while True:
+            action = stub.GetAction(obs)
+            if action.type == "CLOSE":
+                return
+            scene.apply(action)
+            obs = scene.observe(action)
+
+    def _run_batched(self, stub: CommunicatorStub) -> None:
+        env_ids = list(range(self.num_envs))
+        batch = BatchObservationProto(env_ids=env_ids, observations=[scene.observe() for scene in self.scenes])
+        while True:
+            batch_action = stub.GetBatchAction(batch)
+            if any(action.type == "CLOSE" for action in batch_action.actions):
+                return
+            # Only the scenes that received an action are stepped and observed
+            batch = BatchObservationProto()
+            for env_id, action in zip(batch_action.env_ids, batch_action.actions):
+                scene = self.scenes[env_id]
+                scene.apply(action)
+                batch.env_ids.append(env_id)
+                batch.observations.append(scene.observe(action))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=50051)
+    parser.add_argument("--num_envs", type=int, default=None)
+    # Accepted for compatibility with the arguments passed to the real client
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+    FakeClient(args.port, args.num_envs).run()
+
+
+if __name__ == "__main__":
+    main()
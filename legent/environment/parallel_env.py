@@ -1,152 +1,312 @@
-from typing import Dict, NamedTuple, List
-from multiprocessing import Process, Pipe, Queue
+from typing import Callable, Dict, NamedTuple, List, Optional, Sequence, Union
+import multiprocessing
 from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from multiprocessing.queues import Queue
 from queue import Empty as EmptyQueueException
+import time
+import numpy as np
 from legent.protobuf.communicator_pb2 import ActionProto, ObservationProto
 from legent.environment.env import Environment
+from legent.action.action import Action, ResetInfo
+from legent.action.observation import Observation
+
+ParallelInput = Union[Action, ResetInfo, ActionProto, None]
 
 
 class EnvResponse(NamedTuple):
     worker_id: int
-    observations: ObservationProto
+    generation: int  # which launch of the worker sent this, so responses from a crashed worker can be ignored
+    observation: Observation  # without the image if it was written into the shared memory ring
+    slot: int  # the ring slot holding the image, -1 if the image is still in the observation
+    done: bool
+    final_observation: Optional[Observation]  # the last observation of the episode, when the env was auto reset
+
+
+class StepResult(NamedTuple):
+    observations: List[Observation]  # each with its own copy of the image, safe to keep across steps
+    # (num_envs, height, width, 3), None if some images are missing or differ in size.
+    # With shared memory it is a view of a ring slot, which is overwritten ring_size steps later, so copy it to keep it longer.
+    images: Optional[np.ndarray]
+    dones: np.ndarray  # (num_envs,) bool, True if the episode ended and the env was reset
+    final_observations: List[Optional[Observation]]  # the last observations of the ended episodes, None for the others
 
 
 class EnvWorker:
-    def __init__(self, process: Process, worker_id: int, conn: Connection):
+    def __init__(self, process: multiprocessing.Process, worker_id: int, conn: Connection, generation: int = 0):
         self.process = process
         self.worker_id = worker_id
         self.conn = conn
+        self.generation = generation
         self.waiting_obs = False
-        self.alive = True
+        self.restarts = 0
+
+    def send(self, actions: ActionProto, slot: int = -1) -> None:
+        self.conn.send((actions, slot))
+
+
+class ImageRing:
+    """Images of shape (ring_size, num_envs, height, width, 3) in shared memory.
+
+    Workers write the image of each step into [slot, worker_id], so only small messages go through the step queue
+    and the images of one step are already stacked in [slot].
+    """
+
+    def __init__(self, ring_size: int, num_envs: int, resolution: int, name: Optional[str] = None):
+        self.shape = (ring_size, num_envs, resolution, resolution, 3)
+        size = int(np.prod(self.shape))
+        if name is None:
+            self.memory = SharedMemory(create=True, size=size)
+        else:
+            # Workers share the resource tracker of the parent process, so attaching does not add another registration.
+            # Only the parent unlinks the memory.
+            self.memory = SharedMemory(name=name)
+        self.images = np.ndarray(self.shape, dtype=np.uint8, buffer=self.memory.buf)
 
-    def send(self, actions: ActionProto) -> None:
-        self.conn.send(actions)
+    @property
+    def name(self) -> str:
+        return self.memory.name
 
-    def recv(self) -> EnvResponse:
-        return self.conn.recv()
+    def close(self, unlink: bool = False) -> None:
+        self.images = None
+        try:
+            self.memory.close()
+        except BufferError:
+            # Views handed out by step_wait() are still alive. The memory is released when they are garbage collected.
+            pass
+        if unlink:
+            self.memory.unlink()
 
 
-def worker(parent_conn: Connection, step_queue: Queue, worker_id: int, run_options: Dict) -> None:
+def worker(
+    parent_conn: Connection, step_queue: Queue, worker_id: int, generation: int, ring_info: Optional[tuple], env_path: str, run_options: Dict, env_kwargs: Dict,
+    is_done: Optional[Callable[[Observation], bool]], make_reset_info: Optional[Callable[[], ResetInfo]]
+) -> None:
+    env = None
+    ring = ImageRing(*ring_info) if ring_info else None
     try:
-        # Each worker has its own Environment.
-        run_options["port"] = 50051 + worker_id
-        env = Environment(file_name=run_options["file_name"], run_options=run_options)
+        # Each worker has its own Environment and port.
+        run_options = dict(run_options, port=run_options.get("port", 50051) + worker_id)
+        env = Environment(env_path=env_path, run_options=run_options, **env_kwargs)
+
+        def reset() -> Observation:
+            return env.reset(make_reset_info() if make_reset_info else None)
+
         while True:
             # The parent_conn only needs to use recv() and does not need to send(), as return values are conveyed through the step_queue.
-            actions: ActionProto = parent_conn.recv()
-            if actions.type == "STEP" or actions.type == "RESET":
-                observations = env.step(actions)
-                step_queue.put(EnvResponse(worker_id, observations))
-            elif actions.type == "CLOSE":
+            actions, slot = parent_conn.recv()
+            if actions.type == "CLOSE":
                 break
+            if actions.type == "RESET" and not actions.json_actions and not actions.binary_scene:
+                # A RESET without a scene (JSON or binary) asks the worker to create one
+                observation = reset()
+            else:
+                observation = env.step(actions)
+            final_observation = None
+            done = bool(is_done is not None and is_done(observation))
+            if done:
+                final_observation, observation = observation, reset()
+            if ring is not None and slot >= 0 and observation.image is not None and observation.image.shape == ring.shape[2:]:
+                # The image is decoded here in the worker and copied once into the shared memory
+                ring.images[slot, worker_id] = observation.image
+                observation.detach_image()
+            else:
+                slot = -1
+            step_queue.put(EnvResponse(worker_id, generation, observation, slot, done, final_observation))
     except Exception as e:
-        raise
+        step_queue.put(EnvResponse(worker_id, generation, Observation(ObservationProto(type="EXITED", text=repr(e))), -1, True, None))
     finally:
-        env.close()
+        if env is not None:
+            env.close()
+        if ring is not None:
+            ring.close()
         parent_conn.close()
-        step_queue.put(EnvResponse(worker_id, ObservationProto(type="EXITED")))
-        step_queue.close()
 
 
 class ParallelEnvironment:
-    def __init__(self, file_name, num_envs: int = 1, run_options: Dict = {}):
-        run_options["file_name"] = file_name
+    def __init__(
+        self, env_path: str, num_envs: int = 1, run_options: Dict = {}, env_kwargs: Dict = {},
+        is_done: Optional[Callable[[Observation], bool]] = None, make_reset_info: Optional[Callable[[], ResetInfo]] = None,
+        timeout: Optional[float] = 300, max_restarts: int = 3, start_method: str = "spawn",
+        use_shared_memory: bool = True, ring_size: int = 2
+    ):
+        """
+        A vectorized environment. Each env runs an Environment and its game client in a worker process,
+        and all of them are stepped together.
+
+        Args:
+            env_path: The env_path of every Environment. Use "fake" to test without the game.
+            num_envs: Number of environments. The i-th one uses port run_options["port"] (default 50051) + i.
+            run_options: The run_options of every Environment.
+            env_kwargs: Other keyword arguments of every Environment, such as camera_resolution.
+            is_done: Called on every observation in the worker. If it returns True, the env is reset automatically
+                and the done flag is set. It must be picklable (a module level function).
+            make_reset_info: Called in the worker to create the ResetInfo of every reset. If None, a new scene is generated.
+                It must be picklable (a module level function).
+            timeout: Seconds to wait in step_wait() before raising an exception. None waits forever.
+            max_restarts: How many times a crashed worker is restarted before giving up.
+            start_method: The multiprocessing start method. "spawn" is the safe choice when gRPC is used in the parent process.
+            use_shared_memory: Whether the workers return the images through a shared memory ring instead of pickling them.
+                Images that do not match camera_resolution (in env_kwargs) still go through the queue.
+            ring_size: Number of steps whose images are kept in the ring. StepResult.images of a step is valid until ring_size steps later.
+        """
         self.num_envs = num_envs
+        self.ring: Optional[ImageRing] = None
+        if use_shared_memory:
+            self.ring = ImageRing(ring_size, num_envs, env_kwargs.get("camera_resolution", 448))
+        self._steps = 0
+        self.timeout = timeout
+        self.max_restarts = max_restarts
+        self._context = multiprocessing.get_context(start_method)
+        self._worker_args = (env_path, run_options, env_kwargs, is_done, make_reset_info)
+        self.step_queue: Queue = self._context.Queue()
+        self.env_workers: List[EnvWorker] = [self._start_worker(worker_id) for worker_id in range(num_envs)]
+        self.closed = False
 
-        self.env_workers: List[EnvWorker] = []
-        self.step_queue: Queue = Queue()
-        # create env workers
-        for worker_id in range(num_envs):
-            parent_conn, child_conn = Pipe()
-            child_process = Process(
-                target=worker,
-                args=(child_conn, self.step_queue, worker_id, run_options)
-            )
-            child_process.start()
-            env_worker = EnvWorker(child_process, worker_id, parent_conn)
-            self.env_workers.append(env_worker)
-        self.workers_alive = self.num_envs
-
-        self.actions = [None for i in range(num_envs)]
-        self.reset()
-        # welcome()
-
-    def check_waiting(self):
-        for worker_id in range(self.num_envs):
-            env_worker = self.env_workers[worker_id]
-            if not env_worker.alive:
-                continue
-            if self.actions[worker_id] != None:
-                assert not env_worker.waiting_obs
-            else:
-                assert env_worker.waiting_obs
+    def _start_worker(self, worker_id: int, generation: int = 0) -> EnvWorker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=worker,
+            args=(child_conn, self.step_queue, worker_id, generation, self._ring_info()) + self._worker_args,
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return EnvWorker(process, worker_id, parent_conn, generation)
 
-    def worker_act(self, worker_id: int, actions: ActionProto):
-        self.actions[worker_id] = actions
+    def _ring_info(self) -> Optional[tuple]:
+        if self.ring is None:
+            return None
+        ring_size, num_envs, resolution = self.ring.shape[:3]
+        return (ring_size, num_envs, resolution, self.ring.name)
 
-    def worker_reset(self, worker_id):
-        self.actions[worker_id] = ActionProto(type="RESET")
+    def _slot(self) -> int:
+        # All the workers of one step write into the same slot
+        return self._steps % self.ring.shape[0] if self.ring is not None else -1
 
-    def worker_close(self, worker_id):
-        self.actions[worker_id] = ActionProto(type="CLOSE")
+    def _restart_worker(self, worker_id: int, reason: str) -> None:
+        env_worker = self.env_workers[worker_id]
+        if env_worker.restarts >= self.max_restarts:
+            raise Exception(f"Worker {worker_id} crashed {env_worker.restarts + 1} times, the last time because of: {reason}")
+        print(f"Worker {worker_id} crashed ({reason}). Restarting it.")
+        if env_worker.process.is_alive():
+            env_worker.process.terminate()
+        env_worker.process.join()
+        env_worker.conn.close()
+        new_worker = self._start_worker(worker_id, env_worker.generation + 1)
+        new_worker.restarts = env_worker.restarts + 1
+        self.env_workers[worker_id] = new_worker
+        # The episode is lost, so start a new one
+        new_worker.send(ActionProto(type="RESET"), self._slot())
+        new_worker.waiting_obs = True
 
-    def step(self) -> Dict[int, ObservationProto]:
+    def step_async(self, actions: Optional[Sequence[ParallelInput]] = None) -> None:
         """
-        Step the environment. Execute actions on specified environments and return observations that have been completed up to now.
-
-        Note that the observations paired with the actions may not be included in the current returns (may be included in the next call or later).
-        The actions and observations should be externally paired by using the worker_id.
+        Send one input to every environment without waiting for the observations.
 
         Args:
-            worker_actions (Dict[int, Dict]): A dictionary that maps worker_ids to actions. The worker_id-th environment will execute worker_actions[worker_id]. 
-                The worker_id that is not included indicates that no action should be executed, and the worker_id-th environment continues to wait for observations.
+            actions: One Action, ResetInfo or ActionProto per environment. None means the default Action().
+        """
+        if actions is None:
+            actions = [None] * self.num_envs
+        if len(actions) != self.num_envs:
+            raise Exception(f"Expected {self.num_envs} actions, got {len(actions)}")
+        for env_worker in self.env_workers:
+            if env_worker.waiting_obs:
+                raise Exception("step_async() is called again before step_wait()")
+        self._steps += 1
+        for env_worker, action in zip(self.env_workers, actions):
+            if action is None:
+                action = Action()
+            if isinstance(action, Action) or isinstance(action, ResetInfo):
+                action = action.build()
+            env_worker.send(action, self._slot())
+            env_worker.waiting_obs = True
 
-        Returns:
-            Dict[int, ObservationProto]: A dictionary that maps worker_ids to observations. Worker_obs[worker_id] is the observations of worker_id-th environment.
-                Returning {} indicates that all environments have been closed.
+    def step_wait(self, timeout: Optional[float] = None) -> StepResult:
+        """
+        Wait until all the environments have returned the observations of the inputs sent by step_async().
+        A worker that crashes is restarted and reset, and its done flag is set.
         """
-        self.check_waiting()
-
-        # Queue steps for any workers which aren't in the "waiting_obs" state.
-        for worker_id in range(self.num_envs):
-            env_worker = self.env_workers[worker_id]
-            if not env_worker.alive:
-                continue
-            if self.actions[worker_id] != None:
-                # assign action to env_worker according to worker_id
-                env_worker.send(self.actions[worker_id])
-                env_worker.waiting_obs = True
-        self.actions = [None for i in range(self.num_envs)]
-
-        worker_obs: Dict[int, ObservationProto] = {}
-        # Poll the step queue for completed steps from environment workers until we retrieve
-        # 1 or more, which we will then return as ObservationProto dict
-        while len(worker_obs) < 1:
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        responses: Dict[int, EnvResponse] = {}
+        crashed = set()
+        while any(env_worker.waiting_obs for env_worker in self.env_workers):
+            wait = 1.0 if deadline is None else min(1.0, deadline - time.monotonic())
+            if wait <= 0:
+                raise Exception("Time out. The game environments took too long to respond.\n")
             try:
-                while True:
-                    step: EnvResponse = self.step_queue.get_nowait()
-                    assert step.worker_id not in worker_obs
-                    self.env_workers[step.worker_id].waiting_obs = False
-                    worker_obs[step.worker_id] = step.observations
-                    if step.observations.type == "EXITED":
-                        self.env_workers[step.worker_id].alive = False
-                        self.workers_alive -= 1
-                        if self.workers_alive == 0:
-                            return {}
+                # Block instead of spinning, with a short timeout so that dead workers are noticed
+                response: EnvResponse = self.step_queue.get(timeout=wait)
             except EmptyQueueException:
-                pass
-        return worker_obs
+                response = None
+            if response is not None:
+                env_worker = self.env_workers[response.worker_id]
+                if response.generation != env_worker.generation:
+                    continue
+                if response.observation.type == "EXITED":
+                    crashed.add(response.worker_id)
+                    self._restart_worker(response.worker_id, response.observation.text)
+                    continue
+                env_worker.waiting_obs = False
+                responses[response.worker_id] = response
+            for env_worker in self.env_workers:
+                if env_worker.waiting_obs and not env_worker.process.is_alive():
+                    crashed.add(env_worker.worker_id)
+                    self._restart_worker(env_worker.worker_id, f"exit code {env_worker.process.exitcode}")
 
-    def reset(self) -> None:
-        for worker_id in range(self.num_envs):
-            self.worker_reset(worker_id)
+        observations = [responses[worker_id].observation for worker_id in range(self.num_envs)]
+        slots = [responses[worker_id].slot for worker_id in range(self.num_envs)]
+        for worker_id, slot in enumerate(slots):
+            if slot >= 0:
+                # NOTE: a copy, since the slot is overwritten ring_size steps later and observations are often kept
+                # (e.g. in a trajectory buffer). Only StepResult.images is a view of the ring.
+                observations[worker_id].image = self.ring.images[slot, worker_id].copy()
+        if self.ring is not None and all(slot == self._slot() for slot in slots):
+            images = self.ring.images[self._slot()]  # already stacked, no copy
+        else:
+            images = stack_images(observations)
+        dones = np.array([responses[worker_id].done or worker_id in crashed for worker_id in range(self.num_envs)], dtype=bool)
+        final_observations = [responses[worker_id].final_observation for worker_id in range(self.num_envs)]
+        return StepResult(observations, images, dones, final_observations)
+
+    def step(self, actions: Optional[Sequence[ParallelInput]] = None) -> StepResult:
+        self.step_async(actions)
+        return self.step_wait()
+
+    def reset(self, infos: Optional[Sequence[Optional[ResetInfo]]] = None) -> StepResult:
+        """
+        Reset all the environments. The environments without a given ResetInfo get a new scene created in the worker.
+        """
+        if infos is None:
+            infos = [None] * self.num_envs
+        return self.step([ActionProto(type="RESET") if info is None else info for info in infos])
 
     def close(self) -> None:
+        if self.closed:
+            return
+        for env_worker in self.env_workers:
+            try:
+                env_worker.send(ActionProto(type="CLOSE"))
+            except OSError:
+                pass
+        for env_worker in self.env_workers:
+            # Environment.close() waits for the game client, so give the worker a bit longer.
+            env_worker.process.join(timeout=70)
+            if env_worker.process.is_alive():
+                env_worker.process.terminate()
+                print("A ParallelEnvironment worker did not shut down correctly so it was forcefully terminated.")
+            env_worker.conn.close()
         self.step_queue.close()
-        # Sanity check to kill zombie workers and report an issue if they occur.
-        if self.workers_alive > 0:
-            for env_worker in self.env_workers:
-                if env_worker.process.is_alive():
-                    env_worker.process.terminate()
-                    print("A SubprocessEnvManager worker did not shut down correctly so it was forcefully terminated.")
         self.step_queue.join_thread()
+        if self.ring is not None:
+            self.ring.close(unlink=True)
+        self.closed = True
+
+
+def stack_images(observations: List[Observation]) -> Optional[np.ndarray]:
+    images = [observation.image for observation in observations]
+    if any(image is None for image in images) or len({image.shape for image in images}) != 1:
+        return None
+    return np.stack(images)
@@ -14,12 +14,14 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x12\x63ommunicator.proto\x12\x0c\x63ommunicator\"\x9d\x01\n\x10ObservationProto\x12\x0c\n\x04type\x18\x01 \x01(\t\x12\r\n\x05image\x18\x02 \x01(\x0c\x12\x0c\n\x04text\x18\x03 \x01(\t\x12\x13\n\x0bgame_states\x18\x04 \x01(\t\x12\x1a\n\x12\x66loat_observations\x18\x05 \x03(\x02\x12\x18\n\x10int_observations\x18\x06 \x03(\x05\x12\x13\n\x0b\x61pi_returns\x18\x07 \x01(\t\"~\n\x0b\x41\x63tionProto\x12\x0c\n\x04type\x18\x01 \x01(\t\x12\x0c\n\x04text\x18\x02 \x01(\t\x12\x14\n\x0cjson_actions\x18\x03 \x01(\t\x12\x15\n\rfloat_actions\x18\x04 \x03(\x02\x12\x13\n\x0bint_actions\x18\x05 \x03(\x05\x12\x11\n\tapi_calls\x18\x06 \x01(\t2X\n\x0c\x43ommunicator\x12H\n\tGetAction\x12\x1e.communicator.ObservationProto\x1a\x19.communicator.ActionProto\"\x00\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x12\x63ommunicator.proto\x12\x0c\x63ommunicator\"\xc8\x01\n\x10ObservationProto\x12\x0c\n\x04type\x18\x01 \x01(\t\x12\r\n\x05image\x18\x02 \x01(\x0c\x12\x0c\n\x04text\x18\x03 \x01(\t\x12\x13\n\x0bgame_states\x18\x04 \x01(\t\x12\x1a\n\x12\x66loat_observations\x18\x05 \x03(\x02\x12\x18\n\x10int_observations\x18\x06 \x03(\x05\x12\x13\n\x0b\x61pi_returns\x18\x07 \x01(\t\x12\x14\n\x0cimage_format\x18\x08 \x01(\t\x12\x13\n\x0bimage_shape\x18\t \x03(\x05\"\xa8\x01\n\x0b\x41\x63tionProto\x12\x0c\n\x04type\x18\x01 \x01(\t\x12\x0c\n\x04text\x18\x02 \x01(\t\x12\x14\n\x0cjson_actions\x18\x03 \x01(\t\x12\x15\n\rfloat_actions\x18\x04 \x03(\x02\x12\x13\n\x0bint_actions\x18\x05 \x03(\x05\x12\x11\n\tapi_calls\x18\x06 \x01(\t\x12\x12\n\nskip_image\x18\x07 \x01(\x08\x12\x14\n\x0c\x62inary_scene\x18\x08 \x01(\x0c\"^\n\x15\x42\x61tchObservationProto\x12\x0f\n\x07\x65nv_ids\x18\x01 \x03(\x05\x12\x34\n\x0cobservations\x18\x02 \x03(\x0b\x32\x1e.communicator.ObservationProto\"O\n\x10\x42\x61tchActionProto\x12\x0f\n\x07\x65nv_ids\x18\x01 \x03(\x05\x12*\n\x07\x61\x63tions\x18\x02 \x03(\x0b\x32\x19.communicator.ActionProto2\xb1\x01\n\x0c\x43ommunicator\x12H\n\tGetAction\x12\x1e.communicator.ObservationProto\x1a\x19.communicator.ActionProto\"\x00\x12W\n\x0eGetBatchAction\x12#.communicator.BatchObservationProto\x1a\x1e.communicator.BatchActionProto\"\x00\x62\x06proto3')
 
 
 
 _OBSERVATIONPROTO = DESCRIPTOR.message_types_by_name['ObservationProto']
 _ACTIONPROTO = DESCRIPTOR.message_types_by_name['ActionProto']
+_BATCHOBSERVATIONPROTO = DESCRIPTOR.message_types_by_name['BatchObservationProto']
+_BATCHACTIONPROTO = DESCRIPTOR.message_types_by_name['BatchActionProto']
 ObservationProto = _reflection.GeneratedProtocolMessageType('ObservationProto', (_message.Message,), {
   'DESCRIPTOR' : _OBSERVATIONPROTO,
   '__module__' : 'legent.protobuf.communicator_pb2'
@@ -34,14 +36,32 @@ ActionProto = _reflection.GeneratedProtocolMessageType('ActionProto', (_message.
   })
 _sym_db.RegisterMessage(ActionProto)
 
+BatchObservationProto = _reflection.GeneratedProtocolMessageType('BatchObservationProto', (_message.Message,), {
+  'DESCRIPTOR' : _BATCHOBSERVATIONPROTO,
+  '__module__' : 'legent.protobuf.communicator_pb2'
+  # @@protoc_insertion_point(class_scope:communicator.BatchObservationProto)
+  })
+_sym_db.RegisterMessage(BatchObservationProto)
+
+BatchActionProto = _reflection.GeneratedProtocolMessageType('BatchActionProto', (_message.Message,), {
+  'DESCRIPTOR' : _BATCHACTIONPROTO,
+  '__module__' : 'legent.protobuf.communicator_pb2'
+  # @@protoc_insertion_point(class_scope:communicator.BatchActionProto)
+  })
+_sym_db.RegisterMessage(BatchActionProto)
+
 _COMMUNICATOR = DESCRIPTOR.services_by_name['Communicator']
 if _descriptor._USE_C_DESCRIPTORS == False:
 
   DESCRIPTOR._options = None
   _OBSERVATIONPROTO._serialized_start=37
-  _OBSERVATIONPROTO._serialized_end=194
-  _ACTIONPROTO._serialized_start=196
-  _ACTIONPROTO._serialized_end=322
-  _COMMUNICATOR._serialized_start=324
-  _COMMUNICATOR._serialized_end=412
+  _OBSERVATIONPROTO._serialized_end=237
+  _ACTIONPROTO._serialized_start=240
+  _ACTIONPROTO._serialized_end=408
+  _BATCHOBSERVATIONPROTO._serialized_start=410
+  _BATCHOBSERVATIONPROTO._serialized_end=504
+  _BATCHACTIONPROTO._serialized_start=506
+  _BATCHACTIONPROTO._serialized_end=585
+  _COMMUNICATOR._serialized_start=588
+  _COMMUNICATOR._serialized_end=765
 # @@protoc_insertion_point(module_scope)
@@ -19,6 +19,11 @@ class CommunicatorStub(object):
                 request_serializer=communicator__pb2.ObservationProto.SerializeToString,
                 response_deserializer=communicator__pb2.ActionProto.FromString,
                 )
+        self.GetBatchAction = channel.unary_unary(
+                '/communicator.Communicator/GetBatchAction',
+                request_serializer=communicator__pb2.BatchObservationProto.SerializeToString,
+                response_deserializer=communicator__pb2.BatchActionProto.FromString,
+                )
 
 
 class CommunicatorServicer(object):
@@ -33,6 +38,14 @@ class CommunicatorServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GetBatchAction(self, request, context):
+        """The batched variant of GetAction, used when one game client hosts several scenes.
+        The observations of all the scenes are sent in one call and the actions are returned in one reply.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_CommunicatorServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -41,6 +54,11 @@ def add_CommunicatorServicer_to_server(servicer, server):
                     request_deserializer=communicator__pb2.ObservationProto.FromString,
                     response_serializer=communicator__pb2.ActionProto.SerializeToString,
             ),
+            'GetBatchAction': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetBatchAction,
+                    request_deserializer=communicator__pb2.BatchObservationProto.FromString,
+                    response_serializer=communicator__pb2.BatchActionProto.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'communicator.Communicator', rpc_method_handlers)
@@ -67,3 +85,20 @@ class Communicator(object):
             communicator__pb2.ActionProto.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def GetBatchAction(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/communicator.Communicator/GetBatchAction',
+            communicator__pb2.BatchObservationProto.SerializeToString,
+            communicator__pb2.BatchActionProto.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
@@ -13,7 +13,7 @@ from typing import (
 import numpy as np
 import pandas as pd
 from attr import field
-from attrs import define
+from attrs import define, evolve
 
 from .objects import ObjectDB
 from .types import Object, Vector3
@@ -166,188 +166,142 @@ class AssetGroup:
         return list(objects.values())
 
 
-class AssetGroupGenerator:
-    def __init__(
-        self,
-        name: str,  # The name of the asset group.
-        data: Dict[str, Any],  # The parsed json data of the asset group.
-        odb: ObjectDB,
-    ) -> None:
-        self.name = name
-        self.data = data
-        self.odb = odb
+@define(frozen=True)
+class AssetGroupTemplate:
+    """An asset group compiled once for all the AssetGroupGenerators of it (see get_asset_group_template).
 
-        self.__attrs_post_init__()
+    The assets of the group are flattened into tuples indexed by node, in the order sample_placement()
+    places them, which is the order of the former depth-first walk of treeData, so parents come before
+    their children. The possible assets of node i are the choices choice_starts[i]:choice_starts[i + 1].
+    """
 
-    def __attrs_post_init__(self):
-        """Preprocesses the asset group data to be in a better format.
+    name: str
 
-        - Tansforms asset_metadata[assetIds] from
-          [asset_type]: [...assetIds] to [...(asset_type, asset_id)].
-        - Transforms the asset database from [asset_type]: [...asset]
-          to [asset_type]: [...[asset_id]: [asset]].
-        """
-        self.data = copy.deepcopy(self.data)
-        self.cache = {}
-
-        def flatten_asset_ids() -> None:
-            """Tansforms asset_metadata[assetIds] from [asset_type]: [...assetIds]
-            to [...(asset_type, asset_id)] and filter assets by split.
-            """
-            for asset_metadata in self.data["assetMetadata"].values():
-                out = []
-                for asset_type, asset_ids in asset_metadata["assetIds"].items():
-                    for asset_id in asset_ids:
-                        # if self.pt_db.ASSET_ID_DATABASE[asset_id]["split"] in {
-                        #     None,
-                        #     self.split,
-                        # }:
-                        out.append((asset_type, asset_id))
-                if not out:
-                    raise Exception(f"No valid asset groups for {self.name} ! ")
-                    # raise Exception(
-                    #     f"No valid asset groups for {self.name} with {self.split} split!"
-                    # )
-                asset_metadata["assetIds"] = out
-
-        flatten_asset_ids()
+    instance_ids: Tuple[str, ...]
+    parents: Tuple[int, ...]
+    """The node of the parent of each node, -1 for the roots of treeData."""
 
-    @property
-    def dimensions(self) -> Vector3:
-        """Get the dimensions of the asset group.
+    asset_names: Tuple[str, ...]
+    """The "name" of each node in assetMetadata. Nodes with the same name get the same asset."""
 
-        The dimensions are set to the maximum possible extent of the asset
-        group, independently in each direction.
+    shown_asset_ids: Tuple[Optional[str], ...]
+    rotations: Tuple[float, ...]
+    dthetas: Tuple[float, ...]
+    x_positions: Tuple[float, ...]
+    z_positions: Tuple[float, ...]
+    anchors: Tuple[Optional[int], ...]
+    x_alignments: Tuple[Optional[int], ...]
+    z_alignments: Tuple[Optional[int], ...]
+    vertical_alignments: Tuple[Optional[str], ...]
 
-        TODO: Consider accounting for randomness in the dtheta dimensions.
-        """
-        if "dimensions" not in self.cache:
-            self._set_dimensions()
-        return self.cache["dimensions"]
+    choice_starts: Tuple[int, ...]
+    choice_types: Tuple[str, ...]
+    choice_ids: Tuple[str, ...]
+    choice_sizes: Tuple[Dict[str, float], ...]
+    choice_bounds: Tuple[Optional[Tuple[float, float, float, float]], ...]
+    """The (xmin, xmax, zmin, zmax) of each choice rotated around the origin, if its node has no rotation randomness."""
+
+    dimensions: Optional[Vector3] = None
+
+    @classmethod
+    def compile(cls, name: str, data: Dict[str, Any], odb: ObjectDB) -> "AssetGroupTemplate":
+        asset_metadata = data["assetMetadata"]
 
-    def _set_dimensions(self) -> None:
+        nodes = []
+        asset_stack = [(-1, tree) for tree in reversed(data["treeData"])]
+        while asset_stack:
+            parent, tree = asset_stack.pop()
+            node = len(nodes)
+            nodes.append((parent, str(tree["instanceId"])))
+            for child in tree.get("children", []):
+                asset_stack.append((node, child))
+
+        columns = {column: [] for column in [
+            "instance_ids", "parents", "asset_names", "shown_asset_ids", "rotations", "dthetas", "x_positions",
+            "z_positions", "anchors", "x_alignments", "z_alignments", "vertical_alignments", "choice_starts",
+            "choice_types", "choice_ids", "choice_sizes", "choice_bounds",
+        ]}
+        for parent, instance_id in nodes:
+            metadata = asset_metadata[instance_id]
+            position = metadata["position"]
+            columns["instance_ids"].append(instance_id)
+            columns["parents"].append(parent)
+            columns["asset_names"].append(metadata["name"])
+            columns["shown_asset_ids"].append(metadata.get("shownAssetId"))
+            columns["rotations"].append(metadata["rotation"])
+            columns["dthetas"].append(metadata["randomness"]["dtheta"])
+            columns["x_positions"].append(position["x"])
+            columns["z_positions"].append(position["z"])
+            columns["anchors"].append(position.get("relativeAnchorToParent"))
+            columns["x_alignments"].append(position.get("xAlignment"))
+            columns["z_alignments"].append(position.get("zAlignment"))
+            columns["vertical_alignments"].append(position.get("verticalAlignment"))
+
+            # NOTE: flatten assetIds from [asset_type]: [...assetIds] to [...(asset_type, asset_id)]
+            columns["choice_starts"].append(len(columns["choice_ids"]))
+            for asset_type, asset_ids in metadata["assetIds"].items():
+                for asset_id in asset_ids:
+                    size = odb.PREFABS[asset_id]["size"]
+                    columns["choice_types"].append(asset_type)
+                    columns["choice_ids"].append(asset_id)
+                    columns["choice_sizes"].append(size)
+                    bounds = None
+                    if metadata["randomness"]["dtheta"] == 0:
+                        # NOTE: the same (float) theta as sample_placement() computes when dtheta == 0
+                        bbox_bounds = AssetGroupGenerator.rotate_bounding_box(
+                            theta=metadata["rotation"] + 0.0, bbox_size=size
+                        )
+                        bounds = (bbox_bounds["x"]["min"], bbox_bounds["x"]["max"], bbox_bounds["z"]["min"], bbox_bounds["z"]["max"])
+                    columns["choice_bounds"].append(bounds)
+            if len(columns["choice_ids"]) == columns["choice_starts"][-1]:
+                raise Exception(f"No valid asset groups for {name} ! ")
+        columns["choice_starts"].append(len(columns["choice_ids"]))
+
+        # NOTE: dict.fromkeys() instead of a set, so the order (and the ties of the max) does not depend on the string hashes
         asset_group_assets = {
-            asset["name"]: set([asset_id for asset_type, asset_id in asset["assetIds"]])
-            for asset in self.data["assetMetadata"].values()
+            asset["name"]: list(dict.fromkeys(asset_id for asset_ids in asset["assetIds"].values() for asset_id in asset_ids))
+            for asset in asset_metadata.values()
         }
+        template = cls(name=name, **{column: tuple(values) for column, values in columns.items()})
+        return evolve(template, dimensions=template._compute_dimensions(odb, asset_group_assets))
 
-        assets = {
-            asset_name: pd.DataFrame(
-                [
-                    {
-                        "assetId": asset_id,
-                        "assetType": self.odb.OBJECT_TO_TYPE[asset_id],
-                        "xSize": self.odb.PREFABS[asset_id]["size"]["x"],
-                        "ySize": self.odb.PREFABS[asset_id]["size"]["y"],
-                        "zSize": self.odb.PREFABS[asset_id]["size"]["z"],
-                    }
-                    for asset_id in asset_ids
-                ]
-            )
-            for asset_name, asset_ids in asset_group_assets.items()
-        }
+    def _compute_dimensions(self, odb: ObjectDB, asset_group_assets: Dict[str, List[str]]) -> Vector3:
+        """The maximum possible extent of the asset group, independently in each direction.
 
+        TODO: Consider accounting for randomness in the dtheta dimensions.
+        """
         max_y = -np.inf
         chosen_asset_ids = {"largestXAssets": dict(), "largestZAssets": dict()}
-        for asset_name, asset_df in assets.items():
-            x_max_asset_id = asset_df.iloc[asset_df["xSize"].idxmax()]["assetId"]
-            z_max_asset_id = asset_df.iloc[asset_df["zSize"].idxmax()]["assetId"]
-
-            chosen_asset_ids["largestXAssets"][asset_name] = (
-                self.odb.OBJECT_TO_TYPE[x_max_asset_id],
-                x_max_asset_id,
-            )
-            chosen_asset_ids["largestZAssets"][asset_name] = (
-                self.odb.OBJECT_TO_TYPE[z_max_asset_id],
-                z_max_asset_id,
-            )
-
-            if asset_df["ySize"].max() > max_y:
-                max_y = asset_df["ySize"].max()
+        for asset_name, asset_ids in asset_group_assets.items():
+            # NOTE: max() keeps the first of the largest assets, like idxmax()
+            x_max_asset_id = max(asset_ids, key=lambda asset_id: odb.PREFABS[asset_id]["size"]["x"])
+            z_max_asset_id = max(asset_ids, key=lambda asset_id: odb.PREFABS[asset_id]["size"]["z"])
+            chosen_asset_ids["largestXAssets"][asset_name] = (odb.OBJECT_TO_TYPE[x_max_asset_id], x_max_asset_id)
+            chosen_asset_ids["largestZAssets"][asset_name] = (odb.OBJECT_TO_TYPE[z_max_asset_id], z_max_asset_id)
+            max_y = max(max_y, max(odb.PREFABS[asset_id]["size"]["y"] for asset_id in asset_ids))
 
         # TODO: eventually turn off randomness.
-        x_dim_assets = self.sample_object_placement(
-            chosen_asset_ids=chosen_asset_ids["largestXAssets"]
-        )
-        z_dim_assets = self.sample_object_placement(
-            chosen_asset_ids=chosen_asset_ids["largestZAssets"]
-        )
+        # NOTE: seeded by the name, so the dimensions are the same in every process whatever was sampled before.
+        py_rng = random.Random(self.name)
+        x_dim_assets = self.sample_placement(odb, chosen_asset_ids=chosen_asset_ids["largestXAssets"], py_rng=py_rng)
+        z_dim_assets = self.sample_placement(odb, chosen_asset_ids=chosen_asset_ids["largestZAssets"], py_rng=py_rng)
 
-        self.cache["dimensions"] = Vector3(
+        return Vector3(
             x=x_dim_assets["bounds"]["x"]["length"],
             y=max_y,
             z=z_dim_assets["bounds"]["z"]["length"],
         )
 
-    @staticmethod
-    def rotate_bounding_box(
-        theta: float,
-        bbox_size: Dict[str, float],
-        x_center: float = 0,
-        z_center: float = 0,
-    ) -> Dict[str, Dict[str, float]]:
-        """Rotate a top-down 2D bounding box.
-
-        Args:
-            theta: The rotation of the bounding box in degrees.
-            bbox_size: The size of the bounding box. Must have keys for {"x", "z"}.
-            x_center: The center x position of the bounding box.
-            z_center: The center z position of the bounding box.
-        """
-        bb_corners = [
-            (x_center + bbox_size["x"] / 2, z_center + bbox_size["z"] / 2),
-            (x_center - bbox_size["x"] / 2, z_center + bbox_size["z"] / 2),
-            (x_center - bbox_size["x"] / 2, z_center - bbox_size["z"] / 2),
-            (x_center + bbox_size["x"] / 2, z_center - bbox_size["z"] / 2),
-        ]
-        theta_rad = theta * np.pi / 180.0
-        for i, (x, z) in enumerate(bb_corners):
-            x_ = (
-                x_center
-                + (x - x_center) * np.cos(theta_rad)
-                + (z - z_center) * np.sin(theta_rad)
-            )
-            z_ = (
-                z_center
-                - (x - x_center) * np.sin(theta_rad)
-                + (z - z_center) * np.cos(theta_rad)
-            )
-            bb_corners[i] = (x_, z_)
-        return {
-            "x": {
-                "min": min(bb_corners, key=lambda bb_corner: bb_corner[0])[0],
-                "max": max(bb_corners, key=lambda bb_corner: bb_corner[0])[0],
-            },
-            "z": {
-                "min": min(bb_corners, key=lambda bb_corner: bb_corner[1])[1],
-                "max": max(bb_corners, key=lambda bb_corner: bb_corner[1])[1],
-            },
-        }
-
-    def sample_object_placement(
+    def sample_placement(
         self,
-        allow_clipping: bool = True,
+        odb: ObjectDB,
         floor_position: float = 0,
         use_thumbnail_assets: bool = False,
         chosen_asset_ids: Optional[Dict[str, Tuple[str, str]]] = None,
-    ) -> List[Dict[str, Any]]:
-        """Sample object placement.
-
-        Args:
-            chosen_asset_ids: Maps from the "name" in assetMetadata to the chosen
-                (assetType, assetId) of that asset. Note that assets with the same
-                name have the same chosen assetId.
-            floor_position: The position of the floor.
-            use_thumbnail_assets If the randomly chosen asset should be the one
-                shown in the thumbnail specified in the JSON.
-
-        Returns:
-            A dict mapping each assetId to an (x, y, z) position.
-        """
-        if not allow_clipping:
-            raise NotImplementedError(
-                "Currently, only allow_clipping == True is supported."
-            )
+        py_rng: Optional[random.Random] = None,
+    ) -> Dict[str, Any]:
+        """See AssetGroupGenerator.sample_object_placement()."""
+        py_rng = py_rng or random
 
         out = {
             "objects": [],
@@ -363,57 +317,47 @@ class AssetGroupGenerator:
             },
         }
 
-        asset_stack = [
-            {"parentId": None, "tree": parent_asset}
-            for parent_asset in reversed(self.data["treeData"])
-        ]
-
         # assets with the same name have the same assetIds chosen
         if chosen_asset_ids is None:
             chosen_asset_ids = dict()
 
-        # quick lookup for the placement of parent positions
-        parent_asset_lookup = dict()
-
-        while asset_stack:
-            asset = asset_stack.pop()
-            instance_id = str(asset["tree"]["instanceId"])
-
-            if "children" in asset["tree"]:
-                for child_asset in asset["tree"]["children"]:
-                    asset_stack.append({"parentId": instance_id, "tree": child_asset})
-
-            asset_metadata = self.data["assetMetadata"][instance_id]
+        # the placement of each node, read by its children
+        placed = [None] * len(self.instance_ids)
 
+        for node, instance_id in enumerate(self.instance_ids):
             # NOTE: choose the asset id
-            name = asset_metadata["name"]
+            name = self.asset_names[node]
+            choice = None
             if name in chosen_asset_ids:
                 asset_type, asset_id = chosen_asset_ids[name]
             elif use_thumbnail_assets:
-                asset_id = asset_metadata["shownAssetId"]
-                asset_type = self.odb.OBJECT_TO_TYPE[asset_id]
+                asset_id = self.shown_asset_ids[node]
+                asset_type = odb.OBJECT_TO_TYPE[asset_id]
             else:
-                asset_type, asset_id = random.choice(asset_metadata["assetIds"])
+                # NOTE: draws the same as py_rng.choice() on the list of the (asset_type, asset_id) of the node
+                choice = py_rng.choice(range(self.choice_starts[node], self.choice_starts[node + 1]))
+                asset_type, asset_id = self.choice_types[choice], self.choice_ids[choice]
             chosen_asset_ids[name] = (asset_type, asset_id)
 
-            # set the y position of the asset
-            bbox_size = self.odb.PREFABS[asset_id]["size"]
+            bbox_size = self.choice_sizes[choice] if choice is not None else odb.PREFABS[asset_id]["size"]
 
             # NOTE: add in randomness
-            dtheta = asset_metadata["randomness"]["dtheta"]
-            theta_offset = random.random() * dtheta * 2 - dtheta
-            theta = asset_metadata["rotation"] + theta_offset
+            dtheta = self.dthetas[node]
+            theta_offset = py_rng.random() * dtheta * 2 - dtheta
+            theta = self.rotations[node] + theta_offset
 
             # calculate the bounding box after rotating the object.
-            bbox_bounds = AssetGroupGenerator.rotate_bounding_box(
-                theta=theta, bbox_size=bbox_size
-            )
+            if choice is not None and self.choice_bounds[choice] is not None:
+                x_min, x_max, z_min, z_max = self.choice_bounds[choice]
+                bbox_bounds = {"x": {"min": x_min, "max": x_max}, "z": {"min": z_min, "max": z_max}}
+            else:
+                bbox_bounds = AssetGroupGenerator.rotate_bounding_box(theta=theta, bbox_size=bbox_size)
 
             # NOTE: determine where to place the asset
-            if asset["parentId"] is None:
+            parent_node = self.parents[node]
+            if parent_node == -1:
                 # NOTE: position represents an absolute position
-                center_position = asset_metadata["position"]
-                x_center, z_center = center_position["x"], center_position["z"]
+                x_center, z_center = self.x_positions[node], self.z_positions[node]
                 y_center = floor_position + bbox_size["y"] / 2
                 bbox_bounds["y"] = {
                     "min": floor_position,
@@ -421,10 +365,10 @@ class AssetGroupGenerator:
                 }
             else:
                 # NOTE: position is relative to the parent
-                parent = parent_asset_lookup[asset["parentId"]]
+                parent = placed[parent_node]
 
-                x_center = parent["position"]["x"] + asset_metadata["position"]["x"]
-                z_center = parent["position"]["z"] + asset_metadata["position"]["z"]
+                x_center = parent["position"]["x"] + self.x_positions[node]
+                z_center = parent["position"]["z"] + self.z_positions[node]
 
                 parent_x_length = -(
                     parent["bbox"]["x"]["max"] - parent["bbox"]["x"]["min"]
@@ -433,7 +377,7 @@ class AssetGroupGenerator:
                     parent["bbox"]["z"]["max"] - parent["bbox"]["z"]["min"]
                 )
 
-                anchor = asset_metadata["position"]["relativeAnchorToParent"]
+                anchor = self.anchors[node]
                 if anchor in {0, 1, 2}:
                     z_center -= parent_z_length / 2
                 elif anchor in {6, 7, 8}:
@@ -444,8 +388,8 @@ class AssetGroupGenerator:
                 elif anchor in {2, 5, 8}:
                     x_center += parent_x_length / 2
 
-                x_alignment = asset_metadata["position"]["xAlignment"]
-                z_alignment = asset_metadata["position"]["zAlignment"]
+                x_alignment = self.x_alignments[node]
+                z_alignment = self.z_alignments[node]
 
                 bbox_x_length = bbox_bounds["x"]["max"] - bbox_bounds["x"]["min"]
                 bbox_z_length = bbox_bounds["z"]["max"] - bbox_bounds["z"]["min"]
@@ -460,13 +404,13 @@ class AssetGroupGenerator:
                 elif z_alignment == 2:
                     z_center += bbox_z_length / 2
 
-                if asset_metadata["position"]["verticalAlignment"] == "nextTo":
+                if self.vertical_alignments[node] == "nextTo":
                     y_center = parent["floorPosition"] + bbox_size["y"] / 2
                     bbox_bounds["y"] = {
                         "min": parent["floorPosition"],
                         "max": parent["floorPosition"] + bbox_size["y"],
                     }
-                elif asset_metadata["position"]["verticalAlignment"] == "above":
+                elif self.vertical_alignments[node] == "above":
                     # NOTE: This is naive. It places objects at of the parent
                     # object's bounding box height. Consider a more advanced height
                     # calculation that looks at the contours of an object instead
@@ -494,7 +438,7 @@ class AssetGroupGenerator:
                     out["bounds"][k]["max"] = bbox_bounds[k]["max"]
             out["bounds"]["y"] = bbox_bounds["y"]
 
-            parent_asset_lookup[instance_id] = {
+            placed[node] = {
                 "position": {"x": x_center, "y": y_center, "z": z_center},
                 "floorPosition": y_center - bbox_size["y"] / 2,
                 "height": bbox_size["y"],
@@ -523,3 +467,272 @@ class AssetGroupGenerator:
             ) / 2
 
         return out
+
+
+def get_asset_group_template(odb: ObjectDB, name: str) -> AssetGroupTemplate:
+    """The AssetGroupTemplate of odb.ASSET_GROUPS[name], compiled on first use and then kept in odb.ASSET_GROUP_TEMPLATES."""
+    template = odb.ASSET_GROUP_TEMPLATES.get(name)
+    if template is None:
+        template = odb.ASSET_GROUP_TEMPLATES[name] = AssetGroupTemplate.compile(name, odb.ASSET_GROUPS[name], odb)
+    return template
+
+
+class AssetGroupGenerator:
+    def __init__(
+        self,
+        name: str,  # The name of the asset group.
+        data: Dict[str, Any],  # The parsed json data of the asset group.
+        odb: ObjectDB,
+    ) -> None:
+        self.name = name
+        self.odb = odb
+        self._data = data
+        self._flattened_data = None
+
+        # NOTE: the asset groups of the ObjectDB are compiled once per process, others (e.g. edited copies) every time
+        if odb.ASSET_GROUPS.get(name) is data:
+            self.template = get_asset_group_template(odb, name)
+        else:
+            self.template = AssetGroupTemplate.compile(name, data, odb)
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        """A copy of the asset group data where asset_metadata[assetIds] is
+        transformed from [asset_type]: [...assetIds] to [...(asset_type, asset_id)].
+
+        Only kept for compatibility, the generator itself uses the template.
+        """
+        if self._flattened_data is None:
+            data = copy.deepcopy(self._data)
+            for asset_metadata in data["assetMetadata"].values():
+                asset_metadata["assetIds"] = [
+                    (asset_type, asset_id)
+                    for asset_type, asset_ids in asset_metadata["assetIds"].items()
+                    for asset_id in asset_ids
+                ]
+            self._flattened_data = data
+        return self._flattened_data
+
+    @property
+    def dimensions(self) -> Vector3:
+        """Get the dimensions of the asset group.
+
+        The dimensions are set to the maximum possible extent of the asset
+        group, independently in each direction, and computed once with the template.
+        """
+        return self.template.dimensions
+
+    @staticmethod
+    def rotate_bounding_box(
+        theta: float,
+        bbox_size: Dict[str, float],
+        x_center: float = 0,
+        z_center: float = 0,
+    ) -> Dict[str, Dict[str, float]]:
+        """Rotate a top-down 2D bounding box.
+
+        Args:
+            theta: The rotation of the bounding box in degrees.
+            bbox_size: The size of the bounding box. Must have keys for {"x", "z"}.
+            x_center: The center x position of the bounding box.
+            z_center: The center z position of the bounding box.
+        """
+        bb_corners = [
+            (x_center + bbox_size["x"] / 2, z_center + bbox_size["z"] / 2),
+            (x_center - bbox_size["x"] / 2, z_center + bbox_size["z"] / 2),
+            (x_center - bbox_size["x"] / 2, z_center - bbox_size["z"] / 2),
+            (x_center + bbox_size["x"] / 2, z_center - bbox_size["z"] / 2),
+        ]
+        theta_rad = theta * np.pi / 180.0
+        for i, (x, z) in enumerate(bb_corners):
+            x_ = (
+                x_center
+                + (x - x_center) * np.cos(theta_rad)
+                + (z - z_center) * np.sin(theta_rad)
+            )
+            z_ = (
+                z_center
+                - (x - x_center) * np.sin(theta_rad)
+                + (z - z_center) * np.cos(theta_rad)
+            )
+            bb_corners[i] = (x_, z_)
+        return {
+            "x": {
+                "min": min(bb_corners, key=lambda bb_corner: bb_corner[0])[0],
+                "max": max(bb_corners, key=lambda bb_corner: bb_corner[0])[0],
+            },
+            "z": {
+                "min": min(bb_corners, key=lambda bb_corner: bb_corner[1])[1],
+                "max": max(bb_corners, key=lambda bb_corner: bb_corner[1])[1],
+            },
+        }
+
+    def sample_object_placement(
+        self,
+        allow_clipping: bool = True,
+        floor_position: float = 0,
+        use_thumbnail_assets: bool = False,
+        chosen_asset_ids: Optional[Dict[str, Tuple[str, str]]] = None,
+        py_rng: Optional[random.Random] = None,
+    ) -> List[Dict[str, Any]]:
+        """Sample object placement.
+
+        Args:
+            chosen_asset_ids: Maps from the "name" in assetMetadata to the chosen
+                (assetType, assetId) of that asset. Note that assets with the same
+                name have the same chosen assetId.
+            floor_position: The position of the floor.
+            use_thumbnail_assets If the randomly chosen asset should be the one
+                shown in the thumbnail specified in the JSON.
+            py_rng: The random stream of the scene, random if None.
+
+        Returns:
+            A dict mapping each assetId to an (x, y, z) position.
+        """
+        if not allow_clipping:
+            raise NotImplementedError(
+                "Currently, only allow_clipping == True is supported."
+            )
+        return self.template.sample_placement(
+            self.odb,
+            floor_position=floor_position,
+            use_thumbnail_assets=use_thumbnail_assets,
+            chosen_asset_ids=chosen_asset_ids,
+            py_rng=py_rng,
+        )
+
+
+def sample_from_mask(mask: np.ndarray, rng: Optional[np.random.Generator] = None) -> int:
+    """Pick the index of one of the True entries of the mask.
+
+    Draws from rng, the random stream of the scene (see make_rngs), or if None from np.random exactly like
+    DataFrame.sample() on the masked rows.
+    """
+    indices = np.flatnonzero(mask)
+    if rng is None:
+        return int(indices[np.random.choice(len(indices), size=1, replace=False)[0]])
+    return int(indices[rng.integers(len(indices))])
+
+
+# The room weight columns of AssetGroupTable and their keys in groupProperties["roomWeights"]
+ROOM_WEIGHT_KEYS = {
+    "inBathrooms": "bathrooms",
+    "inBedrooms": "bedrooms",
+    "inKitchens": "kitchens",
+    "inLivingRooms": "livingRooms",
+}
+
+
+@define
+class AssetGroupTable:
+    """All the asset groups of an ObjectDB, stored by column with one row per asset group.
+
+    It only depends on the ObjectDB, so it is built once (see get_asset_group_table) and the filtering
+    done while generating a scene is a few boolean mask operations.
+    """
+
+    names: np.ndarray
+    """The asset group names, as an object array."""
+
+    generators: List[AssetGroupGenerator]
+
+    x_size: np.ndarray
+    y_size: np.ndarray
+    z_size: np.ndarray
+
+    room_weights: Dict[str, np.ndarray]
+    """Maps "in{room_type}s" (e.g. "inBedrooms") to the weight of each group in that room type."""
+
+    anchors: Dict[str, np.ndarray]
+    """Maps "inCorner", "onEdge" and "inMiddle" to a mask of the groups that can be placed there."""
+
+    allow_duplicates: np.ndarray
+
+    has_type: Dict[str, np.ndarray]
+    """Maps each asset type of odb.OBJECT_DICT to a mask of the groups that contain it."""
+
+    _dataframe: Optional[pd.DataFrame] = None
+
+    @classmethod
+    def build(cls, odb: ObjectDB) -> "AssetGroupTable":
+        names, generators, sizes, allow_duplicates = [], [], [], []
+        room_weights = {column: [] for column in ROOM_WEIGHT_KEYS}
+        anchors = {"inCorner": [], "onEdge": [], "inMiddle": []}
+        has_type = {asset_type: np.zeros(len(odb.ASSET_GROUPS), dtype=bool) for asset_type in odb.OBJECT_DICT.keys()}
+        for i, (asset_group_name, asset_group_data) in enumerate(odb.ASSET_GROUPS.items()):
+            asset_group_generator = AssetGroupGenerator(
+                name=asset_group_name,
+                data=asset_group_data,
+                odb=odb,
+            )
+            dims = asset_group_generator.dimensions
+            group_properties = asset_group_data["groupProperties"]
+
+            names.append(asset_group_name)
+            generators.append(asset_group_generator)
+            sizes.append((dims["x"], dims["y"], dims["z"]))
+            for column, key in ROOM_WEIGHT_KEYS.items():
+                room_weights[column].append(group_properties["roomWeights"][key])
+            allow_duplicates.append(group_properties["properties"]["allowDuplicates"])
+            anchors["inCorner"].append(group_properties["location"]["corner"])
+            anchors["onEdge"].append(group_properties["location"]["edge"])
+            anchors["inMiddle"].append(group_properties["location"]["middle"])
+
+            # NOTE: This is kinda naive, since a single asset in the asset group
+            # could map to multiple different types of asset types (e.g., Both Chair
+            # and ArmChair could be in the same asset).
+            for asset in asset_group_data["assetMetadata"].values():
+                for asset_type, asset_ids in asset["assetIds"].items():
+                    if asset_ids and asset_type in has_type:
+                        has_type[asset_type][i] = True
+
+        sizes = np.array(sizes, dtype=float).reshape(-1, 3)
+        return cls(
+            names=np.array(names, dtype=object),
+            generators=generators,
+            x_size=sizes[:, 0],
+            y_size=sizes[:, 1],
+            z_size=sizes[:, 2],
+            room_weights={column: np.array(weights, dtype=float) for column, weights in room_weights.items()},
+            anchors={anchor: np.array(mask, dtype=bool) for anchor, mask in anchors.items()},
+            allow_duplicates=np.array(allow_duplicates, dtype=bool),
+            has_type=has_type,
+        )
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def sample(self, mask: np.ndarray, rng: Optional[np.random.Generator] = None) -> int:
+        """Pick the index of one of the groups in the mask."""
+        return sample_from_mask(mask, rng)
+
+    def row(self, index: int) -> Dict[str, Any]:
+        return {
+            "assetGroupName": self.names[index],
+            "assetGroupGenerator": self.generators[index],
+            "allowDuplicates": bool(self.allow_duplicates[index]),
+        }
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """The table as the DataFrame formerly returned by HouseGenerator.get_spawnable_asset_group_info()."""
+        if self._dataframe is None:
+            data = {
+                "assetGroupName": self.names,
+                "assetGroupGenerator": self.generators,
+                "xSize": self.x_size,
+                "ySize": self.y_size,
+                "zSize": self.z_size,
+                **self.room_weights,
+                "allowDuplicates": self.allow_duplicates,
+                **self.anchors,
+            }
+            data.update({f"has{asset_type}": mask for asset_type, mask in self.has_type.items()})
+            self._dataframe = pd.DataFrame(data)
+        return self._dataframe
+
+
+def get_asset_group_table(odb: ObjectDB) -> AssetGroupTable:
+    """The AssetGroupTable of the ObjectDB, built on first use and then kept in odb.ASSET_GROUP_TABLE."""
+    if odb.ASSET_GROUP_TABLE is None:
+        odb.ASSET_GROUP_TABLE = AssetGroupTable.build(odb)
+    return odb.ASSET_GROUP_TABLE
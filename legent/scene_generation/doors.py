@@ -1,8 +1,8 @@
 import random
-from typing import Any, Dict, Iterable, List, Set, Tuple, Union
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 from legent.scene_generation.constants import OUTDOOR_ROOM_ID
-from legent.scene_generation.house import HouseStructure
+from legent.scene_generation.house import HouseStructure, find_door_walls
 from legent.scene_generation.objects import ObjectDB
 from legent.scene_generation.room_spec import LeafRoom, MetaRoom, RoomSpec
 from legent.scene_generation.types import BoundaryGroups
@@ -75,22 +75,26 @@ def default_add_doors(
     odb: ObjectDB,
     room_spec: RoomSpec,
     house_structure: HouseStructure,
+    py_rng: Optional[random.Random] = None,
 ):
     """Add doors to the house."""
 
     boundary_groups = house_structure.boundary_groups
-    rowcol_walls = house_structure.rowcol_walls
-    rowcol_walls = convert_rowcol_walls(rowcol_walls)
+    # NOTE: the door candidates of each pair of neighboring rooms, the same as convert_rowcol_walls(house_structure.rowcol_walls)
+    # but without converting house_structure.rowcol_walls in place
+    rowcol_walls = find_door_walls(house_structure.floorplan)
 
     room_spec_neighbors = get_room_spec_neighbors(room_spec=room_spec.spec)
     openings = select_openings(
         neighboring_rooms=set(boundary_groups.keys()),
         room_spec_neighbors=room_spec_neighbors,
         room_spec=room_spec,
+        py_rng=py_rng,
     )
     door_walls = select_door_walls(
         openings=openings,
         rowcol_walls=rowcol_walls,
+        py_rng=py_rng,
     )
     
     return door_walls
@@ -159,6 +163,7 @@ def select_openings(
     neighboring_rooms: Set[Tuple[int, int]],
     room_spec_neighbors: List[Dict[int, Any]],
     room_spec: RoomSpec,
+    py_rng: Optional[random.Random] = None,
 ) -> List[Tuple[int, int]]:
     """Select which neighboring rooms should have doors between them.
 
@@ -167,11 +172,13 @@ def select_openings(
             roomId-2 > roomId-1.
         room_spec_neighbors: specifies which rooms can have connections next to each
             other, based on the room spec.
+        py_rng: The random stream of the scene, random if None.
 
     Returns:
         The neighboring_rooms that can have doors between them.
 
     """
+    py_rng = py_rng or random
     selected_doors = []
     for group_neighbors in room_spec_neighbors:
         # NOTE: does not need a door if its the only leaf room.
@@ -188,9 +195,9 @@ def select_openings(
                 raise ValueError(
                     f"Failed to connect all rooms in group_neighbors: {group_neighbors}"
                 )
-            next_room_i = random.choice(need_connections_between)
+            next_room_i = py_rng.choice(need_connections_between)
             other_room_is = [i for i in range(len(group_neighbors)) if i != next_room_i]
-            random.shuffle(other_room_is)
+            py_rng.shuffle(other_room_is)
             n1_subgroup = group_neighbors[next_room_i]
             for other_room_i in other_room_is:
                 n2_subgroup = group_neighbors[other_room_i]
@@ -200,7 +207,7 @@ def select_openings(
                     for b in n2_subgroup
                 ]
                 combos = randomly_prioritize_room_ids(
-                    room_id_pairs=combos, room_spec=room_spec
+                    room_id_pairs=combos, room_spec=room_spec, py_rng=py_rng
                 )
                 for door_combo in combos:
                     if door_combo in neighboring_rooms:
@@ -215,9 +222,12 @@ def select_openings(
 
 
 def randomly_prioritize_room_ids(
-    room_id_pairs: List[Tuple[int, int]], room_spec: RoomSpec
+    room_id_pairs: List[Tuple[int, int]],
+    room_spec: RoomSpec,
+    py_rng: Optional[random.Random] = None,
 ) -> List[Tuple[int, int]]:
     """Random shuffling while moving rooms with avoid_doors_from_metarooms to back."""
+    py_rng = py_rng or random
     avoid_room_id_pairs = []
     prioritize_room_id_pairs = []
     for room_id_1, room_id_2 in room_id_pairs:
@@ -234,12 +244,17 @@ def randomly_prioritize_room_ids(
         else:
             prioritize_room_id_pairs.append((room_id_1, room_id_2))
 
-    random.shuffle(prioritize_room_id_pairs)
-    random.shuffle(avoid_room_id_pairs)
+    py_rng.shuffle(prioritize_room_id_pairs)
+    py_rng.shuffle(avoid_room_id_pairs)
     return prioritize_room_id_pairs + avoid_room_id_pairs
 
 
-def select_door_walls(openings: List[Tuple[int, int]], rowcol_walls):
+def select_door_walls(
+    openings: List[Tuple[int, int]],
+    rowcol_walls,
+    py_rng: Optional[random.Random] = None,
+):
+    py_rng = py_rng or random
     chosen_openings = dict()
     for opening in openings:
         candidates = list(rowcol_walls[opening])
@@ -249,22 +264,25 @@ def select_door_walls(openings: List[Tuple[int, int]], rowcol_walls):
         # Weights are the size of each wall. Since each wall has a size along a
         # single axis, Manhattan distance is equivalent to Euclidean distance
         # chosen_opening = random.choices(population=population, weights=weights, k=1)[0]
-        chosen_opening = random.choice(candidates)
+        chosen_opening = py_rng.choice(candidates)
         chosen_openings[opening] = chosen_opening
         # chosen_openings[opening] = candidates[chosen_opening]
     return chosen_openings
 
 
 def select_outdoor_openings(
-    boundary_groups: BoundaryGroups, room_type_map: Dict[int, str]
+    boundary_groups: BoundaryGroups,
+    room_type_map: Dict[int, str],
+    py_rng: Optional[random.Random] = None,
 ) -> List[Tuple[int, int]]:
     """Select which rooms have doors to the outside."""
+    py_rng = py_rng or random
     outdoor_candidates = [
         group for group in boundary_groups if OUTDOOR_ROOM_ID in group
     ]
-    random.shuffle(outdoor_candidates)
+    py_rng.shuffle(outdoor_candidates)
 
-    n_doors_target = random.randint(MIN_DOORS_TO_OUTSIDE, MAX_DOORS_TO_OUTSIDE)
+    n_doors_target = py_rng.randint(MIN_DOORS_TO_OUTSIDE, MAX_DOORS_TO_OUTSIDE)
     doors_to_outside = []
 
     # NOTE: Check preferred room types
@@ -0,0 +1,114 @@
+import random
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from attrs import define
+
+from .asset_groups import sample_from_mask
+from .objects import ObjectDB
+
+
+@define
+class FloorAssetIndex:
+    """The standalone floor assets of a (room type, split), stored by column with one row per asset.
+
+    It replaces the DataFrame filtering of HouseGenerator.generate(): the assets that can still spawn in a room
+    are given by a mask over the asset types (see spawnable_types()), so removing a type is a single assignment,
+    and the rectangle and anchor filters are a few comparisons on the size arrays.
+    The rows keep the order of the DataFrame in odb.FLOOR_ASSET_DICT, so that sampling draws the same assets.
+    """
+
+    records: List[Dict[str, Any]]
+    """The rows of the DataFrame as dicts, with "assetId" (see Room.place_asset)."""
+
+    x_size: np.ndarray
+    z_size: np.ndarray
+
+    weights: np.ndarray
+    """The placement weight of each asset in the room type."""
+
+    anchors: Dict[str, np.ndarray]
+    """Maps "inCorner", "onEdge" and "inMiddle" to a mask of the assets that can be placed there."""
+
+    types: List[str]
+    """The asset types, in order of first appearance."""
+
+    type_codes: Dict[str, int]
+    """Maps each asset type to its index in types."""
+
+    codes: np.ndarray
+    """The index in types of the type of each asset."""
+
+    standalone_weights: Dict[str, float]
+    """The placement weight in the room type of every asset type of odb.PLACEMENT_ANNOTATIONS."""
+
+    multiple_per_room: Dict[str, bool]
+    """Whether more than one asset of each type of odb.PLACEMENT_ANNOTATIONS can be placed in a room."""
+
+    @classmethod
+    def build(cls, assets: pd.DataFrame, room_type: str, odb: ObjectDB) -> "FloorAssetIndex":
+        types = list(pd.unique(assets["assetType"]))
+        type_codes = {asset_type: i for i, asset_type in enumerate(types)}
+        annotations = odb.PLACEMENT_ANNOTATIONS
+        return cls(
+            records=assets.reset_index(drop=False).to_dict(orient="records"),
+            x_size=assets["xSize"].to_numpy(dtype=float),
+            z_size=assets["zSize"].to_numpy(dtype=float),
+            weights=assets[f"in{room_type}s"].to_numpy(dtype=float),
+            anchors={anchor: assets[anchor].to_numpy(dtype=bool) for anchor in ("inCorner", "onEdge", "inMiddle")},
+            types=types,
+            type_codes=type_codes,
+            codes=np.array([type_codes[asset_type] for asset_type in assets["assetType"]], dtype=np.intp),
+            standalone_weights=dict(zip(annotations.index, annotations[f"in{room_type}s"].tolist())),
+            multiple_per_room=dict(zip(annotations.index, annotations["multiplePerRoom"].tolist())),
+        )
+
+    def spawnable_types(self) -> np.ndarray:
+        """A new mask over the asset types, with all of them spawnable."""
+        return np.ones(len(self.types), dtype=bool)
+
+    def remove_type(self, spawnable_types: np.ndarray, asset_type: str) -> None:
+        code = self.type_codes.get(asset_type)
+        if code is not None:
+            spawnable_types[code] = False
+
+    def candidates(self, spawnable_types: np.ndarray, anchor_type: str, size_mask: np.ndarray) -> np.ndarray:
+        """The mask of the assets of spawnable types that can be placed at the anchor and fit (size_mask)."""
+        return spawnable_types[self.codes] & self.anchors[anchor_type] & size_mask
+
+    def with_type(self, candidates: np.ndarray, asset_type: str) -> np.ndarray:
+        """The candidates of the given type."""
+        code = self.type_codes.get(asset_type)
+        if code is None:
+            return np.zeros_like(candidates)
+        return candidates & (self.codes == code)
+
+    def sample_by_type(
+        self,
+        candidates: np.ndarray,
+        rng: Optional[np.random.Generator] = None,
+        py_rng: Optional[random.Random] = None,
+    ) -> int:
+        """Pick a type among the candidates, then one of its assets.
+
+        Draws from the random streams of the scene (see make_rngs), or if None the same as the former DataFrame version.
+        """
+        # The assets of a type are contiguous, so the sorted codes are in order of first appearance, like unique()
+        codes = np.unique(self.codes[candidates])
+        code = (py_rng or random).choice(codes.tolist())
+        return sample_from_mask(candidates & (self.codes == code), rng)
+
+    def record(self, index: int) -> Dict[str, Any]:
+        # A copy, since Room.place_asset() adds "rotated" to it
+        return dict(self.records[index])
+
+
+def get_floor_asset_index(odb: ObjectDB, room_type: str, split: str) -> FloorAssetIndex:
+    """The FloorAssetIndex of odb.FLOOR_ASSET_DICT[(room_type, split)], built on first use and then kept in odb.FLOOR_ASSET_INDEXES."""
+    key = (room_type, split)
+    index = odb.FLOOR_ASSET_INDEXES.get(key)
+    if index is None:
+        _, assets = odb.FLOOR_ASSET_DICT[key]
+        index = odb.FLOOR_ASSET_INDEXES[key] = FloorAssetIndex.build(assets, room_type, odb)
+    return index
@@ -14,8 +14,12 @@ Things to consider:
       rooms to find a path to the unreachable room, and create
       the necessary door(s).
 """
+import itertools
+import os
 import random
-from typing import Dict, Sequence, Union
+from collections import deque
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -29,7 +33,7 @@ class InvalidFloorplan(Exception):
 
 
 def select_room(
-    rooms: Sequence[Union[LeafRoom, MetaRoom]]
+    rooms: Sequence[Union[LeafRoom, MetaRoom]], py_rng: Optional[random.Random] = None
 ) -> Union[LeafRoom, MetaRoom]:
     """
     From the paper:
@@ -40,8 +44,9 @@ def select_room(
         variation is ensured, but the selection still respects the
         desired ratios of room areas.
     """
+    py_rng = py_rng or random
     total_ratio = sum(r.ratio for r in rooms)
-    r = random.random() * total_ratio
+    r = py_rng.random() * total_ratio
     for room in rooms:
         r -= room.ratio
         if r <= 0:
@@ -49,7 +54,7 @@ def select_room(
 
 
 def sample_initial_room_positions(
-    rooms: Sequence[Union[LeafRoom, MetaRoom]], floorplan: np.ndarray
+    rooms: Sequence[Union[LeafRoom, MetaRoom]], floorplan: np.ndarray, rng: Optional[np.random.Generator] = None
 ) -> None:
     """
     From the paper:
@@ -84,6 +89,7 @@ def sample_initial_room_positions(
         set to zero, to avoid several initial positions of different
         rooms to be too close to each other.
     """
+    rng = rng or np.random
     grid_weights = np.where(floorplan == EMPTY_ROOM_ID, 1, 0)
     for room in rooms:
         # make sure there is at least one open cell in the floorplan area.
@@ -98,7 +104,7 @@ def sample_initial_room_positions(
         # TODO: these weights could be updated by the adjacency constraints
         # and the hallways.
         # sample a grid cell by weight
-        cell_idx = np.random.choice(
+        cell_idx = rng.choice(
             grid_weights.size, p=grid_weights.ravel() / float(grid_weights.sum())
         )
         cell_y, cell_x = np.unravel_index(cell_idx, grid_weights.shape)
@@ -119,7 +125,7 @@ def sample_initial_room_positions(
         ] = 0
 
 
-def grow_rect(room: Union[MetaRoom, LeafRoom], floorplan: np.ndarray) -> bool:
+def grow_rect(room: Union[MetaRoom, LeafRoom], floorplan: List[List[int]], py_rng: Optional[random.Random] = None) -> bool:
     """
     From the paper:
         The first phase of this algorithm is expanding rooms
@@ -149,14 +155,13 @@ def grow_rect(room: Union[MetaRoom, LeafRoom], floorplan: np.ndarray) -> bool:
         return False
 
     # NOTE: Find out how much the rectangle can grow in each direction.
+    rows = floorplan[room.min_y : room.max_y]
     growth_sizes = {
         "right": (
             room.max_y - room.min_y
             if (
-                room.max_x < floorplan.shape[1]
-                and (
-                    floorplan[room.min_y : room.max_y, room.max_x] == EMPTY_ROOM_ID
-                ).all()
+                room.max_x < len(floorplan[0])
+                and all(row[room.max_x] == EMPTY_ROOM_ID for row in rows)
             )
             else 0
         ),
@@ -164,19 +169,15 @@ def grow_rect(room: Union[MetaRoom, LeafRoom], floorplan: np.ndarray) -> bool:
             room.max_y - room.min_y
             if (
                 room.min_x > 0
-                and (
-                    floorplan[room.min_y : room.max_y, room.min_x - 1] == EMPTY_ROOM_ID
-                ).all()
+                and all(row[room.min_x - 1] == EMPTY_ROOM_ID for row in rows)
             )
             else 0
         ),
         "down": (
             room.max_x - room.min_x
             if (
-                room.max_y < floorplan.shape[0]
-                and (
-                    floorplan[room.max_y, room.min_x : room.max_x] == EMPTY_ROOM_ID
-                ).all()
+                room.max_y < len(floorplan)
+                and all(cell == EMPTY_ROOM_ID for cell in floorplan[room.max_y][room.min_x : room.max_x])
             )
             else 0
         ),
@@ -184,9 +185,7 @@ def grow_rect(room: Union[MetaRoom, LeafRoom], floorplan: np.ndarray) -> bool:
             room.max_x - room.min_x
             if (
                 room.min_y > 0
-                and (
-                    floorplan[room.min_y - 1, room.min_x : room.max_x] == EMPTY_ROOM_ID
-                ).all()
+                and all(cell == EMPTY_ROOM_ID for cell in floorplan[room.min_y - 1][room.min_x : room.max_x])
             )
             else 0
         ),
@@ -202,7 +201,7 @@ def grow_rect(room: Union[MetaRoom, LeafRoom], floorplan: np.ndarray) -> bool:
     # From the paper: The maximum growth, i.e. the longest line interval, which
     # leads to a rectangular area is picked (randomly, if there are more than
     # one candidates).
-    growth_direction = random.choice(
+    growth_direction = (py_rng or random).choice(
         [
             growth_direction
             for growth_direction, growth_size in growth_sizes.items()
@@ -213,21 +212,23 @@ def grow_rect(room: Union[MetaRoom, LeafRoom], floorplan: np.ndarray) -> bool:
     # NOTE: Grow the room in the chosen direction.
     if growth_direction == "right":
         room.max_x += 1
-        floorplan[room.min_y : room.max_y, room.max_x - 1] = room.room_id
+        for row in rows:
+            row[room.max_x - 1] = room.room_id
     elif growth_direction == "left":
         room.min_x -= 1
-        floorplan[room.min_y : room.max_y, room.min_x] = room.room_id
+        for row in rows:
+            row[room.min_x] = room.room_id
     elif growth_direction == "down":
         room.max_y += 1
-        floorplan[room.max_y - 1, room.min_x : room.max_x] = room.room_id
+        floorplan[room.max_y - 1][room.min_x : room.max_x] = [room.room_id] * (room.max_x - room.min_x)
     elif growth_direction == "up":
         room.min_y -= 1
-        floorplan[room.min_y, room.min_x : room.max_x] = room.room_id
+        floorplan[room.min_y][room.min_x : room.max_x] = [room.room_id] * (room.max_x - room.min_x)
 
     return True
 
 
-def grow_l_shape(room, floorplan):
+def grow_l_shape(room, floorplan: List[List[int]], py_rng: Optional[random.Random] = None):
     """
     From the paper:
         Of course, this first phase does not ensure that all available space
@@ -250,11 +251,11 @@ def grow_l_shape(room, floorplan):
                 y
                 for y in range(room.min_y, room.max_y)
                 if (
-                    floorplan[y, room.max_x] == EMPTY_ROOM_ID
-                    and floorplan[y, room.max_x - 1] == room.room_id
+                    floorplan[y][room.max_x] == EMPTY_ROOM_ID
+                    and floorplan[y][room.max_x - 1] == room.room_id
                 )
             ]
-            if (room.max_x < floorplan.shape[1])
+            if (room.max_x < len(floorplan[0]))
             else []
         ),
         "left": (
@@ -262,8 +263,8 @@ def grow_l_shape(room, floorplan):
                 y
                 for y in range(room.min_y, room.max_y)
                 if (
-                    floorplan[y, room.min_x - 1] == EMPTY_ROOM_ID
-                    and floorplan[y, room.min_x] == room.room_id
+                    floorplan[y][room.min_x - 1] == EMPTY_ROOM_ID
+                    and floorplan[y][room.min_x] == room.room_id
                 )
             ]
             if (room.min_x > 0)
@@ -274,11 +275,11 @@ def grow_l_shape(room, floorplan):
                 x
                 for x in range(room.min_x, room.max_x)
                 if (
-                    floorplan[room.max_y, x] == EMPTY_ROOM_ID
-                    and floorplan[room.max_y - 1, x] == room.room_id
+                    floorplan[room.max_y][x] == EMPTY_ROOM_ID
+                    and floorplan[room.max_y - 1][x] == room.room_id
                 )
             ]
-            if (room.max_y < floorplan.shape[0])
+            if (room.max_y < len(floorplan))
             else []
         ),
         "up": (
@@ -286,8 +287,8 @@ def grow_l_shape(room, floorplan):
                 x
                 for x in range(room.min_x, room.max_x)
                 if (
-                    floorplan[room.min_y - 1, x] == EMPTY_ROOM_ID
-                    and floorplan[room.min_y, x] == room.room_id
+                    floorplan[room.min_y - 1][x] == EMPTY_ROOM_ID
+                    and floorplan[room.min_y][x] == room.room_id
                 )
             ]
             if (room.min_y > 0)
@@ -300,7 +301,7 @@ def grow_l_shape(room, floorplan):
         return False
 
     # NOTE: Pick a random max growth direction to grow.
-    growth_direction = random.choice(
+    growth_direction = (py_rng or random).choice(
         [
             growth_direction
             for growth_direction, growth_size in growth_sizes.items()
@@ -309,26 +310,29 @@ def grow_l_shape(room, floorplan):
     )
     if growth_direction == "right":
         for y in growth_sizes["right"]:
-            floorplan[y, room.max_x] = room.room_id
+            floorplan[y][room.max_x] = room.room_id
         room.max_x += 1
     elif growth_direction == "left":
         for y in growth_sizes["left"]:
-            floorplan[y, room.min_x - 1] = room.room_id
+            floorplan[y][room.min_x - 1] = room.room_id
         room.min_x -= 1
     elif growth_direction == "down":
         for x in growth_sizes["down"]:
-            floorplan[room.max_y, x] = room.room_id
+            floorplan[room.max_y][x] = room.room_id
         room.max_y += 1
     elif growth_direction == "up":
         for x in growth_sizes["up"]:
-            floorplan[room.min_y - 1, x] = room.room_id
+            floorplan[room.min_y - 1][x] = room.room_id
         room.min_y -= 1
 
     return True
 
 
 def expand_rooms(
-    rooms: Sequence[Union[LeafRoom, MetaRoom]], floorplan: np.ndarray
+    rooms: Sequence[Union[LeafRoom, MetaRoom]],
+    floorplan: np.ndarray,
+    rng: Optional[np.random.Generator] = None,
+    py_rng: Optional[random.Random] = None,
 ) -> None:
     """Assign rooms from a given hierarchy to the floorplan.
 
@@ -345,24 +349,32 @@ def expand_rooms(
     """
 
     # NOTE: Initial center placement of each room
-    sample_initial_room_positions(rooms, floorplan)
+    sample_initial_room_positions(rooms, floorplan, rng)
 
+    # NOTE: the floorplans are small, so growing cell by cell on a list of rows is
+    # much faster than on numpy slices. The result is written back at the end.
+    grid = floorplan.tolist()
+
+    # NOTE: rooms_to_grow is a list rather than a set, so that select_room() sees
+    # the rooms in the same order on every run and a seed gives the same floorplan.
     # NOTE: grow rectangles
-    rooms_to_grow = set(rooms)
+    rooms_to_grow = list(rooms)
     while rooms_to_grow:
-        room = select_room(rooms_to_grow)
-        can_grow = grow_rect(room, floorplan)
+        room = select_room(rooms_to_grow, py_rng)
+        can_grow = grow_rect(room, grid, py_rng)
         if not can_grow:
             rooms_to_grow.remove(room)
 
     # NOTE: grow L-Shape
-    rooms_to_grow = set(rooms)
+    rooms_to_grow = list(rooms)
     while rooms_to_grow:
-        room = select_room(rooms_to_grow)
-        can_grow = grow_l_shape(room, floorplan)
+        room = select_room(rooms_to_grow, py_rng)
+        can_grow = grow_l_shape(room, grid, py_rng)
         if not can_grow:
             rooms_to_grow.remove(room)
 
+    floorplan[:] = grid
+
 
 def _set_ideal_ratios(
     ideal_ratios: Dict[int, float],
@@ -395,23 +407,39 @@ def _set_ideal_ratios(
 
 def get_ratio_overlap_score(room_spec: RoomSpec, floorplan: np.ndarray) -> float:
     """Calculate the difference between the ratios in floorplan and room_spec."""
+    return float(get_ratio_overlap_scores(room_spec, floorplan[np.newaxis])[0])
+
+
+def get_ratio_overlap_scores(room_spec: RoomSpec, floorplans: np.ndarray) -> np.ndarray:
+    """get_ratio_overlap_score() of each floorplan of a (K, H, W) stack, with one bincount for the whole stack."""
     # NOTE: Get the average ratio overlap of all rooms
     ideal_ratios = {}
     _set_ideal_ratios(ideal_ratios, rooms=room_spec.spec)
 
-    actual_ratios = {}
-    occupied_cells = (floorplan != OUTDOOR_ROOM_ID).sum()
-    for room_id in room_spec.room_type_map:
-        actual_ratios[room_id] = (floorplan == room_id).sum() / occupied_cells
+    num_ids = max(int(floorplans.max()), *room_spec.room_type_map, OUTDOOR_ROOM_ID) + 1
+    offsets = np.arange(len(floorplans))[:, np.newaxis] * num_ids
+    counts = np.bincount(
+        (floorplans.reshape(len(floorplans), -1) + offsets).ravel(),
+        minlength=len(floorplans) * num_ids,
+    ).reshape(len(floorplans), num_ids)
+    occupied_cells = floorplans[0].size - counts[:, OUTDOOR_ROOM_ID]
 
-    # NOTE: Get the average ratio overlap of all rooms
-    ratio_overlap = sum(
-        [min(actual_ratios[room_id], ideal_ratios[room_id]) for room_id in ideal_ratios]
-    )
+    # NOTE: Get the average ratio overlap of all rooms.
+    # Summed one room at a time, in the same order as sum() over the rooms of a single floorplan.
+    ratio_overlap = np.zeros(len(floorplans))
+    for room_id in ideal_ratios:
+        ratio_overlap = ratio_overlap + np.minimum(counts[:, room_id] / occupied_cells, ideal_ratios[room_id])
 
     return ratio_overlap
 
 
+def get_max_ratio_overlap_score(room_spec: RoomSpec) -> float:
+    """The best possible get_ratio_overlap_score(), reached when every room has its ideal ratio."""
+    ideal_ratios = {}
+    _set_ideal_ratios(ideal_ratios, rooms=room_spec.spec)
+    return sum(ideal_ratios.values())
+
+
 def score_floorplan(room_spec: RoomSpec, floorplan: np.ndarray) -> float:
     """Calculate the quality of the floorplan based on the room specifications."""
     # TODO: Consider ranking by adjacency constraints, maybe hallway connections.
@@ -419,11 +447,19 @@ def score_floorplan(room_spec: RoomSpec, floorplan: np.ndarray) -> float:
     return ratio_overlap_score
 
 
+def score_floorplans(room_spec: RoomSpec, floorplans: np.ndarray) -> np.ndarray:
+    """score_floorplan() of each floorplan of a (K, H, W) stack."""
+    return get_ratio_overlap_scores(room_spec, floorplans)
+
+
 def recursively_expand_rooms(
-    rooms: Sequence[Union[LeafRoom, MetaRoom]], floorplan: np.ndarray
+    rooms: Sequence[Union[LeafRoom, MetaRoom]],
+    floorplan: np.ndarray,
+    rng: Optional[np.random.Generator] = None,
+    py_rng: Optional[random.Random] = None,
 ) -> None:
     """Assign rooms to the floorplan and expand it if it is a MetaRoom."""
-    expand_rooms(rooms, floorplan)
+    expand_rooms(rooms, floorplan, rng, py_rng)
     for room in rooms:
         if isinstance(room, MetaRoom):
             floorplan_mask = floorplan == room.room_id
@@ -431,39 +467,113 @@ def recursively_expand_rooms(
             recursively_expand_rooms(
                 room.children,
                 floorplan[room.min_y : room.max_y, room.min_x : room.max_x],
+                rng,
+                py_rng,
             )
 
 
+def candidate_rngs(seed: int, candidate: int) -> Tuple[np.random.Generator, random.Random]:
+    """The random streams of a floorplan candidate. They only depend on the seed and the candidate index."""
+    seed_sequence = np.random.SeedSequence(seed, spawn_key=(candidate,))
+    rng = np.random.default_rng(seed_sequence)
+    py_rng = random.Random(int(seed_sequence.generate_state(1, np.uint64)[0]))
+    return rng, py_rng
+
+
+def generate_candidates(
+    rooms: Sequence[Union[LeafRoom, MetaRoom]],
+    interior_boundary: np.ndarray,
+    seed: int,
+    candidates: Sequence[int],
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Grow the given candidates on a (K, H, W) stack of copies of the interior boundary.
+
+    Takes room_spec.spec rather than the RoomSpec, since the RoomSpec may not be picklable (see generate_floorplan's executor).
+
+    Returns:
+        The stack and a mask of the candidates that are valid.
+    """
+    floorplans = np.repeat(interior_boundary[np.newaxis], len(candidates), axis=0)
+    valid = np.ones(len(candidates), dtype=bool)
+    for i, candidate in enumerate(candidates):
+        rng, py_rng = candidate_rngs(seed, candidate)
+        try:
+            recursively_expand_rooms(rooms=rooms, floorplan=floorplans[i], rng=rng, py_rng=py_rng)
+        except InvalidFloorplan:
+            valid[i] = False
+    return floorplans, valid
+
+
+def _windowed_results(executor: Executor, pending: deque, room_spec: RoomSpec, interior_boundary: np.ndarray, seed: int, batches: List[List[int]]):
+    # The results of the batches in order, with only about one batch per worker in flight, so that a break on the best
+    # score does not leave the workers growing candidates that are thrown away
+    window = getattr(executor, "_max_workers", None) or os.cpu_count() or 1
+    batches = iter(batches)
+    for batch in itertools.islice(batches, window):
+        pending.append(executor.submit(generate_candidates, room_spec.spec, interior_boundary, seed, batch))
+    while pending:
+        result = pending.popleft().result()
+        for batch in itertools.islice(batches, 1):
+            pending.append(executor.submit(generate_candidates, room_spec.spec, interior_boundary, seed, batch))
+        yield result
+
+
 def generate_floorplan(
     room_spec: np.ndarray,
     interior_boundary: np.ndarray,
     candidate_generations: int = 100,
+    seed: Optional[int] = None,
+    batch_size: int = 10,
+    executor: Optional[Executor] = None,
 ) -> np.ndarray:
     """Generate a floorplan for the given room spec and interior boundary.
 
+    The candidates are grown in batches of batch_size and scored together. The search stops at the end of the first batch
+    that contains a candidate with the best possible score, since no later candidate could replace it.
+
     Args:
         room_spec: Room spec for the floorplan.
         interior_boundary: Interior boundary of the floorplan.
         candidate_generations: Number of candidate generations to generate. The
             best candidate floorplan is returned.
+        seed: Seed of the candidates. Candidate i always uses the same random streams, so the same seed gives the same
+            floorplan whatever the batch_size and executor. If None, the seed is drawn from np.random.
+        batch_size: Number of candidates grown and scored together.
+        executor: If given (e.g. a ProcessPoolExecutor), the batches are grown in it, about one per worker at a time.
     """
     # NOTE: If there is only one room, the floorplan will always be the same.
     if len(room_spec.room_type_map) == 1:
         candidate_generations = 1
 
+    if seed is None:
+        seed = int(np.random.randint(0, 2**31 - 1))
+    max_score = get_max_ratio_overlap_score(room_spec)
+    batches = [
+        list(range(start, min(start + batch_size, candidate_generations)))
+        for start in range(0, candidate_generations, batch_size)
+    ]
+    if executor is not None:
+        pending = deque()
+        results = _windowed_results(executor, pending, room_spec, interior_boundary, seed, batches)
+    else:
+        pending = []
+        results = (generate_candidates(room_spec.spec, interior_boundary, seed, batch) for batch in batches)
+
     best_floorplan = None
     best_score = float("-inf")
-    for _ in range(candidate_generations):
-        floorplan = interior_boundary.copy()
-        try:
-            recursively_expand_rooms(rooms=room_spec.spec, floorplan=floorplan)
-        except InvalidFloorplan:
+    for floorplans, valid in results:
+        if not valid.any():
             continue
-        else:
-            score = score_floorplan(room_spec=room_spec, floorplan=floorplan)
-            if best_floorplan is None or score > best_score:
-                best_floorplan = floorplan
-                best_score = score
+        scores = np.where(valid, score_floorplans(room_spec, floorplans), float("-inf"))
+        # NOTE: argmax takes the first of the best, like the strict > of a sequential search
+        best = int(np.argmax(scores))
+        if best_floorplan is None or scores[best] > best_score:
+            best_floorplan = floorplans[best].copy()
+            best_score = scores[best]
+        if best_score >= max_score:
+            break
+    for future in pending:
+        future.cancel()
 
     if best_floorplan is None:
         raise InvalidFloorplan(
@@ -9,15 +9,17 @@ from shapely.geometry import Polygon
 
 from legent.scene_generation.doors import default_add_doors
 from legent.scene_generation.house import generate_house_structure
+from legent.scene_generation.layout_bank import LayoutBank
 from legent.scene_generation.objects import ObjectDB
 from legent.scene_generation.room import Room
 from legent.scene_generation.room_spec import RoomSpec
 from legent.scene_generation.small_objects import add_small_objects
-from legent.server.rect_placer import RectPlacer
+from legent.server.free_space import FreeSpaceSampler
+from legent.server.rect_placer import GridRectPlacer
 # from legent.utils.io import log
 from legent.utils.math import look_rotation
 
-from .asset_groups import Asset
+from .asset_groups import Asset, AssetGroupTable, get_asset_group_table, sample_from_mask
 from .constants import (
     MARGIN,
     P_CHOOSE_ASSET_GROUP,
@@ -25,6 +27,8 @@ from .constants import (
     PADDING_AGAINST_WALL,
     UNIT_SIZE,
 )
+from .floor_assets import FloorAssetIndex, get_floor_asset_index
+from .rng import MAX_SEED, make_rngs
 from .types import Vector3
 
 DEFAULT_FLOOR_SIZE = 2.5
@@ -33,6 +37,7 @@ SCALE_RATIO = UNIT_SIZE / DEFAULT_FLOOR_SIZE
 DEFAULT_WALL_PREFAB = "LowPolyInterior_WallFloor1_09"
 MAX_SPECIFIED_RECTANGLE_RETRIES = 10
 MAX_SPECIFIED_NUMBER = 20
+FREE_SPACE_RESOLUTION = 0.05
 WALL_THICKNESS = 0.075
 
 
@@ -46,14 +51,30 @@ class HouseGenerator:
         room_spec: Optional[Union[RoomSpec, str]] = None,
         dims: Optional[Tuple[int, int]] = None,
         objectDB: ObjectDB = None,
+        rng: Optional[np.random.Generator] = None,
+        py_rng: Optional[random.Random] = None,
+        layout_bank: Optional[LayoutBank] = None,
+        layout_reuse_probability: float = 1.0,
     ) -> None:
         self.room_spec = room_spec
         self.dims = dims
         self.odb = objectDB
         self.rooms: Dict[str, Room] = dict()
+        # NOTE: the random streams of the scene, all the sampling draws from them (see make_rngs)
+        if rng is None:
+            rng, py_rng = make_rngs()
+        self.rng = rng
+        self.py_rng = py_rng or random.Random(int(rng.integers(0, MAX_SEED)))
+        # NOTE: if set, the house structure is taken from the bank with probability layout_reuse_probability
+        self.layout_bank = layout_bank
+        self.layout_reuse_probability = layout_reuse_probability
 
     def generate_structure(self, room_spec):
-        house_structure = generate_house_structure(room_spec=room_spec, dims=self.dims)
+        if self.layout_bank is not None:
+            house_structure = self.layout_bank.sample(room_spec, self.rng, self.layout_reuse_probability)
+            if house_structure is not None:
+                return house_structure
+        house_structure = generate_house_structure(room_spec=room_spec, dims=self.dims, rng=self.rng, py_rng=self.py_rng)
         return house_structure
 
     def format_object(self, prefab, position, rotation, scale):
@@ -75,14 +96,14 @@ class HouseGenerator:
     def add_floors_and_walls(self, house_structure, room_spec, odb, prefabs):
         room_num = len(room_spec.room_type_map)
         room_ids = set(room_spec.room_type_map.keys())
-        room2wall = {i: np.random.choice(odb.MY_OBJECTS["wall"][:]) for i in room_ids}
+        room2wall = {i: self.rng.choice(odb.MY_OBJECTS["wall"][:]) for i in room_ids}
         DOOR_PREFAB = odb.MY_OBJECTS["door"][0]
         door_x_size = prefabs[DOOR_PREFAB]["size"]["x"]
         door_y_size = prefabs[DOOR_PREFAB]["size"]["y"]
         door_z_size = prefabs[DOOR_PREFAB]["size"]["z"]
         log(f"door_x_size: {door_x_size}, door_y_size: {door_y_size}, door_z_size: {door_z_size}")
 
-        WALL_PREFAB = room2wall[random.choice(list(room2wall.keys()))]
+        WALL_PREFAB = room2wall[self.py_rng.choice(list(room2wall.keys()))]
         wall_x_size, wall_y_size, wall_z_size = (
             prefabs[WALL_PREFAB]["size"]["x"],
             prefabs[WALL_PREFAB]["size"]["y"],
@@ -90,8 +111,8 @@ class HouseGenerator:
         )
         log(f"wall_x_size: {wall_x_size}, wall_y_size: {wall_y_size}, wall_z_size: {wall_z_size}")
         room2wall.update({0: DEFAULT_WALL_PREFAB})
-        room2floor = {i: np.random.choice(odb.MY_OBJECTS["floor"]) for i in room_ids}
-        FLOOR_PREFAB = room2floor[random.choice(list(room2floor.keys()))]
+        room2floor = {i: self.rng.choice(odb.MY_OBJECTS["floor"]) for i in room_ids}
+        FLOOR_PREFAB = room2floor[self.py_rng.choice(list(room2floor.keys()))]
         floor_x_size, floor_y_size, floor_z_size = (
             prefabs[FLOOR_PREFAB]["size"]["x"],
             prefabs[FLOOR_PREFAB]["size"]["y"],
@@ -103,7 +124,7 @@ class HouseGenerator:
         floors = np.where(floors == 1, 0, floors)
         log(f"floors:\n{floors}")
 
-        doors = default_add_doors(odb, room_spec, house_structure)
+        doors = default_add_doors(odb, room_spec, house_structure, py_rng=self.py_rng)
         log(f"doors: {doors}")
         door_positions = set(doors.values())
 
@@ -316,57 +337,49 @@ class HouseGenerator:
                 z + HALF_UNIT_SIZE,
             )
 
-        def random_xz_for_agent(eps, floors):  # To prevent being positioned in the wall and getting pushed out by collision detection.
-            # ravel the floor
-            ravel_floors = floors.ravel()
-            # get the index of the floor
-            floor_idx = np.where(ravel_floors != 0)[0]
-            # sample from the floor index
-            floor_idx = np.random.choice(floor_idx)
-            # get the x and z index
-            x, z = np.unravel_index(floor_idx, floors.shape)
-            log(f"human/agent x: {x}, z: {z}")
-
-            # get the bbox of the floor
-            bbox = get_bbox_of_floor(x, z)
-            # uniformly sample from the bbox, with eps
-            x, z = np.random.uniform(bbox[0] + eps, bbox[2] - eps), np.random.uniform(bbox[1] + eps, bbox[3] - eps)
+        # NOTE: the agents are placed in the free space of the floors, away from the walls (to prevent being positioned
+        # in the wall and getting pushed out by collision detection) and from the doors placed so far
+        sampler = FreeSpaceSampler(self.placer.bbox, resolution=FREE_SPACE_RESOLUTION)
+        for i, j in zip(*np.nonzero(floors)):
+            sampler.free(get_bbox_of_floor(i, j))
+        for i, j in zip(*np.nonzero(floors)):
+            x0, z0, x1, z1 = get_bbox_of_floor(i, j)
+            # the walls between this floor and the floors of other rooms or the outside
+            for di, dj, wall in [(-1, 0, (x0, z0, x0, z1)), (1, 0, (x1, z0, x1, z1)), (0, -1, (x0, z0, x1, z0)), (0, 1, (x0, z1, x1, z1))]:
+                ni, nj = i + di, j + dj
+                if not (0 <= ni < floors.shape[0] and 0 <= nj < floors.shape[1]) or floors[ni][nj] != floors[i][j]:
+                    sampler.occupy((wall[0] - WALL_THICKNESS, wall[1] - WALL_THICKNESS, wall[2] + WALL_THICKNESS, wall[3] + WALL_THICKNESS))
+        sampler.occupy_many(self.placer.rects.tolist())
+
+        def place_agent(x_size, z_size):
+            # raises NoFreeSpaceError if the agent fits nowhere
+            x, z = sampler.place(x_size, z_size, self.rng)
+            self.placer.insert("playmate", (x - x_size / 2, z - z_size / 2, x + x_size / 2, z + z_size / 2))
             return x, z
 
         ### STEP 3: Randomly place the player and playmate (AI agent)
         # place the player
-        while True:
-            x, z = random_xz_for_agent(eps=0.5, floors=floors)
-            x_size, z_size = 1, 1
-            player = {
-                "prefab": "",
-                "position": [x, 0.05, z],
-                "rotation": [0, np.random.uniform(0, 360), 0],
-                "scale": [1, 1, 1],
-                "parent": -1,
-                "type": "",
-            }
-            ok = self.placer.place("playmate", x, z, x_size, z_size)
-
-            if ok:
-                log(f"player x: {x}, z: {z}")
-                break
+        x, z = place_agent(x_size=1, z_size=1)
+        player = {
+            "prefab": "",
+            "position": [x, 0.05, z],
+            "rotation": [0, self.rng.uniform(0, 360), 0],
+            "scale": [1, 1, 1],
+            "parent": -1,
+            "type": "",
+        }
+        log(f"player x: {x}, z: {z}")
         # place the playmate
-        while True:
-            x, z = random_xz_for_agent(eps=0.5, floors=floors)
-            x_size, z_size = 1, 1
-            playmate = {
-                "prefab": "",
-                "position": [x, 0.05, z],
-                "rotation": [0, np.random.uniform(0, 360), 0],
-                "scale": [1, 1, 1],
-                "parent": -1,
-                "type": "",
-            }
-            ok = self.placer.place("playmate", x, z, x_size, z_size)
-            if ok:
-                log(f"playmate x: {x}, z: {z}")
-                break
+        x, z = place_agent(x_size=1, z_size=1)
+        playmate = {
+            "prefab": "",
+            "position": [x, 0.05, z],
+            "rotation": [0, self.rng.uniform(0, 360), 0],
+            "scale": [1, 1, 1],
+            "parent": -1,
+            "type": "",
+        }
+        log(f"playmate x: {x}, z: {z}")
 
         # player lookat the playmate
         vs, vt = np.array(player["position"]), np.array(playmate["position"])
@@ -394,6 +407,7 @@ class HouseGenerator:
                 room_type=room_type,
                 room_id=room_id,
                 odb=self.odb,
+                py_rng=self.py_rng,
             )
             self.rooms[room_id] = room
 
@@ -404,8 +418,10 @@ class HouseGenerator:
         anchor_type: str,
         anchor_delta: int,
         odb: ObjectDB,
-        spawnable_assets: pd.DataFrame,
-        spawnable_asset_groups: pd.DataFrame,
+        floor_assets: FloorAssetIndex,
+        spawnable_asset_types: np.ndarray,  # mask of floor_assets.types that can still spawn in this room
+        asset_group_table: AssetGroupTable,
+        spawnable_asset_groups: np.ndarray,  # mask of the rows of asset_group_table that can spawn in this room
         priority_asset_types: List[str],
     ):
         set_rotated = None
@@ -432,37 +448,35 @@ class HouseGenerator:
         # NOTE: define the size filters
         if anchor_delta in {1, 7}:
             # NOTE: should not be rotated
-            size_filter = lambda assets_df: ((assets_df["xSize"] + x_margin < rect_x_length) & (assets_df["zSize"] + z_margin < rect_z_length))
+            size_filter = lambda x_size, z_size: ((x_size + x_margin < rect_x_length) & (z_size + z_margin < rect_z_length))
             set_rotated = False
         elif anchor_delta in {3, 5}:
             # NOTE: must be rotated
-            size_filter = lambda assets_df: ((assets_df["zSize"] + z_margin < rect_x_length) & (assets_df["xSize"] + x_margin < rect_z_length))
+            size_filter = lambda x_size, z_size: ((z_size + z_margin < rect_x_length) & (x_size + x_margin < rect_z_length))
             set_rotated = True
         else:
             # NOTE: either rotated or not rotated works
-            size_filter = lambda assets_df: (((assets_df["xSize"] + x_margin < rect_x_length) & (assets_df["zSize"] + z_margin < rect_z_length)) | ((assets_df["zSize"] + z_margin < rect_x_length) & (assets_df["xSize"] + x_margin < rect_z_length)))
+            size_filter = lambda x_size, z_size: (((x_size + x_margin < rect_x_length) & (z_size + z_margin < rect_z_length)) | ((z_size + z_margin < rect_x_length) & (x_size + x_margin < rect_z_length)))
 
-        asset_group_candidates = spawnable_asset_groups[spawnable_asset_groups[anchor_type] & size_filter(spawnable_asset_groups)]
-        asset_candidates = spawnable_assets[spawnable_assets[anchor_type] & size_filter(spawnable_assets)]
+        asset_group_candidates = spawnable_asset_groups & asset_group_table.anchors[anchor_type] & size_filter(asset_group_table.x_size, asset_group_table.z_size)
+        asset_candidates = floor_assets.candidates(spawnable_asset_types, anchor_type, size_filter(floor_assets.x_size, floor_assets.z_size))
 
         if priority_asset_types:
             for asset_type in priority_asset_types:
                 asset_type = asset_type.lower()
                 # NOTE: see if there are any semantic asset groups with the asset
-                asset_groups_with_type = asset_group_candidates[asset_group_candidates[f"has{asset_type}"]]
+                asset_groups_with_type = asset_group_candidates & asset_group_table.has_type[asset_type]
 
                 # NOTE: see if assets can spawn by themselves
-                can_spawn_alone_assets = odb.PLACEMENT_ANNOTATIONS[odb.PLACEMENT_ANNOTATIONS.index == asset_type]
-
-                can_spawn_standalone = len(can_spawn_alone_assets) and (can_spawn_alone_assets[f"in{room.room_type}s"].iloc[0] > 0)
+                can_spawn_standalone = floor_assets.standalone_weights.get(asset_type, 0) > 0
                 assets_with_type = None
                 if can_spawn_standalone:
-                    assets_with_type = asset_candidates[asset_candidates["assetType"] == asset_type]
+                    assets_with_type = floor_assets.with_type(asset_candidates, asset_type)
 
                 # NOTE: try using an asset group first
-                if len(asset_groups_with_type) and (assets_with_type is None or random.random() <= P_CHOOSE_ASSET_GROUP):
+                if asset_groups_with_type.any() and (assets_with_type is None or self.py_rng.random() <= P_CHOOSE_ASSET_GROUP):
                     # NOTE: Try using an asset group
-                    asset_group = asset_groups_with_type.sample()
+                    asset_group = asset_group_table.row(asset_group_table.sample(asset_groups_with_type, self.rng))
                     chosen_asset_group = room.place_asset_group(
                         asset_group=asset_group,
                         set_rotated=set_rotated,
@@ -473,9 +487,9 @@ class HouseGenerator:
                         return chosen_asset_group
 
                 # NOTE: try using a standalone asset
-                if assets_with_type is not None and len(assets_with_type):
+                if assets_with_type is not None and assets_with_type.any():
                     # NOTE: try spawning in standalone
-                    asset = assets_with_type.sample()
+                    asset = floor_assets.record(sample_from_mask(assets_with_type, self.rng))
                     return room.place_asset(
                         asset=asset,
                         set_rotated=set_rotated,
@@ -486,10 +500,10 @@ class HouseGenerator:
         can_use_asset_group = True
         must_use_asset_group = False
 
-        if (len(asset_group_candidates) and random.random() <= P_CHOOSE_ASSET_GROUP and can_use_asset_group) or (must_use_asset_group and len(asset_group_candidates)):
+        if (asset_group_candidates.any() and self.py_rng.random() <= P_CHOOSE_ASSET_GROUP and can_use_asset_group) or (must_use_asset_group and asset_group_candidates.any()):
 
             # NOTE: use an asset group if you can
-            asset_group = asset_group_candidates.sample()
+            asset_group = asset_group_table.row(asset_group_table.sample(asset_group_candidates, self.rng))
             chosen_asset_group = room.place_asset_group(
                 asset_group=asset_group,
                 set_rotated=set_rotated,
@@ -501,16 +515,15 @@ class HouseGenerator:
             return chosen_asset_group
 
         # NOTE: Skip weight 1 assets with a probability of P_W1_ASSET_SKIPPED
-        if random.random() <= P_W1_ASSET_SKIPPED:
-            asset_candidates = asset_candidates[asset_candidates[f"in{room.room_type}s"] != 1]
+        if self.py_rng.random() <= P_W1_ASSET_SKIPPED:
+            asset_candidates = asset_candidates & (floor_assets.weights != 1)
 
         # NOTE: no assets fit the anchor_type and size criteria
-        if not len(asset_candidates):
+        if not asset_candidates.any():
             return None
 
         # NOTE: this is a sampling by asset type
-        asset_type = random.choice(asset_candidates["assetType"].unique())
-        asset = asset_candidates[asset_candidates["assetType"] == asset_type].sample()
+        asset = floor_assets.record(floor_assets.sample_by_type(asset_candidates, self.rng, self.py_rng))
         return room.place_asset(
             asset=asset,
             set_rotated=set_rotated,
@@ -519,50 +532,8 @@ class HouseGenerator:
         )
 
     def get_spawnable_asset_group_info(self) -> pd.DataFrame:
-        from .asset_groups import AssetGroupGenerator
-
-        asset_groups = self.odb.ASSET_GROUPS
-
-        data = []
-        for asset_group_name, asset_group_data in asset_groups.items():
-            asset_group_generator = AssetGroupGenerator(
-                name=asset_group_name,
-                data=asset_group_data,
-                odb=self.odb,
-            )
-
-            dims = asset_group_generator.dimensions
-            group_properties = asset_group_data["groupProperties"]
-
-            # NOTE: This is kinda naive, since a single asset in the asset group
-            # could map to multiple different types of asset types (e.g., Both Chair
-            # and ArmChair could be in the same asset).
-            # NOTE: use the asset_group_generator.data instead of asset_group_data
-            # since it only includes assets from a given split.
-            asset_types_in_group = set(asset_type for asset in asset_group_generator.data["assetMetadata"].values() for asset_type, asset_id in asset["assetIds"])
-            group_data = {
-                "assetGroupName": asset_group_name,
-                "assetGroupGenerator": asset_group_generator,
-                "xSize": dims["x"],
-                "ySize": dims["y"],
-                "zSize": dims["z"],
-                "inBathrooms": group_properties["roomWeights"]["bathrooms"],
-                "inBedrooms": group_properties["roomWeights"]["bedrooms"],
-                "inKitchens": group_properties["roomWeights"]["kitchens"],
-                "inLivingRooms": group_properties["roomWeights"]["livingRooms"],
-                "allowDuplicates": group_properties["properties"]["allowDuplicates"],
-                "inCorner": group_properties["location"]["corner"],
-                "onEdge": group_properties["location"]["edge"],
-                "inMiddle": group_properties["location"]["middle"],
-            }
-
-            # NOTE: Add which types are in this asset group
-            for asset_type in self.odb.OBJECT_DICT.keys():
-                group_data[f"has{asset_type}"] = asset_type in asset_types_in_group
-
-            data.append(group_data)
-
-        return pd.DataFrame(data)
+        # The table only depends on the ObjectDB, so it is built once and cached there
+        return get_asset_group_table(self.odb).to_dataframe()
 
     def prefab_fit_rectangle(self, prefab_size, rectangle):
         x0, z0, x1, z1 = rectangle
@@ -581,6 +552,7 @@ class HouseGenerator:
         self,
         object_counts: Dict[str, int] = {},
         receptacle_object_counts: Dict[str, Dict[str, int]] = {},
+        save_last_scene: bool = True,
     ):
         odb = self.odb
         prefabs = odb.PREFABS
@@ -594,7 +566,7 @@ class HouseGenerator:
         z_size = interior_boundary.shape[1]
 
         min_x, min_z, max_x, max_z = 0, 0, x_size * UNIT_SIZE, z_size * UNIT_SIZE
-        self.placer = RectPlacer((min_x, min_z, max_x, max_z))
+        self.placer = GridRectPlacer((min_x, min_z, max_x, max_z))
 
         floor_instances, floors = self.add_floors_and_walls(house_structure, room_spec, odb, prefabs)
 
@@ -606,7 +578,7 @@ class HouseGenerator:
 
         max_floor_objects = 10
 
-        spawnable_asset_group_info = self.get_spawnable_asset_group_info()
+        asset_group_table = get_asset_group_table(odb)
 
         specified_object_instances = []
         specified_object_types = set()
@@ -614,7 +586,7 @@ class HouseGenerator:
             # first place the specified receptacles
             for receptacle, d in receptacle_object_counts.items():
                 receptacle_type = receptacle
-                receptacle = random.choice(odb.OBJECT_DICT[receptacle.lower()])
+                receptacle = self.py_rng.choice(odb.OBJECT_DICT[receptacle.lower()])
                 specified_object_types.add(odb.OBJECT_TO_TYPE[receptacle])
                 count = d["count"]
                 prefab_size = odb.PREFABS[receptacle]["size"]
@@ -637,8 +609,8 @@ class HouseGenerator:
                                 minz += z_size / 2 + WALL_THICKNESS
                                 maxx -= x_size / 2 + WALL_THICKNESS
                                 maxz -= z_size / 2 + WALL_THICKNESS
-                                x = np.random.uniform(minx, maxx)
-                                z = np.random.uniform(minz, maxz)
+                                x = self.rng.uniform(minx, maxx)
+                                z = self.rng.uniform(minz, maxz)
                                 bbox = (
                                     x - x_size / 2,
                                     z - z_size / 2,
@@ -671,9 +643,10 @@ class HouseGenerator:
         object_instances = []
         for room in self.rooms.values():
             asset = None
-            spawnable_asset_groups = spawnable_asset_group_info[spawnable_asset_group_info[f"in{room.room_type}s"] > 0]
+            spawnable_asset_groups = asset_group_table.room_weights[f"in{room.room_type}s"] > 0
 
-            floor_types, spawnable_assets = odb.FLOOR_ASSET_DICT[(room.room_type, room.split)]
+            floor_assets = get_floor_asset_index(odb, room.room_type, room.split)
+            spawnable_asset_types = floor_assets.spawnable_types()
 
             priority_asset_types = copy.deepcopy(odb.PRIORITY_ASSET_TYPES.get(room.room_type, []))
             for i in range(max_floor_objects):
@@ -696,7 +669,9 @@ class HouseGenerator:
                     rectangle=rectangle,
                     anchor_type=anchor_type,
                     anchor_delta=anchor_delta,
-                    spawnable_assets=spawnable_assets,
+                    floor_assets=floor_assets,
+                    spawnable_asset_types=spawnable_asset_types,
+                    asset_group_table=asset_group_table,
                     spawnable_asset_groups=spawnable_asset_groups,
                     priority_asset_types=priority_asset_types,
                     odb=odb,
@@ -720,21 +695,21 @@ class HouseGenerator:
                     added_asset_types.extend([o["assetType"] for o in asset["objects"]])
 
                     if not asset["allowDuplicates"]:
-                        spawnable_asset_groups = spawnable_asset_groups.query(f"assetGroupName!='{asset['assetGroupName']}'")
+                        spawnable_asset_groups = spawnable_asset_groups & (asset_group_table.names != asset["assetGroupName"])
 
                 for asset_type in added_asset_types:
                     # Remove spawned object types from `priority_asset_types` when appropriate
                     if asset_type in priority_asset_types:
                         priority_asset_types.remove(asset_type)
 
-                    allow_duplicates_of_asset_type = odb.PLACEMENT_ANNOTATIONS.loc[asset_type.lower()]["multiplePerRoom"]
+                    allow_duplicates_of_asset_type = floor_assets.multiple_per_room[asset_type.lower()]
 
                     if not allow_duplicates_of_asset_type:
                         # NOTE: Remove all asset groups that have the type
-                        spawnable_asset_groups = spawnable_asset_groups[~spawnable_asset_groups[f"has{asset_type.lower()}"]]
+                        spawnable_asset_groups = spawnable_asset_groups & ~asset_group_table.has_type[asset_type.lower()]
 
                         # NOTE: Remove all standalone assets that have the type
-                        spawnable_assets = spawnable_assets[spawnable_assets["assetType"] != asset_type]
+                        floor_assets.remove_type(spawnable_asset_types, asset_type)
 
         def convert_position(position: Vector3):
             x = a.position["x"]
@@ -892,6 +867,8 @@ class HouseGenerator:
             object_counts=object_counts,
             specified_object_instances=specified_object_instances,
             receptacle_object_counts=receptacle_object_counts,
+            rng=self.rng,
+            py_rng=self.py_rng,
         )
 
         ### STEP 5: Adjust Positions for Unity GameObject
@@ -916,6 +893,7 @@ class HouseGenerator:
             "agent": playmate,
             "center": center,
         }
-        with open("last_scene.json", "w", encoding="utf-8") as f:
-            json.dump(infos, f, ensure_ascii=False, indent=4)
+        if save_last_scene:
+            with open("last_scene.json", "w", encoding="utf-8") as f:
+                json.dump(infos, f, ensure_ascii=False, indent=4)
         return infos
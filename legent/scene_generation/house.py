@@ -1,3 +1,4 @@
+import random
 from collections import defaultdict
 from typing import Dict, List, Optional, Sequence, Set, Tuple
 
@@ -9,6 +10,7 @@ from legent.scene_generation.room_spec import RoomSpec
 
 from .floorplan import generate_floorplan
 from .interior_boundaries import sample_interior_boundary
+from .rng import make_rngs
 
 
 @define
@@ -28,21 +30,40 @@ from .constants import UNIT_SIZE
 INTERIOR_BOUNDARY_SCALE = UNIT_SIZE
 
 
+def _wall_cells(floorplan: np.ndarray) -> List[List[int]]:
+    """The (row, col, down, room_id_1, room_id_2) of the cells with a wall to their next column (down = 0) or next row
+    (down = 1), where room_id_1 < room_id_2 are the rooms on both sides.
+
+    The walls are found with masks of the cells that differ from their neighbors, and listed in the row-major order of
+    the cells, the wall to the next column of a cell first.
+    """
+    floorplan = np.asarray(floorplan)
+    cells = floorplan[:-1, :-1]
+    differs = np.stack([cells != floorplan[:-1, 1:], cells != floorplan[1:, :-1]], axis=-1)
+    rows, cols, down = np.nonzero(differs)
+    a = cells[rows, cols]
+    b = np.where(down == 1, floorplan[rows + 1, cols], floorplan[rows, cols + 1])
+    low, high = np.minimum(a, b).astype(np.int64), np.maximum(a, b).astype(np.int64)
+    return [array.tolist() for array in (rows, cols, down, low, high)]
+
+
 def find_walls(floorplan: np.array):
+    """The unit walls between the cells of different rooms, as {(room_id_1, room_id_2): [((row, col), (row, col))]}.
+
+    The wall between a cell and its next column is ((row - 1, col), (row, col)), and the wall between a cell and its
+    next row is ((row, col - 1), (row, col)).
+    """
     walls = defaultdict(list)
-    for row in range(len(floorplan) - 1):
-        for col in range(len(floorplan[0]) - 1):
-            a = floorplan[row, col]
-            b = floorplan[row, col + 1]
-            if a != b:
-                walls[(int(min(a, b)), int(max(a, b)))].append(
-                    ((row - 1, col), (row, col))
-                )
-            b = floorplan[row + 1, col]
-            if a != b:
-                walls[(int(min(a, b)), int(max(a, b)))].append(
-                    ((row, col - 1), (row, col))
-                )
+    for row, col, down, a, b in zip(*_wall_cells(floorplan)):
+        walls[(a, b)].append(((row, col - 1), (row, col)) if down else ((row - 1, col), (row, col)))
+    return walls
+
+
+def find_door_walls(floorplan: np.array):
+    """The walls of find_walls() in the same order, as the edges of the cells where doors are placed."""
+    walls = defaultdict(list)
+    for row, col, down, a, b in zip(*_wall_cells(floorplan)):
+        walls[(a, b)].append(((row, col), (row + 1, col)) if down else ((row, col), (row, col + 1)))
     return walls
 
 
@@ -79,45 +100,33 @@ def consolidate_walls(walls):
             ((0, 0), (9, 0))
         }
     """
-    out = dict()
-    for wall_group_id, wall_pairs in walls.items():
-        wall_map = defaultdict(lambda: set())
-        wall_map = dict()
-        for wall in wall_pairs:
-            if wall[0] not in wall_map:
-                wall_map[wall[0]] = set()
-            wall_map[wall[0]].add(wall[1])
-
-        did_update = True
-        while did_update:
-            did_update = False
-            for w1_1 in wall_map.copy():
-                if w1_1 not in wall_map:
-                    continue
-                break_outer = False
-                for w1_2 in wall_map[w1_1]:
-                    if w1_2 in wall_map:
-                        w2_1 = w1_2
-                        for w2_2 in wall_map[w2_1]:
-                            if (
-                                w1_1[0] == w1_2[0] == w2_1[0] == w2_2[0]
-                                or w1_1[1] == w1_2[1] == w2_1[1] == w2_2[1]
-                            ):
-                                wall_map[w2_1].remove(w2_2)
-                                if not wall_map[w2_1]:
-                                    del wall_map[w2_1]
-
-                                wall_map[w1_1].remove(w2_1)
-                                wall_map[w1_1].add(w2_2)
-
-                                did_update = True
-                                break_outer = True
-                                break
-                        if break_outer:
-                            break
-                    if break_outer:
-                        break
-        out[wall_group_id] = set([(w1, w2) for w1 in wall_map for w2 in wall_map[w1]])
+    out = {wall_group_id: set() for wall_group_id in walls}
+    wall_group_ids = list(walls.keys())
+    segments = np.array([wall for wall_pairs in walls.values() for wall in wall_pairs], dtype=np.int64).reshape(-1, 4)
+    if len(segments) == 0:
+        return out
+    groups = np.repeat(np.arange(len(wall_group_ids)), [len(wall_pairs) for wall_pairs in walls.values()])
+
+    # NOTE: each wall goes from the lower to the higher coordinate along one axis (see find_walls), so the walls
+    # joined together are the runs of walls on the same line where each one starts at the end of the previous one
+    along_col = segments[:, 0] == segments[:, 2]
+    line = np.where(along_col, segments[:, 0], segments[:, 1])
+    start = np.where(along_col, segments[:, 1], segments[:, 0])
+    end = np.where(along_col, segments[:, 3], segments[:, 2])
+    order = np.lexsort((start, line, along_col, groups))
+    groups, along_col, line, start, end = groups[order], along_col[order], line[order], start[order], end[order]
+
+    new_run = np.ones(len(order), dtype=bool)
+    new_run[1:] = (groups[1:] != groups[:-1]) | (along_col[1:] != along_col[:-1]) | (line[1:] != line[:-1]) | (start[1:] != end[:-1])
+    firsts = np.flatnonzero(new_run)
+    lasts = np.append(firsts[1:], len(order)) - 1
+    for group, is_along_col, line_, start_, end_ in zip(
+        groups[firsts].tolist(), along_col[firsts].tolist(), line[firsts].tolist(), start[firsts].tolist(), end[lasts].tolist()
+    ):
+        if is_along_col:
+            out[wall_group_ids[group]].add(((line_, start_), (line_, end_)))
+        else:
+            out[wall_group_ids[group]].add(((start_, line_), (end_, line_)))
     return out
 
 
@@ -215,7 +224,14 @@ def get_xz_poly_map(boundary_groups, room_ids: Set[int]) -> Dict[int, XZPoly]:
     return out
 
 
-def generate_house_structure(room_spec: RoomSpec, dims: Optional[Tuple[int, int]]):
+def generate_house_structure(
+    room_spec: RoomSpec,
+    dims: Optional[Tuple[int, int]],
+    rng: Optional[np.random.Generator] = None,
+    py_rng: Optional[random.Random] = None,
+):
+    if rng is None:
+        rng, py_rng = make_rngs()
     room_ids = set(room_spec.room_type_map.keys())
 
     generate_dims = None
@@ -229,10 +245,15 @@ def generate_house_structure(room_spec: RoomSpec, dims: Optional[Tuple[int, int]
     interior_boundary = sample_interior_boundary(
         num_rooms=len(room_ids),
         dims=generate_dims,
+        rng=rng,
+        py_rng=py_rng,
     )
 
+    # NOTE: the floorplan candidates have their own streams, spawned from this seed.
     floorplan = generate_floorplan(
-        room_spec=room_spec, interior_boundary=interior_boundary
+        room_spec=room_spec,
+        interior_boundary=interior_boundary,
+        seed=int(rng.integers(0, 2**31 - 1)),
     )
 
     floorplan = np.pad(
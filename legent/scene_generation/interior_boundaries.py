@@ -6,6 +6,8 @@ import numpy as np
 
 from legent.scene_generation.constants import OUTDOOR_ROOM_ID
 
+from .rng import make_rngs
+
 DEFAULT_AVERAGE_ROOM_SIZE = 3
 """Average room size in meters"""
 
@@ -16,8 +18,8 @@ DEFAULT_MAX_BOUNDARY_CUT_AREA = 6
 """Max area of a single chop along the boundary."""
 
 
-def get_n_cuts(num_rooms: int) -> int:
-    return round(np.random.beta(a=0.5 * num_rooms, b=6) * 10)
+def get_n_cuts(num_rooms: int, rng: np.random.Generator) -> int:
+    return round(rng.beta(a=0.5 * num_rooms, b=6) * 10)
 
 
 def sample_interior_boundary(
@@ -26,19 +28,26 @@ def sample_interior_boundary(
     min_house_side_length: int = DEFAULT_MIN_HOUSE_SIDE_LENGTH,
     max_boundary_cut_area: int = DEFAULT_MAX_BOUNDARY_CUT_AREA,
     dims: Optional[Tuple[int, int]] = None,
+    rng: Optional[np.random.Generator] = None,
+    py_rng: Optional[random.Random] = None,
 ) -> np.array:
     """Sample a boundary for the interior of a house.
 
     Parameters:
         num_rooms: The number of rooms in the house.
         dims: The (x_size, z_size) dimensions of the house.
+        rng, py_rng: The random streams of the scene (see make_rngs()).
     """
     assert num_rooms > 0
+    if rng is None:
+        rng, py_rng = make_rngs()
+    elif py_rng is None:
+        py_rng = random
 
     # NOTE: -1 * average_room_size and +1 * average_room_size adds in some
     # variance. The +1 makes high is inclusive.
     if dims is None:
-        x_size, z_size = np.random.randint(
+        x_size, z_size = rng.integers(
             low=max(
                 min_house_side_length,
                 np.sqrt(num_rooms) * average_room_size - 1 * average_room_size // 2,
@@ -53,13 +62,13 @@ def sample_interior_boundary(
 
     boundary = np.zeros((z_size, x_size), dtype=int)
 
-    n_cuts = get_n_cuts(num_rooms=num_rooms)
+    n_cuts = get_n_cuts(num_rooms=num_rooms, rng=rng)
     logging.debug(f"Number of cuts: {n_cuts}")
 
-    chop_sides = np.random.randint(0, 4, size=n_cuts)
+    chop_sides = rng.integers(0, 4, size=n_cuts)
 
     for chop_side in chop_sides:
-        x_cut = np.random.randint(
+        x_cut = rng.integers(
             low=1, high=max(2, min(x_size - 1, max_boundary_cut_area // 2))
         )
         z_cut_candidates = []
@@ -69,7 +78,7 @@ def sample_interior_boundary(
             z_cut_candidates.append(i)
             i += 1
 
-        z_cut = random.choice(z_cut_candidates)
+        z_cut = py_rng.choice(z_cut_candidates)
 
         if chop_side == 0:
             # NOTE: top-right corner
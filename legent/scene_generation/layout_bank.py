@@ -0,0 +1,199 @@
+"""
+A bank of pre-generated house layouts (HouseStructures) keyed by room spec, so that thousands of furnished scenes can be
+generated from a small number of layouts without sampling the interior boundary, the floorplan, the walls and the room
+polygons of each one again.
+
+Build it offline with build_layout_bank() (or "legent build-layouts") and pass it, or its directory, to generate_scene().
+The bank is a directory with:
+
+    index.json: the room_spec_id, key and number of layouts of each room spec
+    layouts-{key}.pkl: the pickled list of the HouseStructures of one room spec
+"""
+from typing import Dict, List, Optional, Sequence, Union
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import copy
+import hashlib
+import json
+import os
+import pickle
+import numpy as np
+from attrs import evolve
+from tqdm import tqdm
+from legent.scene_generation.house import HouseStructure, generate_house_structure
+from legent.scene_generation.rng import make_rngs
+from legent.scene_generation.room_spec import LeafRoom, MetaRoom, RoomSpec
+
+INDEX_FILE = "index.json"
+VERSION = 1
+MAX_LAYOUT_RETRIES = 3
+
+
+def _spec_tree(spec: Sequence[Union[LeafRoom, MetaRoom]]) -> List:
+    tree = []
+    for room in spec:
+        if isinstance(room, MetaRoom):
+            tree.append(["meta", room.ratio, room.room_type, _spec_tree(room.children)])
+        else:
+            tree.append(["leaf", room.room_id, room.ratio, room.room_type, room.avoid_doors_from_metarooms])
+    return tree
+
+
+def room_spec_key(room_spec: RoomSpec) -> str:
+    """The key of the layouts of a room spec: its room_spec_id and a hash of its rooms, since different specs may share an id."""
+    digest = hashlib.sha1(json.dumps(_spec_tree(room_spec.spec)).encode("utf-8")).hexdigest()
+    return f"{room_spec.room_spec_id}-{digest[:10]}"
+
+
+def layout_file(key: str) -> str:
+    return f"layouts-{key}.pkl"
+
+
+def load_index(directory: str) -> Optional[Dict]:
+    path = os.path.join(directory, INDEX_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _store(path: str, write) -> None:
+    # Write to a temporary file and rename it when complete, so that the bank is never left half written
+    with open(f"{path}.tmp", "wb") as f:
+        write(f)
+    os.replace(f"{path}.tmp", path)
+
+
+class LayoutBank:
+    def __init__(self, directory: str) -> None:
+        """
+        The layouts of a bank directory made by build_layout_bank(). The layouts of a room spec are read on first use.
+        """
+        self.directory = directory
+        self.index = load_index(directory)
+        if self.index is None:
+            raise Exception(f"No layout bank in {directory}")
+        if self.index["version"] != VERSION:
+            raise Exception(f"The layout bank in {directory} was built by another version, build it again")
+        self._layouts: Dict[str, List[HouseStructure]] = {}
+
+    def layouts(self, room_spec: RoomSpec) -> List[HouseStructure]:
+        """The layouts of the room spec (empty if the bank has none). Do not modify them, see sample()."""
+        key = room_spec_key(room_spec)
+        if key not in self._layouts:
+            if key not in self.index["room_specs"]:
+                self._layouts[key] = []
+            else:
+                with open(os.path.join(self.directory, layout_file(key)), "rb") as f:
+                    self._layouts[key] = pickle.load(f)
+        return self._layouts[key]
+
+    def sample(
+        self, room_spec: RoomSpec, rng: Optional[np.random.Generator] = None, reuse_probability: float = 1.0
+    ) -> Optional[HouseStructure]:
+        """
+        A random layout of the room spec, or None if a new layout should be generated instead: when the bank has no
+        layout of the room spec, and otherwise with probability 1 - reuse_probability.
+        """
+        layouts = self.layouts(room_spec)
+        if not layouts:
+            return None
+        rng = rng if rng is not None else np.random
+        if reuse_probability < 1 and rng.random() >= reuse_probability:
+            return None
+        # NOTE: a copy, so that the scene generation can not modify the layouts of the bank
+        return copy.deepcopy(layouts[int(rng.integers(len(layouts)))])
+
+
+_LAYOUT_BANKS: Dict[str, LayoutBank] = {}
+
+
+def get_layout_bank(directory: str) -> LayoutBank:
+    """The LayoutBank of the directory, opened once per process."""
+    directory = os.path.abspath(directory)
+    if directory not in _LAYOUT_BANKS:
+        _LAYOUT_BANKS[directory] = LayoutBank(directory)
+    return _LAYOUT_BANKS[directory]
+
+
+def layout_seed(entropy: int, key: str, layout_id: int, attempt: int = 0) -> int:
+    """The seed of a layout of the bank. It depends on the key of the room spec rather than its position in the list."""
+    key_id = int(hashlib.sha1(key.encode("utf-8")).hexdigest()[:8], 16)
+    spawn_key = (key_id, layout_id) if attempt == 0 else (key_id, layout_id, attempt)
+    return int(np.random.SeedSequence(entropy, spawn_key=spawn_key).generate_state(1)[0])
+
+
+def _generate_layouts(room_spec: RoomSpec, key: str, first: int, count: int, entropy: int) -> Dict:
+    layouts = []
+    failed = 0
+    for layout_id in range(first, first + count):
+        for attempt in range(MAX_LAYOUT_RETRIES):
+            rng, py_rng = make_rngs(layout_seed(entropy, key, layout_id, attempt))
+            try:
+                layouts.append(generate_house_structure(room_spec=room_spec, dims=None, rng=rng, py_rng=py_rng))
+                break
+            except Exception:
+                continue
+        else:
+            failed += 1
+    return {"key": key, "first": first, "layouts": layouts, "failed": failed}
+
+
+def build_layout_bank(
+    directory: str, room_specs: Sequence[RoomSpec], num: int = 100, workers: Optional[int] = None,
+    seed: Optional[int] = None, chunk_size: int = 20
+) -> Dict:
+    """
+    Generate num layouts of each room spec with a pool of processes into a bank directory, and return its index.
+
+    The layouts of a room spec only depend on the seed and the spec, so the bank is the same whatever the number of
+    workers. Room specs already in the bank with at least num layouts are kept, so more room specs can be added later.
+
+    Args:
+        directory: The directory of the bank.
+        room_specs: The room specs, e.g. ROOM_SPEC_SAMPLER.room_specs.
+        num: Number of layouts per room spec.
+        workers: Number of generating processes. Defaults to the number of CPUs.
+        seed: The seed of the bank. If None, a random one is used (and recorded in the index).
+        chunk_size: Number of layouts per task of the processes.
+    """
+    from legent.server.scene_workers import scene_generation_context
+
+    os.makedirs(directory, exist_ok=True)
+    index = load_index(directory)
+    if index is None or index["version"] != VERSION:
+        index = {"version": VERSION, "seed": seed, "entropy": np.random.SeedSequence(seed).entropy, "room_specs": {}}
+    elif seed is not None and index["seed"] != seed:
+        raise Exception(f"{directory} holds layouts generated with another seed, use another directory to build a new bank")
+    entropy = index["entropy"]
+
+    todo = {}
+    for room_spec in room_specs:
+        key = room_spec_key(room_spec)
+        if key not in todo and index["room_specs"].get(key, {}).get("count", 0) < num:
+            # NOTE: without dims, which is a lambda and can not be sent to the workers (and is not used by generate_house_structure)
+            todo[key] = evolve(room_spec, dims=None)
+    if not todo:
+        return index
+
+    results = {key: [] for key in todo}
+    with tqdm(total=num * len(todo), desc="Generating layouts") as progress:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, mp_context=scene_generation_context()) as executor:
+            futures = []
+            for key, room_spec in todo.items():
+                for first in range(0, num, chunk_size):
+                    futures.append(executor.submit(_generate_layouts, room_spec, key, first, min(chunk_size, num - first), entropy))
+            for future in as_completed(futures):
+                result = future.result()
+                results[result["key"]].append(result)
+                progress.update(len(result["layouts"]) + result["failed"])
+
+    for key, chunks in results.items():
+        chunks.sort(key=lambda chunk: chunk["first"])
+        layouts = [layout for chunk in chunks for layout in chunk["layouts"]]
+        _store(os.path.join(directory, layout_file(key)), lambda f: pickle.dump(layouts, f, protocol=pickle.HIGHEST_PROTOCOL))
+        index["room_specs"][key] = {
+            "room_spec_id": todo[key].room_spec_id, "file": layout_file(key), "count": len(layouts),
+            "failed": sum(chunk["failed"] for chunk in chunks),
+        }
+        _store(os.path.join(directory, INDEX_FILE), lambda f: f.write(json.dumps(index, ensure_ascii=False, indent=4).encode("utf-8")))
+    return index
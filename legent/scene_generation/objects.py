@@ -4,7 +4,7 @@ from collections import defaultdict
 from typing import Any, Dict, List, Tuple
 
 import pandas as pd
-from attr import define
+from attr import define, field
 
 from legent.environment.env_utils import get_default_env_data_path
 
@@ -23,6 +23,9 @@ class ObjectDB:
     PRIORITY_ASSET_TYPES: Dict[
         str, List[str]
     ]  # These objects should be placed first inside of the rooms.
+    ASSET_GROUP_TABLE: Any = None  # The AssetGroupTable of ASSET_GROUPS, built on first use by asset_groups.get_asset_group_table().
+    FLOOR_ASSET_INDEXES: Dict[Tuple[str, str], Any] = field(factory=dict)  # The FloorAssetIndex of each key of FLOOR_ASSET_DICT, see floor_assets.get_floor_asset_index().
+    ASSET_GROUP_TEMPLATES: Dict[str, Any] = field(factory=dict)  # The AssetGroupTemplate of each asset group, see asset_groups.get_asset_group_template().
 
 ENV_DATA_PATH = None
 def get_data_path():
@@ -134,19 +137,33 @@ def _get_receptacles():
     return json.load(open(filepath))
 
 
+def load_object_db_fields() -> Dict[str, Any]:
+    """The fields of the ObjectDB read from the data files (everything but the caches and PRIORITY_ASSET_TYPES)."""
+    prefabs, kinetic_and_interactable_info = _get_prefabs()
+    return {
+        "PLACEMENT_ANNOTATIONS": _get_place_annotations(),
+        "OBJECT_DICT": _get_object_dict(),
+        "MY_OBJECTS": _get_my_objects(),
+        "OBJECT_TO_TYPE": _get_object_to_type(),
+        "PREFABS": prefabs,
+        "RECEPTACLES": _get_receptacles(),
+        "KINETIC_AND_INTERACTABLE_INFO": kinetic_and_interactable_info,
+        "ASSET_GROUPS": _get_asset_groups(),
+    }
+
+
 DEFAULT_OBJECT_DB = None
 def get_default_object_db():
     global DEFAULT_OBJECT_DB
     if DEFAULT_OBJECT_DB is None:
+        from legent.scene_generation.odb_snapshot import load_object_db_snapshot
+
+        # NOTE: the snapshot built by "legent build-odb" if it is up to date, otherwise the data files
+        fields = load_object_db_snapshot()
+        if fields is None:
+            fields = load_object_db_fields()
         DEFAULT_OBJECT_DB = ObjectDB(
-            PLACEMENT_ANNOTATIONS=_get_place_annotations(),
-            OBJECT_DICT=_get_object_dict(),
-            MY_OBJECTS=_get_my_objects(),
-            OBJECT_TO_TYPE=_get_object_to_type(),
-            PREFABS=_get_prefabs()[0],
-            RECEPTACLES=_get_receptacles(),
-            KINETIC_AND_INTERACTABLE_INFO=_get_prefabs()[1],
-            ASSET_GROUPS=_get_asset_groups(),
+            **fields,
             FLOOR_ASSET_DICT=keydefaultdict(_get_default_floor_assets_from_key),
             PRIORITY_ASSET_TYPES={
                 "Bedroom": ["bed", "dresser"],
@@ -0,0 +1,174 @@
+"""
+A prebuilt snapshot of the default ObjectDB, so that a process loads it in one read instead of parsing
+placement_annotations.csv, addressables.json, the asset groups and the other JSON files.
+
+Build it with "legent build-odb" after downloading or changing the environment data. get_default_object_db() uses it
+when it is up to date with the data files, and reads the data files otherwise.
+
+The snapshot file is:
+
+    header: magic "LGOD", version (uint32), length L of the JSON metadata (uint32)
+    metadata (L bytes): the content hash and the sizes and modification times of the source files, the library
+        versions, and the offsets and lengths of the sections below
+    the ObjectDB fields, pickled with protocol 5
+    the out-of-band buffers of the pickle (the NumPy arrays of the DataFrames), each 64-byte aligned
+
+The file is memory-mapped and the buffers are used in place, so the arrays are read-only views of the file,
+whose pages are shared by all the processes that load it.
+"""
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+import sys
+import numpy as np
+import pandas as pd
+from legent.scene_generation.objects import get_data_path, load_object_db_fields
+from legent.utils.io import log
+
+MAGIC = b"LGOD"
+VERSION = 1
+SNAPSHOT_FILE = "object_db.snapshot"
+SOURCE_FILES = [
+    "placement_annotations.csv",
+    "object_dict.json",
+    "my_objects.json",
+    "object_name_to_type.json",
+    "addressables.json",
+    "receptacle.json",
+]
+SOURCE_DIRS = ["asset_groups"]
+
+_HEADER = struct.Struct("<4sII")
+_ALIGNMENT = 64
+
+
+def default_snapshot_path() -> str:
+    return os.path.join(get_data_path(), SNAPSHOT_FILE)
+
+
+def _source_paths(data_path: str) -> List[str]:
+    """the paths of the source files relative to data_path, in a fixed order"""
+    paths = list(SOURCE_FILES)
+    for directory in SOURCE_DIRS:
+        paths.extend(sorted(os.path.join(directory, file) for file in os.listdir(os.path.join(data_path, directory))))
+    return paths
+
+
+def _source_stats(data_path: str) -> List[List]:
+    stats = []
+    for path in _source_paths(data_path):
+        stat = os.stat(os.path.join(data_path, path))
+        stats.append([path, stat.st_size, stat.st_mtime_ns])
+    return stats
+
+
+def source_hash(data_path: Optional[str] = None) -> str:
+    """the SHA-256 of the names and contents of the source files of the ObjectDB"""
+    data_path = data_path or get_data_path()
+    sha = hashlib.sha256()
+    for path in _source_paths(data_path):
+        with open(os.path.join(data_path, path), "rb") as f:
+            content = f.read()
+        sha.update(f"{path}\0{len(content)}\0".encode("utf-8"))
+        sha.update(content)
+    return sha.hexdigest()
+
+
+def _library_versions() -> Dict[str, str]:
+    # Pickled DataFrames can only be read back reliably by the same versions of the libraries
+    return {"python": "%d.%d" % sys.version_info[:2], "numpy": np.__version__, "pandas": pd.__version__}
+
+
+def build_object_db_snapshot(path: Optional[str] = None) -> str:
+    """Read the ObjectDB from the data files and write its snapshot (by default next to the data files). Returns the path."""
+    path = path or default_snapshot_path()
+    data_path = get_data_path()
+    stats = _source_stats(data_path)
+    digest = source_hash(data_path)
+    fields = load_object_db_fields()
+
+    buffers = []
+
+    def out_of_band(buffer: pickle.PickleBuffer):
+        try:
+            buffers.append(buffer.raw())
+        except BufferError:  # not contiguous, keep it in the pickle
+            return True
+
+    body = pickle.dumps(fields, protocol=5, buffer_callback=out_of_band)
+
+    # The offsets depend on the length of the metadata, which depends on the offsets: lay out the sections after a
+    # generous upper bound of the metadata length
+    sections = [len(body)] + [buffer.nbytes for buffer in buffers]
+    meta = {"version": VERSION, "source_hash": digest, "sources": stats, "libraries": _library_versions(), "pickle": None, "buffers": []}
+    offset = _HEADER.size + len(json.dumps(meta)) + 32 * len(sections) + 256
+    layout = []
+    for length in sections:
+        offset += -offset % _ALIGNMENT
+        layout.append([offset, length])
+        offset += length
+    meta["pickle"], meta["buffers"] = layout[0], layout[1:]
+    meta_bytes = json.dumps(meta).encode("utf-8")
+    if _HEADER.size + len(meta_bytes) > layout[0][0]:
+        raise Exception("Snapshot metadata longer than expected")
+
+    with open(f"{path}.tmp", "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(meta_bytes)))
+        f.write(meta_bytes)
+        for (offset, _), data in zip(layout, [body] + buffers):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(data)
+    os.replace(f"{path}.tmp", path)
+    return path
+
+
+def _read_meta(view: memoryview) -> Optional[Dict]:
+    if len(view) < _HEADER.size:
+        return None
+    magic, version, meta_length = _HEADER.unpack_from(view)
+    if magic != MAGIC or version != VERSION:
+        return None
+    return json.loads(bytes(view[_HEADER.size:_HEADER.size + meta_length]))
+
+
+def is_snapshot_fresh(meta: Dict, data_path: Optional[str] = None) -> bool:
+    """whether a snapshot with this metadata was built from the current data files and can be read by these libraries"""
+    data_path = data_path or get_data_path()
+    if meta["libraries"] != _library_versions():
+        return False
+    try:
+        if _source_stats(data_path) == meta["sources"]:
+            return True
+        # The files were touched or replaced, compare their contents
+        return source_hash(data_path) == meta["source_hash"]
+    except FileNotFoundError:
+        return False
+
+
+def load_object_db_snapshot(path: Optional[str] = None, check: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    The ObjectDB fields of the snapshot, or None if there is no snapshot or it is out of date.
+
+    Args:
+        path: The snapshot file, by default the one next to the data files.
+        check: Whether to check that the snapshot is up to date with the data files.
+    """
+    path = path or default_snapshot_path()
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(data)
+    meta = _read_meta(view)
+    if meta is None or (check and not is_snapshot_fresh(meta)):
+        log(f"{path} is out of date, reading the object database from the data files. Run 'legent build-odb' to rebuild it.")
+        view.release()
+        data.close()
+        return None
+    offset, length = meta["pickle"]
+    # NOTE: the arrays keep views of the mmap, which stays open as long as they exist
+    return pickle.loads(view[offset:offset + length], buffers=[view[offset:offset + length] for offset, length in meta["buffers"]])
@@ -0,0 +1,20 @@
+import random
+from typing import Optional, Tuple
+
+import numpy as np
+
+MAX_SEED = 2**63 - 1
+
+
+def make_rngs(seed: Optional[int] = None) -> Tuple[np.random.Generator, random.Random]:
+    """The random streams of one scene: a numpy Generator and a random.Random derived from it.
+
+    Every sampling step of the scene generation draws from these two instead of the global np.random and random,
+    so a scene only depends on its seed, whatever was generated before it in the process or in other workers.
+    If seed is None, it is drawn from np.random, so that np.random.seed() still makes the scenes reproducible.
+    """
+    if seed is None:
+        seed = int(np.random.randint(0, MAX_SEED, dtype=np.int64))
+    rng = np.random.default_rng(seed)
+    py_rng = random.Random(int(rng.integers(0, MAX_SEED)))
+    return rng, py_rng
@@ -18,6 +18,7 @@ from typing import (
 
 import numpy as np
 import pandas as pd
+import shapely
 from shapely.geometry import LineString, MultiPolygon, Point, Polygon
 
 from legent.scene_generation.constants import (
@@ -85,11 +86,11 @@ class OrthogonalPolygon:
         self.x_edges_map = self._set_x_edges_map(points)
         self.z_edges_map = self._set_z_edges_map(points)
 
-        # NOTE: get_neighboring_rectangles() sets the area
-        self.get_neighboring_rectangles()
+        # NOTE: the polygon only changes in subtract(), so the cells are computed once per change
+        self.neighboring_rectangles = self._compute_neighboring_rectangles()
 
     def is_point_inside(self, point: Tuple[float, float]) -> bool:
-        return self.polygon.contains(Point(*point))
+        return bool(shapely.contains_xy(self.polygon, *point))
 
     def _set_x_edges_map(self, points: Set[Tuple[float, float]]):
         out = defaultdict(list)
@@ -107,18 +108,21 @@ class OrthogonalPolygon:
                 out[p0[1]].append(sorted([p0[0], p1[0]]))
         return out
 
-    def get_neighboring_rectangles(self) -> Set[Tuple[float, float, float, float]]:
-        out = []
-        area = 0
-        for x0, x1 in zip(self.unique_xs, self.unique_xs[1:]):
-            for z0, z1 in zip(self.unique_zs, self.unique_zs[1:]):
-                mid_x = (x0 + x1) / 2
-                mid_z = (z0 + z1) / 2
-                if self.is_point_inside((mid_x, mid_z)):
-                    out.append((x0, z0, x1, z1))
-                    area += (x1 - x0) * (z1 - z0)
+    def _compute_neighboring_rectangles(self) -> Set[Tuple[float, float, float, float]]:
+        """The cells of the grid over unique_xs and unique_zs that are inside the polygon."""
+        xs = np.array(self.unique_xs)
+        zs = np.array(self.unique_zs)
+        mid_xs, mid_zs = np.meshgrid((xs[:-1] + xs[1:]) / 2, (zs[:-1] + zs[1:]) / 2, indexing="ij")
+        shapely.prepare(self.polygon)
+        inside = shapely.contains_xy(self.polygon, mid_xs, mid_zs)
+        # NOTE: same insertion order (x, then z) as the former cell by cell loop, so that the set iterates the same way
+        return set(
+            (self.unique_xs[i], self.unique_zs[j], self.unique_xs[i + 1], self.unique_zs[j + 1])
+            for i, j in zip(*np.nonzero(inside))
+        )
 
-        return set(out)
+    def get_neighboring_rectangles(self) -> Set[Tuple[float, float, float, float]]:
+        return self.neighboring_rectangles
 
     def _join_neighboring_rectangles(
         self, rects: Set[Tuple[float, float, float, float]]
@@ -169,46 +173,52 @@ class OrthogonalPolygon:
             cnt += 1
         # return set(out)
 
+    @staticmethod
+    def _rectangle_edges(rect: Tuple[float, float, float, float]) -> List[Tuple]:
+        x0, z0, x1, z1 = rect
+        return [("x", x0, z0, z1), ("x", x1, z0, z1), ("z", z0, x0, x1), ("z", z1, x0, x1)]
+
     def random_cover_rectangles(
-        self, rects: Set[Tuple[float, float, float, float]]
+        self, rects: Set[Tuple[float, float, float, float]], py_rng: Optional[random.Random] = None
     ) -> Set[Tuple[float, float, float, float]]:
+        py_rng = py_rng or random
         orig_rects = rects.copy()
         curr_rects = rects.copy()
+        # NOTE: the rects are disjoint, so two of them share 2 corners iff they share an edge.
+        # Index them by edge to find the neighbors of curr_rect without comparing it with every rect.
+        rects_by_edge = defaultdict(list)
+        for rect in rects:
+            for edge in self._rectangle_edges(rect):
+                rects_by_edge[edge].append(rect)
         out = []
-        curr_rect = random.choice(list(orig_rects))
+        curr_rect = py_rng.choice(list(orig_rects))
         curr_rects = curr_rects - {curr_rect}
         while True:
             x0_0, z0_0, x1_0, z1_0 = curr_rect
-            points1 = {(x0_0, z0_0), (x0_0, z1_0), (x1_0, z1_0), (x1_0, z0_0)}
-            grow_flag = False
-            for rect in curr_rects:
+            neighbors = {rect for edge in self._rectangle_edges(curr_rect) for rect in rects_by_edge.get(edge, ()) if rect in curr_rects}
+            if neighbors:
+                # NOTE: grow with the first neighbor in the iteration order of curr_rects, like the former pairwise loop
+                rect = neighbors.pop() if len(neighbors) == 1 else next(rect for rect in curr_rects if rect in neighbors)
                 x0_1, z0_1, x1_1, z1_1 = rect
-                points2 = {(x0_1, z0_1), (x0_1, z1_1), (x1_1, z1_1), (x1_1, z0_1)}
-                if len(points1 & points2) == 2:
-                    curr_rects = curr_rects - {rect}
-                    curr_rect = (
-                        min(x0_0, x1_0, x0_1, x1_1),
-                        min(z0_0, z1_0, z0_1, z1_1),
-                        max(x0_0, x1_0, x0_1, x1_1),
-                        max(z0_0, z1_0, z0_1, z1_1),
-                    )
-                    grow_flag = True
-                    break
-            if grow_flag:
-                continue
+                curr_rects = curr_rects - {rect}
+                curr_rect = (
+                    min(x0_0, x1_0, x0_1, x1_1),
+                    min(z0_0, z1_0, z0_1, z1_1),
+                    max(x0_0, x1_0, x0_1, x1_1),
+                    max(z0_0, z1_0, z0_1, z1_1),
+                )
             else:
                 out.append(curr_rect)
                 if not curr_rects:
                     break
-                curr_rect = random.choice(list(curr_rects))
+                curr_rect = py_rng.choice(list(curr_rects))
                 curr_rects = curr_rects - {curr_rect}
         return set(out) | orig_rects
 
-    def get_all_rectangles(self) -> Set[Tuple[float, float, float, float]]:
-        start_time = time.time()
+    def get_all_rectangles(self, py_rng: Optional[random.Random] = None) -> Set[Tuple[float, float, float, float]]:
         neighboring_rectangles = self.get_neighboring_rectangles().copy()
         curr_rects = neighboring_rectangles
-        all_rects = self.random_cover_rectangles(curr_rects)
+        all_rects = self.random_cover_rectangles(curr_rects, py_rng)
         return all_rects
 
     @staticmethod
@@ -381,6 +391,7 @@ class Room:
         room_type: Literal["Kitchen", "LivingRoom", "Bedroom", "Bathroom"],
         room_id: int,
         odb: ObjectDB,
+        py_rng: Optional[random.Random] = None,
     ) -> None:
         self.room_polygon = OrthogonalPolygon(polygon=copy.deepcopy(polygon))
         self.open_polygon = OrthogonalPolygon(polygon=copy.deepcopy(polygon))
@@ -390,29 +401,38 @@ class Room:
         self.split = "train"
         self.assets: List[Union[Asset, AssetGroup]] = []
         self.last_rectangles: Optional[Set[Tuple[float, float, float, float]]] = None
+        # NOTE: the random stream of the scene (see make_rngs), or the random module
+        self.py_rng = py_rng or random
 
     @staticmethod
     def sample_rotation(
-        asset: Dict[str, Any], rect_x_length: float, rect_z_length: float
+        asset: Dict[str, Any],
+        rect_x_length: float,
+        rect_z_length: float,
+        py_rng: Optional[random.Random] = None,
     ) -> bool:
         valid_rotated = []
         if asset["xSize"] < rect_x_length and asset["zSize"] < rect_z_length:
             valid_rotated.append(False)
         if asset["xSize"] < rect_z_length and asset["zSize"] < rect_x_length:
             valid_rotated.append(True)
-        return random.choice(valid_rotated)
+        return (py_rng or random).choice(valid_rotated)
 
     def sample_next_rectangle(
         self, choose_largest_rectangle: bool = False, cache_rectangles: bool = False
     ):
         start_time = time.time()
-        rectangles = self.open_polygon.get_all_rectangles()
-        self.last_rectangles = rectangles
+        if cache_rectangles and self.last_rectangles is not None:
+            # NOTE: nothing was placed since the last call, so the rectangles (minus the removed ones) are still valid
+            rectangles = self.last_rectangles
+        else:
+            rectangles = self.open_polygon.get_all_rectangles(self.py_rng)
+            self.last_rectangles = rectangles
         end_time = time.time()
         if len(rectangles) == 0:
             return None
 
-        if choose_largest_rectangle or random.random() < P_LARGEST_RECTANGLE:
+        if choose_largest_rectangle or self.py_rng.random() < P_LARGEST_RECTANGLE:
             # NOTE: p(epsilon) = choose largest area
             max_area = 0
             out: Optional[Tuple[float, float, float, float]] = None
@@ -442,7 +462,7 @@ class Room:
         if not weights:
             return None
         end_time = time.time()
-        return random.choices(population=population, weights=weights, k=1)[0]
+        return self.py_rng.choices(population=population, weights=weights, k=1)[0]
 
     def sample_anchor_location(
         self,
@@ -486,7 +506,7 @@ class Room:
 
         # Place the object in a corner of the room
         rect_corners = [(x0, z0, 2), (x0, z1, 8), (x1, z1, 6), (x1, z0, 0)]
-        random.shuffle(rect_corners)
+        self.py_rng.shuffle(rect_corners)
         epsilon = 1e-3
         corners = []
         for x, z, anchor_delta in rect_corners:
@@ -505,7 +525,7 @@ class Room:
             ):
                 corners.append((x, z, anchor_delta, "inCorner"))
         if corners:
-            return random.choice(corners)
+            return self.py_rng.choice(corners)
 
         # Place the object on an edge of the room
         edges = []
@@ -515,22 +535,22 @@ class Room:
             (LineString([(x1, z0), (x1, z1)]), 3),
             (LineString([(x0, z1), (x1, z1)]), 7),
         ]
-        random.shuffle(rect_edge_lines)
+        self.py_rng.shuffle(rect_edge_lines)
         room_outer_lines = LineString(self.room_polygon.polygon.exterior.coords)
         for rect_edge_line, anchor_delta in rect_edge_lines:
             if room_outer_lines.contains(rect_edge_line):
                 xs = [p[0] for p in rect_edge_line.coords]
                 zs = [p[1] for p in rect_edge_line.coords]
                 edges.append((xs, zs, anchor_delta, "onEdge"))
-        if edges and random.random() < P_CHOOSE_EDGE:
-            return random.choice(edges)
+        if edges and self.py_rng.random() < P_CHOOSE_EDGE:
+            return self.py_rng.choice(edges)
 
         # Place an object in the middle of the room
         return (None, None, 4, "inMiddle")
 
     def place_asset_group(
         self,
-        asset_group: pd.DataFrame,
+        asset_group: Dict[str, Any],  # a row of AssetGroupTable, see AssetGroupTable.row()
         set_rotated: Optional[bool],
         rect_x_length: float,
         rect_z_length: float,
@@ -539,39 +559,37 @@ class Room:
 
         Returns None if the asset group collides on each attempt (very unlikely).
         """
-        asset_group_generator: AssetGroupGenerator = asset_group[
-            "assetGroupGenerator"
-        ].iloc[0]
+        asset_group_generator: AssetGroupGenerator = asset_group["assetGroupGenerator"]
 
         for _ in range(MAX_INTERSECTING_OBJECT_RETRIES):
-            object_placement = asset_group_generator.sample_object_placement()
+            object_placement = asset_group_generator.sample_object_placement(py_rng=self.py_rng)
 
             return ChosenAssetGroup(
-                assetGroupName=asset_group["assetGroupName"].iloc[0],
+                assetGroupName=asset_group["assetGroupName"],
                 xSize=object_placement["bounds"]["x"]["length"],
                 ySize=object_placement["bounds"]["y"]["length"],
                 zSize=object_placement["bounds"]["z"]["length"],
                 rotated=set_rotated,
                 objects=object_placement["objects"],
                 bounds=object_placement["bounds"],
-                allowDuplicates=asset_group["allowDuplicates"].iloc[0],
+                allowDuplicates=asset_group["allowDuplicates"],
             )
 
     def place_asset(
         self,
-        asset: pd.DataFrame,
+        asset: Dict[str, Any],  # a row of FloorAssetIndex, see FloorAssetIndex.record()
         set_rotated: Optional[bool],
         rect_x_length: float,
         rect_z_length: float,
     ) -> ChosenAsset:
-        # NOTE: convert the pd dataframe to a dict
-        asset.reset_index(drop=False, inplace=True)
-        asset = asset.to_dict(orient="records")[0]
 
         # NOTE: Choose the rotation if both were valid.
         if set_rotated is None:
             set_rotated = Room.sample_rotation(
-                asset=asset, rect_x_length=rect_x_length, rect_z_length=rect_z_length
+                asset=asset,
+                rect_x_length=rect_x_length,
+                rect_z_length=rect_z_length,
+                py_rng=self.py_rng,
             )
         asset["rotated"] = set_rotated
 
@@ -609,7 +627,7 @@ class Room:
                 x0, x1 = xs
                 x_length = x1 - x0
                 full_rand_dist = x_length - bb["x"]
-                rand_dist = random.random() * full_rand_dist
+                rand_dist = self.py_rng.random() * full_rand_dist
                 x = x0 + rand_dist + bb["x"] / 2
                 z = sum(zs) / 2
                 rotation = 180 if anchor_delta == 7 else 0
@@ -618,7 +636,7 @@ class Room:
                 z0, z1 = zs
                 z_length = z1 - z0
                 full_rand_dist = z_length - bb["z"]
-                rand_dist = random.random() * full_rand_dist
+                rand_dist = self.py_rng.random() * full_rand_dist
                 x = sum(xs) / 2
                 z = z0 + rand_dist + bb["z"] / 2
                 rotation = 90 if anchor_delta == 5 else 270
@@ -629,11 +647,11 @@ class Room:
             z_length = z1 - z0
             full_x_rand_dist = x_length - bb["x"]
             full_z_rand_dist = z_length - bb["z"]
-            rand_x_dist = random.random() * full_x_rand_dist
-            rand_z_dist = random.random() * full_z_rand_dist
+            rand_x_dist = self.py_rng.random() * full_x_rand_dist
+            rand_z_dist = self.py_rng.random() * full_z_rand_dist
             x = x0 + rand_x_dist + bb["x"] / 2
             z = z0 + rand_z_dist + bb["z"] / 2
-            rotation = random.choice([90, 270] if asset["rotated"] else [0, 180])
+            rotation = self.py_rng.choice([90, 270] if asset["rotated"] else [0, 180])
 
         top_down_poly = OrthogonalPolygon.get_top_down_poly(
             anchor_location=(x, z),
@@ -722,3 +740,4 @@ class Room:
         """
         self.assets.append(asset)
         self.open_polygon.subtract(Polygon(asset.top_down_poly_with_margin))
+        self.last_rectangles = None
@@ -165,9 +165,9 @@ class RoomSpecSampler:
     def __getitem__(self, room_spec_id: str) -> RoomSpec:
         return self.room_spec_map[room_spec_id]
 
-    def sample(self, k: int = 1) -> Union[RoomSpec, List[RoomSpec]]:
-        """Return a RoomSpec with weighted sampling."""
-        sample = random.choices(self.room_specs, weights=self.weights, k=k)
+    def sample(self, k: int = 1, py_rng: Optional[random.Random] = None) -> Union[RoomSpec, List[RoomSpec]]:
+        """Return a RoomSpec with weighted sampling, drawn from py_rng (random if None)."""
+        sample = (py_rng or random).choices(self.room_specs, weights=self.weights, k=k)
         return sample[0] if k == 1 else sample
 
 
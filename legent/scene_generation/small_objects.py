@@ -2,13 +2,13 @@ import copy
 import json
 import random
 from collections import defaultdict
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 
 from legent.scene_generation.objects import ObjectDB
 from legent.scene_generation.room import Room
-from legent.server.rect_placer import RectPlacer
+from legent.server.rect_placer import GridRectPlacer, centered_bboxes
 
 # from legent.utils.io import log
 
@@ -23,16 +23,63 @@ def log(*args, **kwargs):
     pass
 
 
-def prefab_fit_surface(prefab_size, surface, receptacle):
-    px, py, pz = prefab_size.values()
-    sx = surface["surface"]["x_max"] - surface["surface"]["x_min"]
-    sz = surface["surface"]["z_max"] - surface["surface"]["z_min"]
-    if receptacle["receptacle"]["rotation"][1] != 0 and receptacle["receptacle"]["rotation"][1] != 180:
-        sx, sz = sz, sx
-    total_num = receptacle["small_object_num"]
-    if px < (sx * 0.9) and pz < (sz * 0.9) and total_num < MAX_OBJECT_NUM_ON_RECEPTACLE:
-        return True
-    return False
+class SurfaceIndex:
+    def __init__(self, receptacle: Dict, surfaces: List[Dict]) -> None:
+        """
+        The placeable surfaces of a receptacle instance as arrays in scene coordinates, computed once per receptacle.
+
+        Args:
+            receptacle (Dict): the receptacle instance, with its position and rotation
+            surfaces (List[Dict]): the placeable_surfaces of its prefab
+        """
+        self.receptacle = receptacle
+        self.surfaces = surfaces
+        self.small_object_num = 0
+        self.small_object_nums = np.zeros(len(surfaces), dtype=int)
+        local = np.array([[surface["x_min"], surface["z_min"], surface["x_max"], surface["z_max"]] for surface in surfaces], dtype=float).reshape(-1, 4)
+        if receptacle["rotation"][1] != 0 and receptacle["rotation"][1] != 180:
+            local = local[:, [1, 0, 3, 2]]
+        x, y, z = receptacle["position"]
+        # (x_min, z_min, x_max, z_max) of each surface
+        self.bounds = local + [x, z, x, z]
+        # NOTE: not abs(), a surface with min > max fits nothing, as before
+        self.sizes = local[:, 2:] - local[:, :2]
+        self.ys = y + np.array([surface["y"] for surface in surfaces], dtype=float)
+
+    def fits(self, prefab_sizes) -> np.ndarray:
+        """whether each of the (m, 2) prefab (x, z) sizes fits on each surface, as an (m, n) mask"""
+        prefab_sizes = np.asarray(prefab_sizes, dtype=float).reshape(-1, 2)
+        return (prefab_sizes[:, None, :] < self.sizes[None, :, :] * 0.9).all(axis=2)
+
+    def place(self, placer: GridRectPlacer, name: str, prefab_size: Dict[str, float], rng, order: Optional[List[int]] = None) -> Optional[Tuple[int, Tuple[float, float, float]]]:
+        """
+        Place a small object on the first surface (in order) that it fits on and that has free space for it.
+
+        Returns:
+            (surface index, position) of the object, or None if it could not be placed
+        """
+        if self.small_object_num >= MAX_OBJECT_NUM_ON_RECEPTACLE:
+            return None
+        px, py, pz = prefab_size["x"], prefab_size["y"], prefab_size["z"]
+        fit = self.fits((px, pz))[0]
+        surfaces = [i for i in (range(len(self.surfaces)) if order is None else order) if fit[i]]
+        if not surfaces:
+            return None
+        margin = np.array([px / 2 + SMALL_OBJECT_MIN_MARGIN, pz / 2 + SMALL_OBJECT_MIN_MARGIN])
+        low, high = self.bounds[surfaces, :2] + margin, self.bounds[surfaces, 2:] - margin
+        # NOTE: the candidate positions of all the surfaces are drawn at once and tested in order by one placer query,
+        # so the object goes to the first surface with a free candidate, as when trying the surfaces one by one
+        candidates = rng.uniform(low[:, None, :], high[:, None, :], size=(len(surfaces), MAX_PLACE_ON_SURFACE_RETRIES, 2)).reshape(-1, 2)
+        j = placer.place_first_free(
+            name,
+            centered_bboxes(candidates[:, 0], candidates[:, 1], px + 2 * SMALL_OBJECT_MIN_MARGIN, pz + 2 * SMALL_OBJECT_MIN_MARGIN),
+        )
+        if j is None:
+            return None
+        i = surfaces[j // MAX_PLACE_ON_SURFACE_RETRIES]
+        self.small_object_nums[i] += 1
+        self.small_object_num += 1
+        return i, (float(candidates[j, 0]), float(self.ys[i] + py / 2), float(candidates[j, 1]))
 
 
 def add_small_objects(
@@ -44,10 +91,15 @@ def add_small_objects(
     object_counts: Dict[str, int] = {},
     specified_object_instances: Dict[str, int] = {},
     receptacle_object_counts: Dict[str, int] = {},
+    rng: Optional[np.random.Generator] = None,
+    py_rng: Optional[random.Random] = None,
 ):
+    # NOTE: the random streams of the scene (see make_rngs), or the global ones
+    rng = rng if rng is not None else np.random
+    py_rng = py_rng or random
 
     small_objects = []
-    placer = RectPlacer(placer_bbox)
+    placer = GridRectPlacer(placer_bbox)
 
     objects_per_room = defaultdict(list)
     for obj in objects:
@@ -78,88 +130,38 @@ def add_small_objects(
                 receptacle = to_place_recptacles[i]
                 objects = v["objects"][i]
 
-                receptacle = {"receptacle": receptacle, "small_object_num": 0}
+                # NOTE: the surfaces are of the prefab, shared by all the scenes, so they are shuffled through their order
+                surface_index = SurfaceIndex(receptacle, odb.PREFABS[receptacle["prefab"]]["placeable_surfaces"])
+                order = list(range(len(surface_index.surfaces)))
 
                 failed_object_dict = {}
 
-                surfaces = odb.PREFABS[receptacle["receptacle"]["prefab"]]["placeable_surfaces"]
                 for kk, vv in objects.items():
                     kk = kk.lower()
 
                     failed_object_dict[kk] = 0
 
-                    log(f'placing kk: {kk} {vv} times on receptacle {receptacle["receptacle"]["prefab"]}')
+                    log(f'placing kk: {kk} {vv} times on receptacle {receptacle["prefab"]}')
                     for _ in range(vv):
-                        prefab_name = random.choice(odb.OBJECT_DICT[kk])
-                        prefab = odb.PREFABS[prefab_name]
-                        prefab_size = prefab["size"]
-                        random.shuffle(surfaces)
-                        success_flag = False
-                        for surface in surfaces:
-                            surface = {"surface": surface, "small_object_num": 0}
-                            if prefab_fit_surface(prefab_size, surface, receptacle):
-                                small_object = {}
-                                small_object["prefab"] = prefab_name
-
-                                x_min = (
-                                    (surface["surface"]["x_min"] + receptacle["receptacle"]["position"][0])
-                                    if receptacle["receptacle"]["rotation"][1] == 0 or receptacle["receptacle"]["rotation"][1] == 180
-                                    else (surface["surface"]["z_min"] + receptacle["receptacle"]["position"][0])
-                                )
-                                x_max = (
-                                    (surface["surface"]["x_max"] + receptacle["receptacle"]["position"][0])
-                                    if receptacle["receptacle"]["rotation"][1] == 0 or receptacle["receptacle"]["rotation"][1] == 180
-                                    else (surface["surface"]["z_max"] + receptacle["receptacle"]["position"][0])
-                                )
-                                z_min = (
-                                    (surface["surface"]["z_min"] + receptacle["receptacle"]["position"][2])
-                                    if receptacle["receptacle"]["rotation"][1] == 0 or receptacle["receptacle"]["rotation"][1] == 180
-                                    else (surface["surface"]["x_min"] + receptacle["receptacle"]["position"][2])
-                                )
-                                z_max = (
-                                    (surface["surface"]["z_max"] + receptacle["receptacle"]["position"][2])
-                                    if receptacle["receptacle"]["rotation"][1] == 0 or receptacle["receptacle"]["rotation"][1] == 180
-                                    else (surface["surface"]["x_max"] + receptacle["receptacle"]["position"][2])
-                                )
-
-                                x_margin = prefab_size["x"] / 2 + SMALL_OBJECT_MIN_MARGIN
-
-                                z_margin = prefab_size["z"] / 2 + SMALL_OBJECT_MIN_MARGIN
-
-                                sample_x_min = x_min + x_margin
-                                sample_x_max = x_max - x_margin
-                                sample_z_min = z_min + z_margin
-                                sample_z_max = z_max - z_margin
-
-                                for _ in range(MAX_PLACE_ON_SURFACE_RETRIES):
-                                    x, z = np.random.uniform(sample_x_min, sample_x_max), np.random.uniform(sample_z_min, sample_z_max)
-
-                                    if placer.place(
-                                        k,
-                                        x,
-                                        z,
-                                        prefab["size"]["x"] + 2 * SMALL_OBJECT_MIN_MARGIN,
-                                        prefab["size"]["z"] + 2 * SMALL_OBJECT_MIN_MARGIN,
-                                    ):
-                                        y = receptacle["receptacle"]["position"][1] + surface["surface"]["y"] + prefab_size["y"] / 2
-
-                                        small_object["position"] = (x, y, z)
-                                        small_object["type"] = "interactable"
-                                        small_object["parent"] = receptacle["receptacle"]["prefab"]
-                                        small_object["scale"] = [1, 1, 1]
-                                        small_object["rotation"] = [0, 0, 0]
-                                        small_objects.append(small_object)
-                                        surface["small_object_num"] += 1
-                                        receptacle["small_object_num"] += 1
-                                        success_flag = True
-                                        break
-                                if success_flag:
-                                    log(
-                                        f"Small Object {kk} on {receptacle['receptacle']['prefab']}, position:{format(small_object['position'][0],'.4f')},{format(small_object['position'][2],'.4f')}",
-                                    )
-                                    break
-                        if not success_flag:
+                        prefab_name = py_rng.choice(odb.OBJECT_DICT[kk])
+                        prefab_size = odb.PREFABS[prefab_name]["size"]
+                        py_rng.shuffle(order)
+                        placed = surface_index.place(placer, k, prefab_size, rng, order)
+                        if placed is None:
                             failed_object_dict[kk] += 1
+                            continue
+                        _, position = placed
+                        small_objects.append(
+                            {
+                                "prefab": prefab_name,
+                                "position": position,
+                                "type": "interactable",
+                                "parent": receptacle["prefab"],
+                                "scale": [1, 1, 1],
+                                "rotation": [0, 0, 0],
+                            }
+                        )
+                        log(f"Small Object {kk} on {receptacle['prefab']}, position:{format(position[0],'.4f')},{format(position[2],'.4f')}")
                 failed_objects[k].append(failed_object_dict)
 
     with open("failed_objects.json", "w") as f:
@@ -169,6 +171,8 @@ def add_small_objects(
 
     receptacle_index = 0
     receptacle_dict = {}
+    # NOTE: plain dicts of the annotations, a .loc lookup per candidate costs more than the placement itself
+    multiple_per_room = odb.PLACEMENT_ANNOTATIONS["multiplePerRoom"].to_dict()
 
     for room_id, room in rooms.items():
         if room_id not in receptacles_per_room:
@@ -176,6 +180,7 @@ def add_small_objects(
         receptacles_in_room = receptacles_per_room[room_id]
         room_type = room.room_type
         spawnable_objects = []
+        room_weights = odb.PLACEMENT_ANNOTATIONS[f"in{room_type}s"].to_dict()
         for receptacle in receptacles_in_room:
 
             receptacle_index += 1
@@ -184,26 +189,14 @@ def add_small_objects(
             if not placeable_surfaces:
                 continue
 
-            receptacle_dict[receptacle_index] = {
-                "receptacle": receptacle,
-                "surfaces": [],
-                "small_object_num": 0,
-            }
-            for surface in placeable_surfaces:
-
-                receptacle_dict[receptacle_index]["surfaces"].append(
-                    {
-                        "surface": surface,
-                        "small_object_num": 0,
-                    }
-                )
+            receptacle_dict[receptacle_index] = SurfaceIndex(receptacle, placeable_surfaces)
 
             for object_type, p in objects_in_receptacle.items():
                 if object_type in specified_small_object_types:
                     continue
                 if p < 1:
                     continue
-                room_weight = odb.PLACEMENT_ANNOTATIONS.loc[object_type][f"in{room_type}s"]
+                room_weight = room_weights[object_type]
                 if room_weight == 0:
                     continue
                 spawnable_objects.append(
@@ -218,84 +211,30 @@ def add_small_objects(
                 )
 
         spawnable_groups = spawnable_objects
-        random.shuffle(spawnable_groups)
+        py_rng.shuffle(spawnable_groups)
         objects_types_placed_in_room = set()
 
         for group in spawnable_groups:
             if len(objects_types_placed_in_room) >= max_object_types_per_room:
                 break
             # NOTE: Check if there can be multiple of the same type in the room.
-            if group["childObjectType"] in object_types_in_rooms[room_id] and not odb.PLACEMENT_ANNOTATIONS.loc[group["childObjectType"]]["multiplePerRoom"]:
+            if group["childObjectType"] in object_types_in_rooms[room_id] and not multiple_per_room[group["childObjectType"]]:
                 break
 
             asset_candidates = odb.OBJECT_DICT[group["childObjectType"]]
 
-            chosen_asset_id = random.choice(asset_candidates)
+            chosen_asset_id = py_rng.choice(asset_candidates)
 
             prefab = odb.PREFABS[chosen_asset_id]
 
-            receptacle = receptacle_dict[group["receptacleIndex"]]
-            surfaces = receptacle["surfaces"]
-
-            success_flag = False
-            for surface in surfaces:
-                if prefab_fit_surface(prefab["size"], surface, receptacle):
-                    small_object = copy.deepcopy(group["receptacle"])
-                    small_object["prefab"] = chosen_asset_id
-
-                    x_min = (
-                        (surface["surface"]["x_min"] + receptacle["receptacle"]["position"][0])
-                        if receptacle["receptacle"]["rotation"][1] == 0 or receptacle["receptacle"]["rotation"][1] == 180
-                        else (surface["surface"]["z_min"] + receptacle["receptacle"]["position"][0])
-                    )
-                    x_max = (
-                        (surface["surface"]["x_max"] + receptacle["receptacle"]["position"][0])
-                        if receptacle["receptacle"]["rotation"][1] == 0 or receptacle["receptacle"]["rotation"][1] == 180
-                        else (surface["surface"]["z_max"] + receptacle["receptacle"]["position"][0])
-                    )
-                    z_min = (
-                        (surface["surface"]["z_min"] + receptacle["receptacle"]["position"][2])
-                        if receptacle["receptacle"]["rotation"][1] == 0 or receptacle["receptacle"]["rotation"][1] == 180
-                        else (surface["surface"]["x_min"] + receptacle["receptacle"]["position"][2])
-                    )
-                    z_max = (
-                        (surface["surface"]["z_max"] + receptacle["receptacle"]["position"][2])
-                        if receptacle["receptacle"]["rotation"][1] == 0 or receptacle["receptacle"]["rotation"][1] == 180
-                        else (surface["surface"]["x_max"] + receptacle["receptacle"]["position"][2])
-                    )
-
-                    x_margin = prefab["size"]["x"] / 2 + SMALL_OBJECT_MIN_MARGIN
-
-                    z_margin = prefab["size"]["z"] / 2 + SMALL_OBJECT_MIN_MARGIN
-
-                    sample_x_min = x_min + x_margin
-                    sample_x_max = x_max - x_margin
-                    sample_z_min = z_min + z_margin
-                    sample_z_max = z_max - z_margin
-
-                    for _ in range(MAX_PLACE_ON_SURFACE_RETRIES):
-                        x, z = np.random.uniform(sample_x_min, sample_x_max), np.random.uniform(sample_z_min, sample_z_max)
-
-                        if placer.place(
-                            chosen_asset_id,
-                            x,
-                            z,
-                            prefab["size"]["x"] + 2 * SMALL_OBJECT_MIN_MARGIN,
-                            prefab["size"]["z"] + 2 * SMALL_OBJECT_MIN_MARGIN,
-                        ):
-                            y = receptacle["receptacle"]["position"][1] + surface["surface"]["y"] + odb.PREFABS[chosen_asset_id]["size"]["y"] / 2
-
-                            small_object["position"] = (x, y, z)
-                            small_object["type"] = "interactable"
-                            small_objects.append(small_object)
-                            surface["small_object_num"] += 1
-                            receptacle["small_object_num"] += 1
-                            success_flag = True
-                            break
-                    if success_flag:
-                        log(
-                            f"Small Object {chosen_asset_id} on {receptacle['receptacle']['prefab']}, position:{format(small_object['position'][0],'.4f')},{format(small_object['position'][2],'.4f')}",
-                        )
-                        break
+            placed = receptacle_dict[group["receptacleIndex"]].place(placer, chosen_asset_id, prefab["size"], rng)
+            if placed is not None:
+                _, position = placed
+                small_object = copy.deepcopy(group["receptacle"])
+                small_object["prefab"] = chosen_asset_id
+                small_object["position"] = position
+                small_object["type"] = "interactable"
+                small_objects.append(small_object)
+                log(f"Small Object {chosen_asset_id} on {group['receptacle']['prefab']}, position:{format(position[0],'.4f')},{format(position[2],'.4f')}")
 
     return small_objects
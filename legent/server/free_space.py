@@ -0,0 +1,109 @@
+from typing import Iterable, Optional, Tuple
+import math
+import numpy as np
+
+
+class NoFreeSpaceError(Exception):
+    """There is no free position for a rectangle of the requested size."""
+
+
+class FreeSpaceSampler:
+    def __init__(self, bbox: Tuple[float, float, float, float], resolution: float = 0.05, free: bool = False) -> None:
+        """
+        Sample positions of rectangles directly from the free space, instead of drawing random positions until one fits.
+
+        The space is rasterized into square cells of side resolution, each free or occupied. occupy() marks all the cells
+        touched by a rectangle as occupied, and free() marks the cells inside a rectangle as free, so the free cells are
+        always inside the free space. sample() erodes the free cells by the size of the rectangle, with a summed-area table
+        of the occupied cells, and draws a position uniformly from what is left. It always terminates, and raises
+        NoFreeSpaceError when no position is free.
+
+        Args:
+            bbox (Tuple[float, float, float, float]): (xmin, ymin, xmax, ymax) of the space, rounded up to whole cells
+            resolution (float): side of the cells
+            free (bool): whether the space starts free (otherwise it starts occupied, and the free areas are set with free())
+        """
+        self.bbox = bbox
+        self.resolution = resolution
+        self._x0, self._z0 = min(bbox[0], bbox[2]), min(bbox[1], bbox[3])
+        nx = max(1, math.ceil((max(bbox[0], bbox[2]) - self._x0) / resolution))
+        nz = max(1, math.ceil((max(bbox[1], bbox[3]) - self._z0) / resolution))
+        self.occupied = np.full((nx, nz), not free, dtype=bool)
+        # NOTE: the summed-area table of the occupied cells, computed when sampling and dropped when the raster changes
+        self._table: Optional[np.ndarray] = None
+
+    def _cells(self, bbox: Tuple[float, float, float, float], inside: bool) -> Optional[Tuple[slice, slice]]:
+        """the cells inside the bbox, or touching it, as slices of the raster (None if there are none)"""
+        x0, z0, x1, z1 = min(bbox[0], bbox[2]), min(bbox[1], bbox[3]), max(bbox[0], bbox[2]), max(bbox[1], bbox[3])
+        x0, x1 = (x0 - self._x0) / self.resolution, (x1 - self._x0) / self.resolution
+        z0, z1 = (z0 - self._z0) / self.resolution, (z1 - self._z0) / self.resolution
+        if inside:
+            ix0, iz0, ix1, iz1 = math.ceil(x0), math.ceil(z0), math.floor(x1), math.floor(z1)
+        else:
+            ix0, iz0, ix1, iz1 = math.floor(x0), math.floor(z0), math.floor(x1) + 1, math.floor(z1) + 1
+        nx, nz = self.occupied.shape
+        ix0, iz0, ix1, iz1 = max(ix0, 0), max(iz0, 0), min(ix1, nx), min(iz1, nz)
+        if ix0 >= ix1 or iz0 >= iz1:
+            return None
+        return slice(ix0, ix1), slice(iz0, iz1)
+
+    def occupy(self, bbox: Tuple[float, float, float, float]) -> None:
+        """mark the cells touched by the bbox (xmin, ymin, xmax, ymax) as occupied"""
+        cells = self._cells(bbox, inside=False)
+        if cells is not None:
+            self.occupied[cells] = True
+            self._table = None
+
+    def occupy_many(self, bboxes: Iterable[Tuple[float, float, float, float]]) -> None:
+        """occupy() each bbox, e.g. the rectangles already placed with a RectPlacer (GridRectPlacer.rects)"""
+        for bbox in bboxes:
+            self.occupy(bbox)
+
+    def free(self, bbox: Tuple[float, float, float, float]) -> None:
+        """mark the cells inside the bbox (xmin, ymin, xmax, ymax) as free"""
+        cells = self._cells(bbox, inside=True)
+        if cells is not None:
+            self.occupied[cells] = False
+            self._table = None
+
+    def free_mask(self, x_size: float, z_size: float) -> np.ndarray:
+        """whether a rectangle of the given size centered anywhere in each cell lies in free cells only"""
+        if self._table is None:
+            self._table = np.zeros((self.occupied.shape[0] + 1, self.occupied.shape[1] + 1), dtype=np.int64)
+            self._table[1:, 1:] = self.occupied.cumsum(axis=0).cumsum(axis=1)
+        # A rectangle centered in cell i covers at most the cells i - k, ..., i + k
+        kx = math.ceil(x_size / 2 / self.resolution - 1e-9)
+        kz = math.ceil(z_size / 2 / self.resolution - 1e-9)
+        nx, nz = self.occupied.shape
+        mask = np.zeros((nx, nz), dtype=bool)
+        if nx <= 2 * kx or nz <= 2 * kz:
+            return mask
+        table = self._table
+        occupied = table[2 * kx + 1:, 2 * kz + 1:] - table[:nx - 2 * kx, 2 * kz + 1:] - table[2 * kx + 1:, :nz - 2 * kz] + table[:nx - 2 * kx, :nz - 2 * kz]
+        mask[kx:nx - kx, kz:nz - kz] = occupied == 0
+        return mask
+
+    def has_free_space(self, x_size: float, z_size: float) -> bool:
+        return bool(self.free_mask(x_size, z_size).any())
+
+    def sample(self, x_size: float, z_size: float, rng: Optional[np.random.Generator] = None) -> Tuple[float, float]:
+        """
+        A random center (x, z) where a rectangle of the given size lies in the free space.
+
+        Raises:
+            NoFreeSpaceError: if there is no such position
+        """
+        free = np.flatnonzero(self.free_mask(x_size, z_size))
+        if len(free) == 0:
+            raise NoFreeSpaceError(f"No free space for a {x_size} x {z_size} rectangle")
+        rng = rng if rng is not None else np.random
+        ix, iz = divmod(int(rng.choice(free)), self.occupied.shape[1])
+        x = self._x0 + (ix + rng.uniform()) * self.resolution
+        z = self._z0 + (iz + rng.uniform()) * self.resolution
+        return x, z
+
+    def place(self, x_size: float, z_size: float, rng: Optional[np.random.Generator] = None) -> Tuple[float, float]:
+        """sample() a center and occupy the rectangle there"""
+        x, z = self.sample(x_size, z_size, rng)
+        self.occupy((x - x_size / 2, z - z_size / 2, x + x_size / 2, z + z_size / 2))
+        return x, z
@@ -1,6 +1,24 @@
-from typing import Tuple
+from typing import List, Optional, Sequence, Tuple
+import math
+import numpy as np
 from pyqtree import Index
 
+# The batch queries of GridRectPlacer test the first SCALAR_CANDIDATES candidates one by one on the grid, and the rest
+# with NumPy if there are more than VECTORIZE_CANDIDATES of them (a NumPy call costs as much as tens of grid queries)
+SCALAR_CANDIDATES = 8
+VECTORIZE_CANDIDATES = 32
+
+
+def centered_bboxes(xs, zs, x_size: float, z_size: float) -> np.ndarray:
+    """The (xmin, ymin, xmax, ymax) bboxes of rectangles of the given size centered at (xs[i], zs[i]), as an (n, 4) array."""
+    xs, zs = np.asarray(xs, dtype=float), np.asarray(zs, dtype=float)
+    return np.stack([xs - x_size / 2, zs - z_size / 2, xs + x_size / 2, zs + z_size / 2], axis=-1)
+
+
+def _normalize(bboxes) -> np.ndarray:
+    bboxes = np.asarray(bboxes, dtype=float).reshape(-1, 4)
+    return np.concatenate([np.minimum(bboxes[:, :2], bboxes[:, 2:]), np.maximum(bboxes[:, :2], bboxes[:, 2:])], axis=1)
+
 
 class RectPlacer:
     def __init__(self, bbox: Tuple[float, float, float, float]) -> None:
@@ -50,3 +68,163 @@ class RectPlacer:
     def insert(self, name: str, bbox: Tuple[float, float, float, float]):
         """force place a rectangle into the 2d space"""
         self.spindex.insert(name, bbox)
+
+    def first_free_of(self, bboxes) -> Optional[int]:
+        """the index of the first of the (n, 4) bboxes that does not overlap the placed rectangles, or None"""
+        for i, bbox in enumerate(np.asarray(bboxes, dtype=float).reshape(-1, 4).tolist()):
+            if not self.spindex.intersect(bbox):
+                return i
+        return None
+
+    def place_first_free(self, name: str, bboxes) -> Optional[int]:
+        """place the first of the bboxes that does not overlap, and return its index (None if none could be placed)"""
+        i = self.first_free_of(bboxes)
+        if i is not None:
+            self.spindex.insert(name, tuple(np.asarray(bboxes, dtype=float).reshape(-1, 4)[i].tolist()))
+        return i
+
+    def place_many(self, names: Sequence[str], bboxes) -> List[bool]:
+        """place_rectangle() for each bbox in order, so a bbox is also checked against those placed before it"""
+        return [self.place_rectangle(name, bbox) for name, bbox in zip(names, np.asarray(bboxes, dtype=float).reshape(-1, 4).tolist())]
+
+
+class GridRectPlacer:
+    def __init__(self, bbox: Tuple[float, float, float, float], cell_size: float = 1.0) -> None:
+        """
+        A drop-in replacement of RectPlacer, backed by a uniform grid and NumPy arrays instead of a pyqtree quadtree.
+
+        Each grid cell lists the rectangles that overlap it, so a single query only checks the rectangles of the few cells
+        it covers. The batch methods (first_free_of, place_first_free, place_many) take all the candidates of a rejection
+        sampling loop at once: the first candidates are tested on the grid, and the rest of a long list against all the
+        placed rectangles in a few NumPy operations.
+        As with RectPlacer, rectangles that touch overlap, and rectangles may lie outside bbox.
+
+        Args:
+            bbox (Tuple[float, float, float, float]): (xmin, ymin, xmax, ymax) of the grid
+            cell_size (float): side of the grid cells
+        """
+        self.bbox = bbox
+        self.cell_size = cell_size
+        self._x0, self._z0 = min(bbox[0], bbox[2]), min(bbox[1], bbox[3])
+        self._nx = max(1, math.ceil((max(bbox[0], bbox[2]) - self._x0) / cell_size))
+        self._nz = max(1, math.ceil((max(bbox[1], bbox[3]) - self._z0) / cell_size))
+        # NOTE: the cells hold the rectangles themselves rather than their indices, to save a lookup in the query loop
+        self._cells: List[List[Tuple[float, float, float, float]]] = [[] for _ in range(self._nx * self._nz)]
+        self.names: List[str] = []
+        self._rect_list: List[Tuple[float, float, float, float]] = []
+        self._rects = np.empty((16, 4))
+
+    def __len__(self) -> int:
+        return len(self._rect_list)
+
+    @property
+    def rects(self) -> np.ndarray:
+        """the (n, 4) normalized bboxes of the placed rectangles"""
+        return self._rects[:len(self._rect_list)]
+
+    def _cell_range(self, rect: Tuple[float, float, float, float]) -> Tuple[int, int, int, int]:
+        # NOTE: clamped to the grid, so rectangles outside bbox go to the border cells
+        cell_size, nx, nz = self.cell_size, self._nx, self._nz
+        ix0 = min(max(int((rect[0] - self._x0) // cell_size), 0), nx - 1)
+        iz0 = min(max(int((rect[1] - self._z0) // cell_size), 0), nz - 1)
+        ix1 = min(max(int((rect[2] - self._x0) // cell_size), 0), nx - 1)
+        iz1 = min(max(int((rect[3] - self._z0) // cell_size), 0), nz - 1)
+        return ix0, iz0, ix1, iz1
+
+    def intersects(self, bbox: Tuple[float, float, float, float]) -> bool:
+        """whether the bbox overlaps a placed rectangle"""
+        x0, z0, x1, z1 = bbox
+        if x0 > x1:
+            x0, x1 = x1, x0
+        if z0 > z1:
+            z0, z1 = z1, z0
+        ix0, iz0, ix1, iz1 = self._cell_range((x0, z0, x1, z1))
+        cells, nz = self._cells, self._nz
+        for ix in range(ix0, ix1 + 1):
+            for cell in cells[ix * nz + iz0:ix * nz + iz1 + 1]:
+                for r in cell:
+                    if r[2] >= x0 and r[0] <= x1 and r[3] >= z0 and r[1] <= z1:
+                        return True
+        return False
+
+    def insert(self, name: str, bbox: Tuple[float, float, float, float]):
+        """force place a rectangle into the 2d space"""
+        x0, z0, x1, z1 = bbox
+        rect = (min(x0, x1), min(z0, z1), max(x0, x1), max(z0, z1))
+        i = len(self._rect_list)
+        if i == len(self._rects):
+            self._rects = np.concatenate([self._rects, np.empty_like(self._rects)])
+        self._rects[i] = rect
+        self._rect_list.append(rect)
+        self.names.append(name)
+        ix0, iz0, ix1, iz1 = self._cell_range(rect)
+        cells, nz = self._cells, self._nz
+        for ix in range(ix0, ix1 + 1):
+            for cell in cells[ix * nz + iz0:ix * nz + iz1 + 1]:
+                cell.append(rect)
+
+    def place_rectangle(self, name: str, bbox: Tuple[float, float, float, float]) -> bool:
+        """place a rectangle into the 2d space without overlapping, see RectPlacer.place_rectangle()"""
+        if self.intersects(bbox):
+            return False
+        self.insert(name, bbox)
+        return True
+
+    def place(self, name, x, z, x_size, z_size):
+        """place a rectangle centered at (x, z) without overlapping, see RectPlacer.place()"""
+        return self.place_rectangle(name, (x - x_size / 2, z - z_size / 2, x + x_size / 2, z + z_size / 2))
+
+    def _overlaps(self, bboxes: np.ndarray) -> np.ndarray:
+        """whether each of the normalized (m, 4) bboxes overlaps a placed rectangle"""
+        rects = self.rects
+        if len(bboxes) == 0 or len(rects) == 0:
+            return np.zeros(len(bboxes), dtype=bool)
+        # NOTE: only the rectangles that overlap the union of the candidates can overlap one of them
+        near = (rects[:, 2] >= bboxes[:, 0].min()) & (rects[:, 0] <= bboxes[:, 2].max()) & (rects[:, 3] >= bboxes[:, 1].min()) & (rects[:, 1] <= bboxes[:, 3].max())
+        rects = rects[near]
+        if len(rects) == 0:
+            return np.zeros(len(bboxes), dtype=bool)
+        return (
+            (rects[None, :, 2] >= bboxes[:, None, 0])
+            & (rects[None, :, 0] <= bboxes[:, None, 2])
+            & (rects[None, :, 3] >= bboxes[:, None, 1])
+            & (rects[None, :, 1] <= bboxes[:, None, 3])
+        ).any(axis=1)
+
+    def first_free_of(self, bboxes) -> Optional[int]:
+        """the index of the first of the (n, 4) bboxes that does not overlap the placed rectangles, or None"""
+        bboxes = np.asarray(bboxes, dtype=float).reshape(-1, 4)
+        # NOTE: usually one of the first candidates fits, so they are tested one by one and only the rest of a long
+        # list is tested in one go
+        head = bboxes[:SCALAR_CANDIDATES if len(bboxes) - SCALAR_CANDIDATES > VECTORIZE_CANDIDATES else len(bboxes)].tolist()
+        for i, bbox in enumerate(head):
+            if not self.intersects(bbox):
+                return i
+        if len(bboxes) <= len(head):
+            return None
+        free = np.flatnonzero(~self._overlaps(_normalize(bboxes[len(head):])))
+        return len(head) + int(free[0]) if len(free) else None
+
+    def place_first_free(self, name: str, bboxes) -> Optional[int]:
+        """place the first of the bboxes that does not overlap, and return its index (None if none could be placed)"""
+        bboxes = np.asarray(bboxes, dtype=float).reshape(-1, 4)
+        i = self.first_free_of(bboxes)
+        if i is not None:
+            self.insert(name, tuple(bboxes[i].tolist()))
+        return i
+
+    def place_many(self, names: Sequence[str], bboxes) -> List[bool]:
+        """place_rectangle() for each bbox in order, so a bbox is also checked against those placed before it"""
+        bboxes = np.asarray(bboxes, dtype=float).reshape(-1, 4)
+        if len(bboxes) <= VECTORIZE_CANDIDATES:
+            overlaps = [False] * len(bboxes)
+        else:
+            overlaps = self._overlaps(_normalize(bboxes)).tolist()
+        placed = []
+        for name, bbox, overlap in zip(names, bboxes.tolist(), overlaps):
+            # NOTE: the ones placed earlier in this batch are not in the vectorized check, test them on the grid
+            ok = not overlap and not self.intersects(bbox)
+            if ok:
+                self.insert(name, tuple(bbox))
+            placed.append(ok)
+        return placed
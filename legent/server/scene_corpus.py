@@ -0,0 +1,149 @@
+from typing import Dict, Iterator, Optional
+from concurrent.futures import as_completed
+import gzip
+import json
+import math
+import os
+import numpy as np
+from tqdm import tqdm
+from legent.server.scene_generator import generate_scene
+from legent.server.scene_workers import make_scene_executor
+from legent.utils.io import log
+
+INDEX_FILE = "index.json"
+MAX_SCENE_RETRIES = 3
+
+
+def scene_seed(entropy: int, scene_id: int, attempt: int = 0) -> int:
+    """The seed of a scene of the corpus. The first attempt gives the same scene as the scene_id-th scene of ScenePool(seed)."""
+    spawn_key = (scene_id,) if attempt == 0 else (scene_id, attempt)
+    return int(np.random.SeedSequence(entropy, spawn_key=spawn_key).generate_state(1)[0])
+
+
+def shard_file(shard: int) -> str:
+    return f"scenes-{shard:05d}.jsonl.gz"
+
+
+def _generate_shard(output_dir: str, shard: int, first: int, count: int, entropy: int, kwargs: Dict) -> Dict:
+    """Generate the scenes first, ..., first + count - 1 into one gzipped JSONL file. Each line is {"id", "seed", "scene"}."""
+    path = os.path.join(output_dir, shard_file(shard))
+    failed = []
+    written = 0
+    # Write to a temporary file and rename it when complete, so that an interrupted shard is regenerated on resume
+    with gzip.open(f"{path}.tmp", "wt", encoding="utf-8", compresslevel=6) as f:
+        for scene_id in range(first, first + count):
+            for attempt in range(MAX_SCENE_RETRIES):
+                seed = scene_seed(entropy, scene_id, attempt)
+                try:
+                    scene = generate_scene(**kwargs, seed=seed, save_last_scene=False)
+                    break
+                except Exception as e:
+                    log(f"Scene {scene_id} (attempt {attempt + 1}/{MAX_SCENE_RETRIES}, seed {seed}) failed: {type(e).__name__}: {e}")
+                    continue
+            else:
+                failed.append(scene_id)
+                continue
+            f.write(json.dumps({"id": scene_id, "seed": seed, "scene": scene}, ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
+            written += 1
+    if written == 0 and failed:
+        # NOTE: most likely a systematic error (e.g. no environment data), so the shard is not finished and is generated
+        # again on resume, see generate_scenes()
+        os.remove(f"{path}.tmp")
+    else:
+        os.replace(f"{path}.tmp", path)
+    return {"shard": shard, "file": shard_file(shard), "first": first, "count": written, "failed": failed}
+
+
+def _store_index(output_dir: str, index: Dict) -> None:
+    path = os.path.join(output_dir, INDEX_FILE)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=4)
+    os.replace(f"{path}.tmp", path)
+
+
+def load_index(output_dir: str) -> Optional[Dict]:
+    path = os.path.join(output_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def generate_scenes(
+    output_dir: str, num: int, workers: Optional[int] = None, seed: Optional[int] = None, shard_size: int = 1000,
+    object_counts: Dict[str, int] = {}, receptacle_object_counts={}, room_num=None, layout_bank: Optional[str] = None,
+    layout_reuse_probability: float = 1.0
+) -> Dict:
+    """
+    Generate num scenes with a pool of processes into gzipped JSONL shards of shard_size scenes, plus an index.json
+    that lists the finished shards. A shard whose scenes all failed is not finished.
+
+    The i-th scene only depends on the seed and i, so the corpus is the same whatever the number of workers.
+    If output_dir already holds a corpus generated with the same arguments, only the missing shards are generated,
+    so an interrupted run can be resumed by running the same command again.
+
+    Args:
+        output_dir: The directory of the shards and the index.
+        num: Number of scenes.
+        workers: Number of generating processes. Defaults to the number of CPUs.
+        seed: The seed of the corpus. If None, a random one is used (and recorded in the index for resuming).
+        shard_size: Number of scenes per shard, which is also the unit of work of the processes.
+        object_counts, receptacle_object_counts, room_num: Passed to generate_scene().
+        layout_bank, layout_reuse_probability: The directory of a layout bank to take the house layouts from, see
+            generate_scene().
+
+    Returns:
+        The index.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    kwargs = {"object_counts": object_counts, "receptacle_object_counts": receptacle_object_counts, "room_num": room_num}
+    if layout_bank is not None:
+        # NOTE: only recorded when set, so that the corpora generated without a bank can still be resumed
+        kwargs.update({"layout_bank": os.path.abspath(layout_bank), "layout_reuse_probability": layout_reuse_probability})
+    index = load_index(output_dir)
+    if index is None:
+        index = {"num": num, "shard_size": shard_size, "seed": seed, "entropy": np.random.SeedSequence(seed).entropy, "kwargs": kwargs, "shards": []}
+    elif (index["num"], index["shard_size"], index["kwargs"]) != (num, shard_size, kwargs) or (seed is not None and index["seed"] != seed):
+        raise Exception(f"{output_dir} holds scenes generated with other arguments, use another directory to generate a new corpus")
+    entropy = index["entropy"]
+
+    done = {record["shard"] for record in index["shards"]}
+    num_shards = math.ceil(num / shard_size)
+    todo = [shard for shard in range(num_shards) if shard not in done]
+    unfinished = []
+    with tqdm(total=num, initial=sum(record["count"] + len(record["failed"]) for record in index["shards"]), desc="Generating scenes") as progress:
+        if todo:
+            workers = min(workers or os.cpu_count() or 1, len(todo))
+            with make_scene_executor(workers) as executor:
+                futures = []
+                for shard in todo:
+                    first = shard * shard_size
+                    futures.append(executor.submit(_generate_shard, output_dir, shard, first, min(shard_size, num - first), entropy, kwargs))
+                for future in as_completed(futures):
+                    record = future.result()
+                    progress.update(record["count"] + len(record["failed"]))
+                    if record["count"] == 0 and record["failed"]:
+                        # Not recorded as done, so that it is generated again on resume
+                        unfinished.append(record["shard"])
+                        continue
+                    index["shards"].append(record)
+                    index["shards"].sort(key=lambda record: record["shard"])
+                    _store_index(output_dir, index)
+    failed = sum(len(record["failed"]) for record in index["shards"])
+    if failed:
+        print(f"{failed} scenes failed {MAX_SCENE_RETRIES} times and were skipped, see the failed ids in {os.path.join(output_dir, INDEX_FILE)}")
+    if unfinished:
+        print(f"All the scenes of the shards {sorted(unfinished)} failed, see the errors above. Run the same command again to retry them.")
+    return index
+
+
+def iter_scenes(output_dir: str) -> Iterator[Dict]:
+    """Iterate over the {"id", "seed", "scene"} records of a corpus made by generate_scenes(), in order of id."""
+    index = load_index(output_dir)
+    if index is None:
+        raise Exception(f"No scene corpus in {output_dir}")
+    for record in index["shards"]:
+        with gzip.open(os.path.join(output_dir, record["file"]), "rt", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
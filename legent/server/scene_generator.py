@@ -1,14 +1,18 @@
 from legent.environment.env_utils import get_default_env_data_path
 from legent.scene_generation.objects import get_default_object_db
-from legent.server.rect_placer import RectPlacer
+from legent.server.free_space import FreeSpaceSampler, NoFreeSpaceError
+from legent.server.rect_placer import GridRectPlacer
 from legent.utils.io import load_json, log, store_json, load_json_from_toolkit
 from legent.utils.math import look_rotation
 import numpy as np
 import json
-from typing import Dict, Literal, Optional
+import random
+from typing import Dict, Literal, Optional, Union
 
 from legent.scene_generation.generator import HouseGenerator
+from legent.scene_generation.layout_bank import LayoutBank, get_layout_bank
 from legent.scene_generation.objects import DEFAULT_OBJECT_DB,get_default_object_db
+from legent.scene_generation.rng import make_rngs
 from legent.scene_generation.room_spec import (
     ROOM_SPEC_SAMPLER,
     RoomSpecSampler,
@@ -29,6 +33,7 @@ DEFAULT_WALL_PREFAB = "LowPolyInterior_WallFloor1_09"
 
 def set_seed(seed: int = 42) -> None:
     np.random.seed(seed)
+    random.seed(seed)
 
 
 def load_prefabs() -> None:
@@ -46,44 +51,63 @@ def load_prefabs() -> None:
     kinematic_names_set = set(kinematic_names)
 
 
+def get_room_spec_sampler(room_num=None) -> RoomSpecSampler:
+    """The room specs generate_scene() samples from for room_num rooms (None for the default specs)."""
+    if room_num == 2:
+        return RoomSpecSampler(
+            [
+                RoomSpec(
+                    room_spec_id="LivingRoom",  # TwoRooms
+                    sampling_weight=1,
+                    spec=[
+                        LeafRoom(room_id=2, ratio=1, room_type="Bedroom"),
+                        LeafRoom(room_id=3, ratio=1, room_type="LivingRoom"),
+                    ],
+                )
+            ]
+        )
+    elif room_num == 1:
+        return RoomSpecSampler(
+            [
+                RoomSpec(
+                    room_spec_id="LivingRoom",
+                    sampling_weight=1,
+                    spec=[LeafRoom(room_id=2, ratio=1, room_type="Bedroom")],
+                )
+            ]
+        )
+    return ROOM_SPEC_SAMPLER
+
+
 def generate_scene(
-    object_counts: Dict[str, int] = {}, receptacle_object_counts={}, room_num=None, method="proc"
+    object_counts: Dict[str, int] = {}, receptacle_object_counts={}, room_num=None, method="proc", seed: Optional[int] = None,
+    save_last_scene: bool = True, layout_bank: Optional[Union[LayoutBank, str]] = None, layout_reuse_probability: float = 1.0
 ):
+    """
+    Generate a scene procedurally.
+
+    seed: The scene is the same for the same seed and arguments, in any process. All the sampling draws from random streams
+    derived from it (see make_rngs), not from the global np.random and random. If None, the seed is drawn from np.random.
+    save_last_scene: Whether to also write the scene to last_scene.json, for debugging. Turn it off when generating many scenes.
+    layout_bank: A LayoutBank, or its directory, to take the house layout from instead of generating it (see layout_bank.py).
+    layout_reuse_probability: The probability to take the layout from the bank, otherwise a new layout is generated.
+    """
     if method == "proc":
+        rng, py_rng = make_rngs(seed)
         # object_counts specifies a definite number for certain objects
         # For example, if you want to have only one instance of ChristmasTree_01 in the scene, you can set the object_counts as {"ChristmasTree_01": 1}.
         # global prefabs, interactable_names, kinematic_names, interactable_names_set, kinematic_names_set
         MAX = 7
-        sampler = ROOM_SPEC_SAMPLER
-        if room_num == 2:
-            sampler = RoomSpecSampler(
-                [
-                    RoomSpec(
-                        room_spec_id="LivingRoom",  # TwoRooms
-                        sampling_weight=1,
-                        spec=[
-                            LeafRoom(room_id=2, ratio=1, room_type="Bedroom"),
-                            LeafRoom(room_id=3, ratio=1, room_type="LivingRoom"),
-                        ],
-                    )
-                ]
-            )
-        elif room_num == 1:
-            sampler = RoomSpecSampler(
-                [
-                    RoomSpec(
-                        room_spec_id="LivingRoom",
-                        sampling_weight=1,
-                        spec=[LeafRoom(room_id=2, ratio=1, room_type="Bedroom")],
-                    )
-                ]
-            )
+        sampler = get_room_spec_sampler(room_num)
         # receptacle_object_counts= {"Table": {"count": 1, "objects": [{"Banana": 1}]}}
-        room_spec = sampler.sample()
+        room_spec = sampler.sample(py_rng=py_rng)
 
+        if isinstance(layout_bank, str):
+            layout_bank = get_layout_bank(layout_bank)
 
         house_generator = HouseGenerator(
-            room_spec=room_spec, dims=(MAX, MAX), objectDB=get_default_object_db()
+            room_spec=room_spec, dims=(MAX, MAX), objectDB=get_default_object_db(), rng=rng, py_rng=py_rng,
+            layout_bank=layout_bank, layout_reuse_probability=layout_reuse_probability
         )
 
         # receptacle_object_counts={
@@ -94,7 +118,7 @@ def generate_scene(
         #     "Dresser": {"count": 1, "objects": [{"Orange": 1}]},
         # }
         scene = house_generator.generate(
-            object_counts=object_counts, receptacle_object_counts=receptacle_object_counts
+            object_counts=object_counts, receptacle_object_counts=receptacle_object_counts, save_last_scene=save_last_scene
         )
         # for instance in scene["instances"]:
         #     instance["type"] = "kinematic"
@@ -161,7 +185,7 @@ def generate_scene_messy(object_counts: Dict[str, int] = {}):
     min_z, max_z = min(area0_range[2], area1_range[2]), max(
         area0_range[3], area1_range[3]
     )
-    placer = RectPlacer((min_x, min_z, max_x, max_z))
+    placer = GridRectPlacer((min_x, min_z, max_x, max_z))
 
     floor_instances = []
     # generate walls based on the 0-1 boundaries
@@ -286,47 +310,44 @@ def generate_scene_messy(object_counts: Dict[str, int] = {}):
             area_range[2], area_range[3]
         )
 
+    # NOTE: the free space of the two areas, kept in sync with placer, to sample positions that fit without rejection
+    free_space = FreeSpaceSampler((min_x, min_z, max_x, max_z))
+    for area_range in [area0_range, area1_range]:
+        free_space.free((area_range[0], area_range[2], area_range[1], area_range[3]))
+    free_space.occupy_many(placer.rects.tolist())
+
+    def place_in_free_space(_name, _x_size, _z_size):
+        # raises NoFreeSpaceError if it fits nowhere
+        _x, _z = free_space.place(_x_size, _z_size)
+        placer.insert(_name, (_x - _x_size / 2, _z - _z_size / 2, _x + _x_size / 2, _z + _z_size / 2))
+        return _x, _z
+
     ### STEP 3: Randomly place the player and agent
     # place the player
-    while True:
-        x, z = random_xz_in_area_inner(eps=0.5)
-        x_size, z_size = 1, 1
-        player = {
-            "prefab": "",
-            "position": [
-                x,
-                0.05,
-                z,
-            ],  # TODO: obtain the precise centerOffset of the character. calculate y based on it.
-            "rotation": [0, np.random.uniform(0, 360), 0],
-            "scale": [1, 1, 1],
-            "parent": -1,
-            "type": "",
-        }
-        ok = placer.place_rectangle(
-            "player",
-            bbox=(x - x_size / 2, z - z_size / 2, x + x_size / 2, z + z_size / 2),
-        )
-        if ok:
-            break
+    x_size, z_size = 1, 1
+    x, z = place_in_free_space("player", x_size, z_size)
+    player = {
+        "prefab": "",
+        "position": [
+            x,
+            0.05,
+            z,
+        ],  # TODO: obtain the precise centerOffset of the character. calculate y based on it.
+        "rotation": [0, np.random.uniform(0, 360), 0],
+        "scale": [1, 1, 1],
+        "parent": -1,
+        "type": "",
+    }
     # place the agent
-    while True:
-        x, z = random_xz_in_area_inner(eps=0.5)
-        x_size, z_size = 1, 1
-        agent = {
-            "prefab": "",
-            "position": [x, 0.05, z],
-            "rotation": [0, np.random.uniform(0, 360), 0],
-            "scale": [1, 1, 1],
-            "parent": -1,
-            "type": "",
-        }
-        ok = placer.place_rectangle(
-            "agent",
-            bbox=(x - x_size / 2, z - z_size / 2, x + x_size / 2, z + z_size / 2),
-        )
-        if ok:
-            break
+    x, z = place_in_free_space("agent", x_size, z_size)
+    agent = {
+        "prefab": "",
+        "position": [x, 0.05, z],
+        "rotation": [0, np.random.uniform(0, 360), 0],
+        "scale": [1, 1, 1],
+        "parent": -1,
+        "type": "",
+    }
 
     # player lookat the agent
     vs, vt = np.array(player["position"]), np.array(agent["position"])
@@ -341,9 +362,9 @@ def generate_scene_messy(object_counts: Dict[str, int] = {}):
 
     def put_once(
         _name,
-        _placer: RectPlacer,
+        _placer: GridRectPlacer,
         parent_idx,
-        rand_method: Literal["eps", "fit"],
+        rand_method: Literal["eps", "fit", "free"],
         return_bbox=False,
     ):
         # Put _name in _placer on parent_idx
@@ -353,7 +374,11 @@ def generate_scene_messy(object_counts: Dict[str, int] = {}):
             prefabs[_name]["size"]["y"],
             prefabs[_name]["size"]["z"],
         )
-        if rand_method == "eps":  # put at a fixed distance from the edge of the area
+        if rand_method == "free":  # put anywhere in the free space of placer, which always fits
+            # NOTE: keep eps of clearance as in "eps" below, to avoid generating small objects close to the wall
+            eps = 0.05 if _name in kinematic_names else 0.2
+            _x, _z = free_space.sample(_x_size + 2 * eps, _z_size + 2 * eps)
+        elif rand_method == "eps":  # put at a fixed distance from the edge of the area
             if _name in kinematic_names:
                 _x, _z = random_xz_in_area_inner(eps=0.05)
             else:
@@ -373,6 +398,8 @@ def generate_scene_messy(object_counts: Dict[str, int] = {}):
                 return False
         _bbox = (_x - _x_size / 2, _z - _z_size / 2, _x + _x_size / 2, _z + _z_size / 2)
         ok = _placer.place_rectangle(_name, bbox=_bbox)
+        if ok and _placer is placer:
+            free_space.occupy(_bbox)
         if parent_idx == 0:
             _y_base = (
                 0 + prefabs[DEFAULT_FLOOR_PREFAB]["size"]["y"] / 2
@@ -405,14 +432,14 @@ def generate_scene_messy(object_counts: Dict[str, int] = {}):
 
     def put_one(
         _name,
-        _placer: RectPlacer,
         parent_idx,
-        rand_method: Literal["eps", "fit"],
         return_bbox=False,
     ):
-        ok = False
-        while not ok:
-            ok, _bbox = put_once(_name, _placer, parent_idx, rand_method, True)
+        # Put _name in placer on parent_idx, at a position sampled from the free space.
+        # Raises NoFreeSpaceError if it fits nowhere, instead of retrying forever.
+        ok, _bbox = put_once(_name, placer, parent_idx, "free", True)
+        if not ok:
+            raise NoFreeSpaceError(f"Failed to put {_name}")
         if return_bbox:
             return True, _bbox
         return True
@@ -420,7 +447,7 @@ def generate_scene_messy(object_counts: Dict[str, int] = {}):
     # generate objects with a specified number
     for name in object_counts:
         for i in range(object_counts[name]):
-            put_one(name, placer, 0, "eps")
+            put_one(name, 0)
     random_kinematic_names = [
         name for name in kinematic_names if name not in object_counts
     ]
@@ -439,7 +466,7 @@ def generate_scene_messy(object_counts: Dict[str, int] = {}):
             parent_idx = len(floor_instances) + len(object_instances) - 1
             # Generate some objects on this non-interactive object (such as a table).
             # bbox represent the range of the tabletop
-            subplacer = RectPlacer(bbox=bbox)
+            subplacer = GridRectPlacer(bbox=bbox)
             sub_object_nums = 10 if sum([n in name for n in {"Table", "Catpet"}]) else 0
             for i in range(sub_object_nums):
                 name = np.random.choice(random_interactable_names)
@@ -467,7 +494,7 @@ def generate_scene_messy(object_counts: Dict[str, int] = {}):
     return infos
 
 
-def complete_scene(predefined_scene):
+def complete_scene(predefined_scene, save_last_scene: bool = True):
     # Complete a predefined scene
     # add player, agent, interactable information etc.
     x, z = np.random.uniform(-5, 5), np.random.uniform(-5, 5)
@@ -519,6 +546,7 @@ def complete_scene(predefined_scene):
         "center": [0, 0, 10],
     }
 
-    with open("last_scene.json", "w", encoding="utf-8") as f:
-        json.dump(infos, f, ensure_ascii=False, indent=4)
+    if save_last_scene:
+        with open("last_scene.json", "w", encoding="utf-8") as f:
+            json.dump(infos, f, ensure_ascii=False, indent=4)
     return infos
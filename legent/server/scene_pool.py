@@ -0,0 +1,89 @@
+from typing import Dict, Optional
+from collections import deque
+from concurrent.futures import Future
+import os
+import numpy as np
+from legent.server.scene_generator import generate_scene
+from legent.server.scene_workers import make_scene_executor
+
+
+def _generate_scene_with_seed(seed: int, kwargs: Dict) -> Dict:
+    return generate_scene(**kwargs, seed=seed)
+
+
+class ScenePool:
+    def __init__(
+        self, size: int = 4, num_workers: Optional[int] = None, seed: Optional[int] = None,
+        object_counts: Dict[str, int] = {}, receptacle_object_counts={}, room_num=None
+    ):
+        """
+        Keeps `size` scenes generated ahead by background processes, so that getting a scene does not wait for
+        generate_scene() unless the pool is drained.
+
+        Args:
+            size: Number of scenes generated ahead.
+            num_workers: Number of generating processes. Defaults to min(size, number of CPUs).
+            seed: If given, the i-th scene returned by get() is always the same, whatever the number of workers.
+            object_counts, receptacle_object_counts, room_num: Passed to generate_scene().
+        """
+        self.size = size
+        self.kwargs = {"object_counts": object_counts, "receptacle_object_counts": receptacle_object_counts, "room_num": room_num}
+        # Each scene gets its own seed from the sequence, in order
+        self._seeds = np.random.SeedSequence(seed)
+        # The workers start with a warm ObjectDB and do not inherit the state (e.g. gRPC threads) of this process
+        self._executor = make_scene_executor(num_workers or min(size, os.cpu_count() or 1))
+        self._pending = deque()
+        for _ in range(size):
+            self._submit()
+
+    def _submit(self) -> None:
+        seed = int(self._seeds.spawn(1)[0].generate_state(1)[0])
+        self._pending.append(self._executor.submit(_generate_scene_with_seed, seed, self.kwargs))
+
+    def matches(self, object_counts: Dict[str, int] = {}, receptacle_object_counts={}, room_num=None) -> bool:
+        """Whether the scenes of this pool are generated with these arguments."""
+        return self.kwargs == {"object_counts": object_counts, "receptacle_object_counts": receptacle_object_counts, "room_num": room_num}
+
+    def get(self, timeout: Optional[float] = None) -> Dict:
+        """Take the oldest scene, waiting for it if it is not ready yet, and start generating a new one."""
+        future: Future = self._pending.popleft()
+        self._submit()
+        return future.result(timeout)
+
+    def close(self) -> None:
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self) -> "ScenePool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+_default_pool: Optional[ScenePool] = None
+
+
+def set_default_scene_pool(pool: Optional[ScenePool]) -> None:
+    """
+    Make Environment.reset(), ResetInfo() and TaskCreator take their scenes from this pool when they would call
+    generate_scene() with the same arguments as the pool. Set None to generate the scenes in place again.
+    """
+    global _default_pool
+    _default_pool = pool
+
+
+def get_default_scene_pool() -> Optional[ScenePool]:
+    return _default_pool
+
+
+def next_scene(pool: Optional[ScenePool] = None, object_counts: Dict[str, int] = {}, receptacle_object_counts={}, room_num=None) -> Dict:
+    """
+    Get a scene from the pool (or the default pool) if its arguments match, otherwise call generate_scene() directly.
+    """
+    pool = pool or _default_pool
+    if pool is not None and pool.matches(object_counts, receptacle_object_counts, room_num):
+        return pool.get()
+    return generate_scene(object_counts, receptacle_object_counts, room_num)
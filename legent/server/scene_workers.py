@@ -0,0 +1,56 @@
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from legent.scene_generation.asset_groups import get_asset_group_table
+from legent.scene_generation.floor_assets import get_floor_asset_index
+from legent.scene_generation.objects import ObjectDB, get_default_object_db
+
+ROOM_TYPES = ["Kitchen", "LivingRoom", "Bedroom", "Bathroom"]
+SPLITS = ["train"]
+
+# Imported by the fork server before it forks the workers, see scene_generation_context()
+WARM_UP_MODULE = "legent.server.warm_scene_worker"
+
+
+def warm_up() -> ObjectDB:
+    """
+    Build everything that the scene generation otherwise builds on first use: the default ObjectDB, the floor asset
+    tables of all the (room type, split) keys and the asset group table. Returns the ObjectDB.
+    """
+    odb = get_default_object_db()
+    for room_type in ROOM_TYPES:
+        for split in SPLITS:
+            get_floor_asset_index(odb, room_type, split)
+    get_asset_group_table(odb)
+    return odb
+
+
+def scene_generation_context() -> multiprocessing.context.BaseContext:
+    """
+    The multiprocessing context for scene generation workers.
+
+    Where available, workers are forked from a fork server that imported WARM_UP_MODULE, i.e. ran warm_up() once, so
+    every worker starts with the warm ObjectDB shared copy-on-write instead of building its own. The fork server is a
+    fresh process, so unlike plain fork the workers do not inherit the threads (e.g. gRPC) of this process.
+    Elsewhere (Windows), workers are spawned and should call warm_up() themselves, as make_scene_executor() does.
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    # NOTE: only takes effect if the fork server is not running yet, otherwise the workers warm up in the initializer
+    context.set_forkserver_preload([WARM_UP_MODULE])
+    return context
+
+
+def _init_worker() -> None:
+    # A no-op in the workers forked from a warm fork server
+    try:
+        warm_up()
+    except Exception:
+        # Let the tasks fail with the actual error (e.g. no environment data) rather than break the pool
+        pass
+
+
+def make_scene_executor(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """A process pool for scene generation, whose workers start with everything warm_up() builds."""
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=scene_generation_context(), initializer=_init_worker)
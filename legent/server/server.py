@@ -1,4 +1,5 @@
 from legent.server.scene_generator import generate_scene, complete_scene
+from legent.server.scene_pool import ScenePool, next_scene
 from legent.environment.env import Environment
 from legent.environment.env_utils import get_default_env_data_path, launch_executable, get_default_env_path
 from legent.utils.io import log, log_green, load_json, load_json_from_toolkit, parse_ssh, SSHTunnel
@@ -32,7 +33,7 @@ def create_world():
             response = complete_scene(scene) 
         config["scenes_id"] = (config["scenes_id"] + 1) % len(config["scenes_file"])
     else:
-        response = generate_scene(config["object_counts"])
+        response = next_scene(get_scene_pool(config), config["object_counts"])
         log("generate a new scene")
     return jsonify(response)
 
@@ -116,6 +117,22 @@ def set_object_counts(object_counts: Dict[str, int]) -> bool:
         return False
 
 
+scene_pool = None
+
+
+def get_scene_pool(config) -> ScenePool:
+    """The pool of scenes generated ahead, if config["scene_pool_size"] > 0. It is recreated when the object counts change."""
+    global scene_pool
+    size = config.get("scene_pool_size", 0)
+    if not size:
+        return None
+    if scene_pool is None or not scene_pool.matches(config["object_counts"]):
+        if scene_pool is not None:
+            scene_pool.close()
+        scene_pool = ScenePool(size, object_counts=config["object_counts"])
+    return scene_pool
+
+
 def get_files_under(path):
     files = [
         file
@@ -131,7 +148,8 @@ DEFAULT_CONFIG = {
     "time_scale": 1.0,  # 20.0 is suitable for training
     "max_steps": 500,
     "scenes": "",
-    "object_counts": {}
+    "object_counts": {},
+    "scene_pool_size": 0  # number of scenes generated ahead in background processes, 0 to generate each scene on request
 }
 
 
@@ -155,7 +173,10 @@ def get_config():
         return init_config()
 
 
-def serve_main():
+def serve_main(scene_pool_size=0):
+    if scene_pool_size:
+        get_config()["scene_pool_size"] = scene_pool_size
+        get_scene_pool(config)  # start generating now
     # Disable Flask logging
     import flask.cli
 
@@ -167,14 +188,14 @@ def serve_main():
     app.run(debug=True, use_reloader=False, port=PORT_FOR_CLIENT, host="0.0.0.0")
     
     
-def serve(use_default_scene):
+def serve(use_default_scene, scene_pool_size=0):
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         in_use = s.connect_ex(("localhost", PORT_FOR_CLIENT)) == 0
     if in_use:
         log("scene server already started, skip")
         return None
     else:
-        server = Process(target=serve_main)
+        server = Process(target=serve_main, args=(scene_pool_size,))
         server.start()
         if use_default_scene:
             time.sleep(0.1)
@@ -182,9 +203,9 @@ def serve(use_default_scene):
         return server
     
 
-def launch(executable_path, ssh:str, use_default_scene, use_env=False, launch_scene_server=True):
+def launch(executable_path, ssh:str, use_default_scene, use_env=False, launch_scene_server=True, scene_pool_size=0):
     if launch_scene_server:
-        server = serve(use_default_scene)
+        server = serve(use_default_scene, scene_pool_size)
     if ssh:
         host, port, username, password = parse_ssh(ssh)
         ssh_tunnel = SSHTunnel(host, port, username, password, 50051, 50051)
@@ -0,0 +1,18 @@
+"""
+Imported once by the fork server of legent.server.scene_workers.scene_generation_context(), so that the scene
+generation workers forked from it start warm. Not meant to be imported otherwise.
+"""
+import gc
+# the imports of the scene generation (pandas, shapely, ...)
+import legent.server.scene_generator
+from legent.server.scene_workers import warm_up
+
+try:
+    warm_up()
+except Exception:
+    # e.g. no environment data yet: the fork server must still start, and the workers warm up in their initializer
+    pass
+
+# Move everything built so far out of the reach of the garbage collector, so that collections in the workers do not
+# write to (and copy) the pages shared with the fork server
+gc.freeze()
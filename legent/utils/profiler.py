@@ -0,0 +1,118 @@
+from typing import Dict, List, Optional
+from contextlib import nullcontext
+import json
+import math
+import os
+import time
+
+# Histogram buckets are spaced by a factor of 10 ** (1 / BUCKETS_PER_DECADE), from 1 microsecond to 1000 seconds.
+BUCKETS_PER_DECADE = 4
+MIN_SECONDS = 1e-6
+NUM_BUCKETS = 9 * BUCKETS_PER_DECADE + 1
+
+
+def bucket_upper_bound(index: int) -> float:
+    return MIN_SECONDS * 10 ** (index / BUCKETS_PER_DECADE)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts: List[int] = [0] * NUM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        index = 0 if seconds <= MIN_SECONDS else math.ceil(math.log10(seconds / MIN_SECONDS) * BUCKETS_PER_DECADE)
+        self.counts[min(index, NUM_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        """The upper bound of the bucket that holds the q-th percentile."""
+        rank = q / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(bucket_upper_bound(index), self.max)
+        return self.max
+
+    def summary(self) -> Dict:
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1e3 if self.count else 0.0,
+            "p50_ms": self.percentile(50) * 1e3,
+            "p90_ms": self.percentile(90) * 1e3,
+            "p99_ms": self.percentile(99) * 1e3,
+            "max_ms": self.max * 1e3,
+            # [upper bound of the bucket in ms, count] of the non-empty buckets
+            "histogram": [[bucket_upper_bound(index) * 1e3, count] for index, count in enumerate(self.counts) if count],
+        }
+
+
+class Phase:
+    def __init__(self, profiler: "Profiler", name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+
+
+class Profiler:
+    def __init__(self, dump_path: Optional[str] = None, dump_interval: float = 60):
+        """
+        Records how long each phase of the environment steps takes, e.g. action_build, exchange, image_decode.
+
+        :str dump_path: If given, the stats are appended to this JSONL file every dump_interval seconds and on dump().
+        :float dump_interval: Seconds between two dumps.
+        """
+        self.histograms: Dict[str, Histogram] = {}
+        self.dump_path = dump_path
+        self.dump_interval = dump_interval
+        self._next_dump = time.monotonic() + dump_interval
+
+    @classmethod
+    def from_env(cls) -> Optional["Profiler"]:
+        """
+        Create a profiler if the LEGENT_PROFILE environment variable is set to 1,
+        or LEGENT_PROFILE_DUMP is set to the path of a JSONL file to dump the stats into.
+        """
+        dump_path = os.environ.get("LEGENT_PROFILE_DUMP") or None
+        if os.environ.get("LEGENT_PROFILE", "0") not in ("", "0") or dump_path:
+            return cls(dump_path)
+        return None
+
+    def phase(self, name: str) -> Phase:
+        return Phase(self, name)
+
+    def record(self, name: str, seconds: float) -> None:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.add(seconds)
+        if self.dump_path and time.monotonic() >= self._next_dump:
+            self.dump()
+
+    def stats(self) -> Dict[str, Dict]:
+        return {name: histogram.summary() for name, histogram in self.histograms.items()}
+
+    def dump(self) -> None:
+        if not self.dump_path:
+            return
+        self._next_dump = time.monotonic() + self.dump_interval
+        with open(self.dump_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"time": time.time(), "pid": os.getpid(), "stats": self.stats()}) + "\n")
+
+
+_NO_PHASE = nullcontext()
+
+
+def phase(profiler: Optional[Profiler], name: str):
+    """Time the enclosed block as the given phase, or do nothing if profiler is None."""
+    return _NO_PHASE if profiler is None else profiler.phase(name)
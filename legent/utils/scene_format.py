@@ -0,0 +1,242 @@
+"""
+A compact binary encoding of scenes, for sending them to the game client (ResetInfo(binary_scene=True)) and storing corpora.
+
+A scene is encoded as:
+
+    header: magic "LGSC", version (uint16), flags (uint16), number of instances N (uint32), length L of the JSON part (uint32)
+    JSON part (L bytes, padded with spaces to a multiple of 4):
+        {"scene": the scene without "instances", "prefabs": [...], "types": [...], "extras": {i: {...}}, "raw": {i: {...}}}
+    transforms: float32[N, 3, 3], the position, rotation and scale of each instance
+    parents: int32[N]
+    prefabs: uint32[N], the index of the prefab name of each instance in the "prefabs" table of the JSON part
+    types: uint32[N], the index of the type of each instance in the "types" table of the JSON part
+
+All numbers are little-endian and the arrays are 4-byte aligned, so they can be read in place with np.frombuffer().
+The other keys of an instance (e.g. room_id) are kept in "extras", and an instance without the usual
+prefab/position/rotation/scale/parent/type fields is kept entirely in "raw".
+NOTE: positions, rotations and scales are stored as float32, the precision of the game client, so decode_scene(encode_scene(scene))
+is equal to the scene up to float32 rounding.
+
+A scene file stores many encoded scenes for random access through mmap (see write_scene_file and SceneFile).
+"""
+from typing import Any, Dict, Iterable, Tuple, Union
+from numbers import Real
+import json
+import mmap
+import struct
+import numpy as np
+
+MAGIC = b"LGSC"
+VERSION = 1
+FILE_MAGIC = b"LGSF"
+INSTANCE_KEYS = ("prefab", "position", "rotation", "scale", "parent", "type")
+
+FLAG_NO_INSTANCES = 1  # the scene has no "instances" key
+
+_HEADER = struct.Struct("<4sHHII")
+_FILE_HEADER = struct.Struct("<4sI")  # magic, version
+_FILE_FOOTER = struct.Struct("<Q4s")  # number of scenes, magic
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+_ZERO_TRANSFORM = (0.0,) * 9
+
+
+_NUMBER_TYPES = (float, int)
+
+
+def _is_vector(value: Any) -> bool:
+    return type(value) in (list, tuple) and len(value) == 3 and all(type(v) in _NUMBER_TYPES or (isinstance(v, Real) and not isinstance(v, bool)) for v in value)
+
+
+def _is_packable(instance: Dict) -> bool:
+    return (
+        all(key in instance for key in INSTANCE_KEYS)
+        and isinstance(instance["prefab"], str)
+        and isinstance(instance["type"], str)
+        and type(instance["parent"]) is int
+        and _is_vector(instance["position"])
+        and _is_vector(instance["rotation"])
+        and _is_vector(instance["scale"])
+    )
+
+
+def encode_scene(scene: Dict) -> bytes:
+    """Encode a scene dict (as returned by generate_scene()) in the compact format."""
+    instances = scene.get("instances", [])
+    n = len(instances)
+    # Python lists converted to arrays once, much faster than filling the arrays row by row
+    transforms = []
+    parents = []
+    prefabs = []
+    types = []
+    prefab_table: Dict[str, int] = {}
+    type_table: Dict[str, int] = {}
+    extras = {}
+    raw = {}
+    for i, instance in enumerate(instances):
+        if not _is_packable(instance):
+            raw[i] = instance
+            transforms.append(_ZERO_TRANSFORM)
+            parents.append(0)
+            prefabs.append(0)
+            types.append(0)
+            continue
+        transforms.append((*instance["position"], *instance["rotation"], *instance["scale"]))
+        parents.append(instance["parent"])
+        prefabs.append(prefab_table.setdefault(instance["prefab"], len(prefab_table)))
+        types.append(type_table.setdefault(instance["type"], len(type_table)))
+        if len(instance) > len(INSTANCE_KEYS):
+            extras[i] = {key: value for key, value in instance.items() if key not in INSTANCE_KEYS}
+    header = {
+        "scene": {key: value for key, value in scene.items() if key != "instances"},
+        "prefabs": list(prefab_table),
+        "types": list(type_table),
+        "extras": extras,
+        "raw": raw,
+    }
+    header = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    header += b" " * (-len(header) % 4)
+    flags = 0 if "instances" in scene else FLAG_NO_INSTANCES
+    return b"".join(
+        [
+            _HEADER.pack(MAGIC, VERSION, flags, n, len(header)),
+            header,
+            np.array(transforms, dtype="<f4").reshape(n, 9).tobytes(),
+            np.array(parents, dtype="<i4").tobytes(),
+            np.array(prefabs, dtype="<u4").tobytes(),
+            np.array(types, dtype="<u4").tobytes(),
+        ]
+    )
+
+
+def decode_scene_arrays(data: Buffer) -> Tuple[Dict, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Read an encoded scene without building the instance dicts.
+
+    Returns:
+        (header, transforms, parents, prefabs, types): the JSON part and the arrays, which are views of data (no copy).
+    """
+    buffer = memoryview(data)
+    magic, version, flags, n, header_length = _HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise Exception("Not an encoded scene")
+    if version != VERSION:
+        raise Exception(f"Unsupported scene format version {version}")
+    offset = _HEADER.size
+    header = json.loads(bytes(buffer[offset:offset + header_length]))
+    header["flags"] = flags
+    offset += header_length
+    transforms = np.frombuffer(buffer, dtype="<f4", count=n * 9, offset=offset).reshape(n, 3, 3)
+    offset += transforms.nbytes
+    parents = np.frombuffer(buffer, dtype="<i4", count=n, offset=offset)
+    offset += parents.nbytes
+    prefabs = np.frombuffer(buffer, dtype="<u4", count=n, offset=offset)
+    offset += prefabs.nbytes
+    types = np.frombuffer(buffer, dtype="<u4", count=n, offset=offset)
+    return header, transforms, parents, prefabs, types
+
+
+def decode_scene(data: Buffer) -> Dict:
+    """Decode a scene encoded by encode_scene() into the usual dict."""
+    header, transforms, parents, prefabs, types = decode_scene_arrays(data)
+    prefab_table, type_table = header["prefabs"], header["types"]
+    extras = {int(i): extra for i, extra in header["extras"].items()}
+    raw = {int(i): instance for i, instance in header["raw"].items()}
+    instances = []
+    for i, ((position, rotation, scale), parent, prefab, type_index) in enumerate(zip(transforms.tolist(), parents.tolist(), prefabs.tolist(), types.tolist())):
+        if i in raw:
+            instances.append(raw[i])
+            continue
+        instance = {"prefab": prefab_table[prefab], "position": position, "rotation": rotation, "scale": scale, "parent": parent, "type": type_table[type_index]}
+        if i in extras:
+            instance.update(extras[i])
+        instances.append(instance)
+    scene = header["scene"]
+    if not header["flags"] & FLAG_NO_INSTANCES:
+        scene["instances"] = instances
+    return scene
+
+
+def write_scene_file(path: str, scenes: Iterable[Dict]) -> int:
+    """
+    Write encoded scenes into one file that SceneFile reads by index through mmap. Returns the number of scenes.
+
+    The file is: magic "LGSF", version (uint32), the encoded scenes each padded to 8 bytes,
+    the offsets of the scenes and of the end of the last one (uint64[count + 1]), count (uint64), magic "LGSF".
+
+    For example, to pack a corpus of legent.server.scene_corpus.generate_scenes():
+
+        write_scene_file("scenes.lgsf", (record["scene"] for record in iter_scenes(corpus_dir)))
+    """
+    offsets = []
+    with open(path, "wb") as f:
+        f.write(_FILE_HEADER.pack(FILE_MAGIC, VERSION))
+        offset = _FILE_HEADER.size
+        for scene in scenes:
+            data = encode_scene(scene)
+            data += b"\0" * (-len(data) % 8)
+            offsets.append(offset)
+            f.write(data)
+            offset += len(data)
+        offsets.append(offset)
+        f.write(np.array(offsets, dtype="<u8").tobytes())
+        f.write(_FILE_FOOTER.pack(len(offsets) - 1, FILE_MAGIC))
+    return len(offsets) - 1
+
+
+class SceneFile:
+    """
+    Random access to the scenes of a file written by write_scene_file(). The file is memory-mapped, so opening it
+    is instant whatever its size, and processes that read the same file share its pages.
+
+        with SceneFile("scenes.lgsf") as scenes:
+            scene = scenes[42]
+
+    The views returned by encoded() stay valid after close(), which then leaves the unmapping to their garbage collection.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = _FILE_HEADER.unpack_from(self._mmap)
+        count, footer_magic = _FILE_FOOTER.unpack_from(self._mmap, len(self._mmap) - _FILE_FOOTER.size)
+        if magic != FILE_MAGIC or footer_magic != FILE_MAGIC:
+            raise Exception(f"{path} is not a scene file")
+        if version != VERSION:
+            raise Exception(f"Unsupported scene file version {version}")
+        self._offsets = np.frombuffer(self._mmap, dtype="<u8", count=count + 1, offset=len(self._mmap) - _FILE_FOOTER.size - (count + 1) * 8)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def encoded(self, index: int) -> memoryview:
+        """
+        The encoded scene, a view of the file that can be read with decode_scene_arrays() or sent without decoding it
+        with ResetInfo(encoded_scene=...), which copies it into the bytes of ActionProto.binary_scene.
+        """
+        if not -len(self) <= index < len(self):
+            raise IndexError(index)
+        index %= len(self)
+        return memoryview(self._mmap)[int(self._offsets[index]):int(self._offsets[index + 1])]
+
+    def __getitem__(self, index: int) -> Dict:
+        return decode_scene(self.encoded(index))
+
+    def close(self) -> None:
+        # The offsets are a view of the mmap, drop it first
+        self._offsets = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Views returned by encoded() (or the arrays of decode_scene_arrays() on them) are still alive. The file is
+            # unmapped when they are garbage collected.
+            pass
+        self._mmap = None
+
+    def __enter__(self) -> "SceneFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
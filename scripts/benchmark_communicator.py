@@ -0,0 +1,46 @@
+# Measure the per-step overhead of relaying observations and actions between the gRPC handler thread and the main thread.
+# The game client is simulated by a thread that calls the servicer directly, so only the relay itself is measured.
+from multiprocessing import Pipe
+import threading
+import time
+import numpy as np
+from legent import Action
+from legent.environment.communicator import HandoffPipe
+from legent.protobuf.communicator_pb2 import ActionProto, ObservationProto
+
+
+def benchmark(make_pipe, obs: ObservationProto, steps: int) -> float:
+    parent_conn, child_conn = make_pipe()
+
+    def game_client():
+        # CommunicatorServicerImplementation.GetAction: send the observation, wait for the action
+        while True:
+            child_conn.send(obs)
+            action = child_conn.recv()
+            if action.type == "CLOSE":
+                break
+
+    client = threading.Thread(target=game_client)
+    client.start()
+    parent_conn.recv()  # the first observation
+    action = Action().build()
+    start = time.perf_counter()
+    for _ in range(steps):
+        # RpcCommunicator.exchange
+        parent_conn.send(action)
+        parent_conn.poll(30)
+        parent_conn.recv()
+    elapsed = time.perf_counter() - start
+    parent_conn.send(ActionProto(type="CLOSE"))
+    client.join()
+    return elapsed / steps
+
+
+if __name__ == "__main__":
+    steps = 2000
+    for resolution in [224, 448]:
+        image = np.random.randint(0, 256, (resolution, resolution, 3), dtype=np.uint8).tobytes()
+        obs = ObservationProto(type="STEP", image=image, game_states="{}")
+        pipe_time = benchmark(Pipe, obs, steps)
+        handoff_time = benchmark(HandoffPipe, obs, steps)
+        print(f"{resolution}x{resolution} raw image: multiprocessing.Pipe {pipe_time * 1e6:.1f} us/step, HandoffPipe {handoff_time * 1e6:.1f} us/step ({pipe_time / handoff_time:.1f}x)")
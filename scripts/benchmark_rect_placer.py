@@ -0,0 +1,72 @@
+# Compare the pyqtree RectPlacer with GridRectPlacer on a workload like the scene generation:
+# walls along a grid of floor cells, then rejection sampling of object positions with a fixed number of candidates each.
+# Both placers must give the same placements, which is checked along the way.
+import time
+import numpy as np
+from legent.server.rect_placer import RectPlacer, GridRectPlacer, centered_bboxes
+
+SIZE = 17.5
+UNIT = 2.5
+
+
+def walls():
+    bboxes = []
+    for i in range(int(SIZE / UNIT) + 1):
+        for j in range(int(SIZE / UNIT)):
+            bboxes.append((i * UNIT - 0.05, j * UNIT, i * UNIT + 0.05, (j + 1) * UNIT))
+            bboxes.append((j * UNIT, i * UNIT - 0.05, (j + 1) * UNIT, i * UNIT + 0.05))
+    return bboxes
+
+
+def workload(seed: int, n: int, candidates: int):
+    rng = np.random.default_rng(seed)
+    sizes = rng.uniform(0.1, 1.5, size=(n, 2))
+    centers = rng.uniform(0, SIZE, size=(n, candidates, 2))
+    return [centered_bboxes(centers[i, :, 0], centers[i, :, 1], sizes[i, 0], sizes[i, 1]) for i in range(n)]
+
+
+def run_one_by_one(placer, requests):
+    # The former loops: place() one candidate at a time until one fits
+    placed = []
+    for i, bboxes in enumerate(requests):
+        for j, bbox in enumerate(bboxes.tolist()):
+            if placer.place_rectangle(str(i), tuple(bbox)):
+                placed.append(j)
+                break
+        else:
+            placed.append(None)
+    return placed
+
+
+def run_batched(placer, requests):
+    return [placer.place_first_free(str(i), bboxes) for i, bboxes in enumerate(requests)]
+
+
+def benchmark(make_placer, run, requests, repeat: int = 5):
+    best = float("inf")
+    for _ in range(repeat):
+        placer = make_placer()
+        start = time.perf_counter()
+        for name, bbox in enumerate(walls()):
+            placer.insert(f"wall{name}", bbox)
+        placed = run(placer, requests)
+        best = min(best, time.perf_counter() - start)
+    return best, placed
+
+
+if __name__ == "__main__":
+    bbox = (0, 0, SIZE, SIZE)
+    for n, candidates in [(100, 10), (1000, 10), (1000, 100)]:
+        requests = workload(0, n, candidates)
+        results = {}
+        for label, make_placer, run in [
+            ("pyqtree, one by one", lambda: RectPlacer(bbox), run_one_by_one),
+            ("grid, one by one", lambda: GridRectPlacer(bbox), run_one_by_one),
+            ("grid, batched", lambda: GridRectPlacer(bbox), run_batched),
+        ]:
+            elapsed, placed = benchmark(make_placer, run, requests)
+            results[label] = (elapsed, placed)
+        reference_time, reference = results["pyqtree, one by one"]
+        for label, (elapsed, placed) in results.items():
+            assert placed == reference, f"{label} differs from pyqtree"
+            print(f"{n} placements x {candidates} candidates, {label}: {elapsed * 1e3:.2f} ms ({reference_time / elapsed:.1f}x), {sum(p is not None for p in placed)} placed")
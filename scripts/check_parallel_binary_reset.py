@@ -0,0 +1,35 @@
+# Check that ParallelEnvironment sends the scenes given in ResetInfo, in JSON and in the binary format, to the game
+# clients instead of generating new scenes in the workers. Runs against the fake client, so it needs neither the game
+# nor the environment data (a scene generated in a worker would fail without the data).
+from legent import ResetInfo
+from legent.environment.parallel_env import ParallelEnvironment
+
+
+def make_scene(prefab: str):
+    return {
+        "instances": [{"prefab": prefab, "position": [0, 0, 0], "rotation": [0, 0, 0], "scale": [1, 1, 1], "type": "kinematic"}],
+        "player": {"position": [0, 0.1, 1], "rotation": [0, 180, 0]},
+        "agent": {"position": [0, 0.1, -1], "rotation": [0, 0, 0]},
+        "center": [0, 10, 0],
+        "prompt": "",
+    }
+
+
+def received_prefabs(observation):
+    return [instance["prefab"] for instance in observation.game_states["instances"]]
+
+
+if __name__ == "__main__":
+    env = ParallelEnvironment("fake", num_envs=2, run_options={"port": 50151}, env_kwargs={"camera_resolution": 64}, max_restarts=0)
+    try:
+        for binary_scene in [False, True]:
+            scenes = [make_scene(f"Prefab_{i}_{binary_scene}") for i in range(2)]
+            # Through reset() and through step()
+            for result in [env.reset([ResetInfo(scene, binary_scene=binary_scene) for scene in scenes]),
+                           env.step([ResetInfo(scene, binary_scene=binary_scene) for scene in scenes])]:
+                assert not result.dones.any(), "a worker crashed"
+                for observation, scene in zip(result.observations, scenes):
+                    assert received_prefabs(observation) == [scene["instances"][0]["prefab"]], received_prefabs(observation)
+            print(f"binary_scene={binary_scene}: the clients received the given scenes")
+    finally:
+        env.close()
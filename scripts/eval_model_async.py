@@ -0,0 +1,115 @@
+# Evaluate several episodes at the same time. Each concurrent episode has its own environment (and port) and its own agent,
+# and the environment steps, image saving and model requests of different episodes overlap on one event loop.
+# Same arguments and outputs as eval_model.py, plus --concurrency.
+from legent import AsyncEnvironment, Observation, store_json, ResetInfo, load_json, save_image
+import os
+import asyncio
+from legent.utils.config import EVAL_FOLDER
+from legent import get_latest_folder_with_suffix, time_string, task_done, AgentClient, ActionFinish, Action, GPT4VAgentClient
+from prompt_template import *
+import argparse
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--ssh",
+    type=str,
+    default=None,
+    help=r"""
+ssh="<username>@<host>".
+If you use a non-standard ssh port: "<username>@<host>:<ssh_port>".
+If you use password: "<username>@<host>:<ssh_port>,<password>". If there is special character in <password>, please use escape character like this: \"
+""",
+)
+parser.add_argument("--remote_model_port", type=int, default=50050, help="remote model port")
+parser.add_argument("--api_key", type=str, default=None, help="api key")
+parser.add_argument("--base_url", type=str, default=None, help="base url")
+parser.add_argument("--task", type=str, default="come", choices=["come", "where"], help="task")
+parser.add_argument("--concurrency", type=int, default=4, help="number of episodes evaluated at the same time")
+args = parser.parse_args()
+if args.ssh is None and args.api_key is None:
+    print("No --ssh or --api_key parameters provided. Ensure your model and environment are running locally.")
+if args.api_key is None:
+    # The remote model server keeps a single chat history, so its episodes cannot overlap.
+    if args.concurrency > 1:
+        print("The remote model serves one episode at a time. Set --concurrency to 1.")
+        args.concurrency = 1
+    model_name = "model"
+else:
+    prompt = {"come": GPT4V_PROMPT_COME, "where": GPT4V_PROMPT_WHERE}[args.task]
+    model_name = "gpt4v"
+
+
+def create_agent() -> AgentClient:
+    if args.api_key is None:
+        return AgentClient(ssh=args.ssh, remote_model_port=args.remote_model_port)
+    return GPT4VAgentClient(api_key=args.api_key, base_url=args.base_url, prompt=prompt)
+
+
+eval_folder = get_latest_folder_with_suffix(EVAL_FOLDER, args.task)
+save_path = f"{eval_folder}/results/{time_string()}-{model_name}"
+start_episode, end_episode = 0, 10  # 0, 10
+MAX_STEPS = 25
+
+
+async def run_episode(i: int, env: AsyncEnvironment, agent: AgentClient) -> bool:
+    print("\n" + "==" * 4 + f"Start episode {i}" + "==" * 4)
+    task_setting = load_json(f"{eval_folder}/tasks/{i:04d}.json")
+    obs: Observation = await env.reset(ResetInfo(scene=task_setting["scene"]))
+    agent.current_chat = task_setting["task"]
+    await asyncio.to_thread(agent.clear_history)
+    traj_save_dir = f"{save_path}/traj{i:04d}"
+    os.makedirs(traj_save_dir)
+    step = 0
+    done = False
+    while step < MAX_STEPS:
+        # The model request is awaited directly instead of polled through agent.act(), so other episodes run meanwhile.
+        action: Action = await asyncio.to_thread(agent.request_action, obs)
+        obs = await env.step(action)
+        if action.json_actions.startswith("INVALID ACTION"):
+            await asyncio.to_thread(save_image, obs.image, f"{traj_save_dir}/{step:04d}.png")
+            print(f"episode {i}: INVALID", action.json_actions)
+            step += 1
+        elif action.to_string() != "":
+            await asyncio.to_thread(save_image, obs.image, f"{traj_save_dir}/{step:04d}.png")
+            print(f"episode {i}: step {step}, action: {action.to_string()}")
+            task_type = task_setting["task"].split(" ")[0].lower()
+            done, info = task_done(task_type, action, obs, task_setting)
+            store_json({"step": step, "action": action.to_string(), "done_after_action": done, "info_after_action": info}, f"{traj_save_dir}/{step:04d}a.json")
+            step += 1
+            if done:
+                print(f"episode {i}: Task accomplished.")
+            if isinstance(action, ActionFinish) or action.text != "" or done:
+                await asyncio.to_thread(save_image, obs.image, f"{traj_save_dir}/{step:04d}.png")
+                break
+    if not done:
+        print(f"episode {i}: Task failed.")
+    return done
+
+
+async def run_worker(worker_id: int, episodes: asyncio.Queue, results: dict) -> None:
+    env = await AsyncEnvironment.create(env_path="auto", camera_resolution=448, run_options={"port": 50054 + worker_id})
+    agent = create_agent()
+    try:
+        while not episodes.empty():
+            i = episodes.get_nowait()
+            results[i] = await run_episode(i, env, agent)
+    finally:
+        await env.close()
+        agent.close()
+
+
+async def main():
+    episodes = asyncio.Queue()
+    for i in range(start_episode, end_episode):
+        episodes.put_nowait(i)
+    results = {}
+    await asyncio.gather(*[run_worker(worker_id, episodes, results) for worker_id in range(args.concurrency)])
+    success_count = sum(results.values())
+    failed_cases = sorted(i for i, done in results.items() if not done)
+    result = {"Success Rate": f"{success_count}/{end_episode-start_episode}", "failed cases": failed_cases}
+    print(result)
+    store_json(result, f"{save_path}/result.json")
+
+
+asyncio.run(main())
@@ -1,6 +1,6 @@
-import multiprocessing
 from legent import Environment, ResetInfo, TaskCreator, Controller, TrajectorySaver, time_string
 from legent.utils.config import DATASET_FOLDER
+from legent.server.scene_workers import scene_generation_context
 import time
 from datetime import timedelta
 
@@ -45,10 +45,12 @@ if __name__ == "__main__":
     start_time = time.time()
 
     # Create and start multiple processes
+    # They are forked from a process that loaded the object database once, rather than each loading it
+    context = scene_generation_context()
     save_root_folder = f"{DATASET_FOLDER}/{time_string()}"
     processes = []
     for i in range(num_processes):
-        p = multiprocessing.Process(target=worker, args=(i, f"{save_root_folder}/{i}", scene_num))
+        p = context.Process(target=worker, args=(i, f"{save_root_folder}/{i}", scene_num))
         processes.append(p)
 
     for p in processes: